@@ -0,0 +1,99 @@
+"""
+Benchmark of a single agent move on a large world.
+
+Compares the previous list-of-lists grid, which was rebuilt together with its
+pathfinding graph on every move, against the cached NumPy grid.
+
+Run with:
+    uv run python -m benchmarks.grid_benchmark --size 500 --moves 5
+
+The legacy grid takes seconds per move on a 500x500 world, so keep --moves small.
+"""
+
+import argparse
+import random
+import time
+
+import pathfind
+
+from engine.grid import Grid
+
+
+class LegacyGrid:
+    """The grid implementation before the NumPy rewrite, kept for comparison."""
+
+    def __init__(self, size_x: int, size_y: int):
+        self.size_x = size_x
+        self.size_y = size_y
+        self.grid = [[1 for _ in range(size_x)] for _ in range(size_y)]
+        self.graph = None
+
+    def set_agent_field_of_view(self, agent, fov, obstacles):
+        x, y = agent
+        for i in range(max(0, x - fov - 1), min(self.size_x, x + fov)):
+            for j in range(max(0, y - fov - 1), min(self.size_y, y + fov)):
+                if (i, j) in obstacles:
+                    self.grid[i][j] = -1
+        self.graph = pathfind.transform.matrix2graph(self.grid, diagonal=False)
+
+    def get_path(self, start_int, end_int):
+        start = f"{start_int[0]},{start_int[1]}"
+        end = f"{end_int[0]},{end_int[1]}"
+        path = pathfind.find(self.graph, start, end, method="jps")
+        return path, len(path) - 1
+
+
+def random_moves(size: int, count: int, max_steps: int, seed: int):
+    rng = random.Random(seed)
+    moves = []
+    while len(moves) < count:
+        x, y = rng.randrange(size), rng.randrange(size)
+        dx = rng.randint(-max_steps, max_steps)
+        dy = rng.randint(-(max_steps - abs(dx)), max_steps - abs(dx))
+        destination = (x + dx, y + dy)
+        if destination != (x, y) and 0 <= x + dx < size and 0 <= y + dy < size:
+            moves.append(((x, y), destination))
+    return moves
+
+
+def run_legacy(size: int, moves, fov: int) -> float:
+    start = time.perf_counter()
+    for agent_location, destination in moves:
+        # The legacy move created a new grid and graph for every move
+        grid = LegacyGrid(size, size)
+        grid.set_agent_field_of_view(agent_location, fov, [])
+        grid.get_path(start_int=agent_location, end_int=destination)
+    return time.perf_counter() - start
+
+
+def run_numpy(size: int, moves, fov: int) -> float:
+    start = time.perf_counter()
+    for agent_location, destination in moves:
+        grid = Grid.for_world("benchmark", size, size)
+        grid.set_agent_field_of_view(agent_location, fov, [])
+        grid.get_path(start_int=agent_location, end_int=destination)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--moves", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--fov", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    moves = random_moves(args.size, args.moves, args.steps, args.seed)
+
+    legacy = run_legacy(args.size, moves, args.fov)
+    numpy = run_numpy(args.size, moves, args.fov)
+
+    print(f"World {args.size}x{args.size}, {args.moves} moves of up to {args.steps}")
+    print(f"  legacy grid: {legacy / args.moves * 1000:10.3f} ms/move")
+    print(f"  numpy grid:  {numpy / args.moves * 1000:10.3f} ms/move")
+    print(f"  speedup:     {legacy / numpy:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
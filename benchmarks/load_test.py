@@ -0,0 +1,224 @@
+"""
+Load test of the SimulationRunner and AgentRunner against the mock LLM server.
+
+Starts `benchmarks.mock_llm_server` in a background thread, creates a simulation
+with N agents and runs M ticks against it. Reports ticks per second, the p50 and
+p99 latency of single agent ticks, failed agent ticks, LLM requests, the number
+of DB queries per tick and the concurrent update conflicts.
+
+Needs the PostgreSQL database and NATS server configured in .env.
+
+Run with:
+    uv run python -m benchmarks.load_test --agents 100 --ticks 10 --latency-mean 0.5
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from loguru import logger
+from sqlalchemy import event
+
+from benchmarks.mock_llm_server import (
+    add_arguments,
+    config_from_arguments,
+    create_app,
+)
+
+from clients.db import engine, get_session
+from clients.nats import get_nats_broker
+
+from config import settings
+from config.openai import AvailableModels
+
+from engine.runners.agent_runner import AgentRunner
+from engine.runners.simulation_runner import SimulationRunner
+
+from services.agent import AgentService
+from services.resource import ResourceService
+from services.simulation import SimulationService
+from services.world import WorldService
+
+from schemas.agent import Agent
+from schemas.resource import Resource
+from schemas.simulation import Simulation
+from schemas.world import World
+
+from utils import get_neutral_first_names
+
+
+class QueryCounter:
+    """Counts the statements executed on the database engine."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+def start_mock_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def create_simulation(db, nats, args: argparse.Namespace) -> str:
+    rng = random.Random(args.seed)
+    simulation = SimulationService(db, nats).create(
+        Simulation(collection_name="load_test", running=False)
+    )
+    world_service = WorldService(db, nats)
+    world = world_service.create(
+        World(simulation_id=simulation.id, size_x=args.size, size_y=args.size)
+    )
+    regions = world_service.create_regions_for_world(world=world, num_regions=1)
+
+    resource_service = ResourceService(db, nats)
+    locations = rng.sample(
+        [(x, y) for x in range(args.size) for y in range(args.size)],
+        args.resources + args.agents,
+    )
+    for x, y in locations[: args.resources]:
+        resource_service.create(
+            Resource(
+                simulation_id=simulation.id,
+                region_id=regions[0].id,
+                world_id=world.id,
+                x_coord=x,
+                y_coord=y,
+                energy_yield=rng.randint(5, 30),
+                required_agents=rng.choice([1, 1, 2]),
+                regrow_time=rng.randint(10, 50),
+                available=True,
+            ),
+            commit=False,
+        )
+
+    agent_service = AgentService(db, nats)
+    for x, y in locations[args.resources :]:
+        agent_service.create(
+            Agent(
+                simulation_id=simulation.id,
+                name=rng.choice(get_neutral_first_names()),
+                model=args.model,
+                x_coord=x,
+                y_coord=y,
+                energy_level=1000,
+                hunger=50,
+                visibility_range=10,
+            ),
+            commit=False,
+        )
+    db.commit()
+    return simulation.id
+
+
+async def run(args: argparse.Namespace):
+    agent_latencies: list[float] = []
+    failed_agent_ticks = 0
+    tick_agent = AgentRunner.tick_agent
+
+    async def timed_tick_agent(nats, agent_id, snapshot=None):
+        nonlocal failed_agent_ticks
+        start = time.perf_counter()
+        try:
+            await tick_agent(nats, agent_id, snapshot=snapshot)
+        except Exception as e:
+            failed_agent_ticks += 1
+            logger.debug(f"[AGENT {agent_id}] Tick failed: {e}")
+        finally:
+            agent_latencies.append(time.perf_counter() - start)
+
+    AgentRunner.tick_agent = staticmethod(timed_tick_agent)
+
+    queries = QueryCounter()
+    tick_durations = []
+    tick_queries = []
+
+    async with get_nats_broker() as nats:
+        with get_session() as db:
+            simulation_id = create_simulation(db, nats, args)
+            logger.info(f"Created simulation {simulation_id}")
+
+            for _ in range(args.ticks):
+                before = queries.count
+                start = time.perf_counter()
+                await SimulationRunner.tick_simulation(db, nats, simulation_id)
+                tick_durations.append(time.perf_counter() - start)
+                tick_queries.append(queries.count - before)
+
+    return (
+        simulation_id,
+        tick_durations,
+        tick_queries,
+        agent_latencies,
+        failed_agent_ticks,
+        sum(SimulationRunner.get_conflicts(simulation_id).values()),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--resources", type=int, default=30)
+    parser.add_argument("--model", default="gpt-4.1-nano-2025-04-14")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Maximum concurrent LLM calls of the model, defaults to AvailableModels.",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Tick deadline in seconds, see settings.tick_deadline.",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app(config_from_arguments(args))
+    start_mock_server(app, args.port)
+
+    settings.openai.baseurl = f"http://127.0.0.1:{args.port}/v1"
+    settings.openai.apikey = "mock"
+    settings.cassette.mode = "off"
+    settings.tick_deadline = args.deadline
+    if args.concurrency is not None:
+        AvailableModels.get(args.model).max_concurrency = args.concurrency
+
+    simulation_id, ticks, queries, latencies, failed, conflicts = asyncio.run(run(args))
+
+    total = sum(ticks)
+    print(
+        f"Simulation {simulation_id}: {args.agents} agents, {args.ticks} ticks, "
+        f"mock latency {args.latency_mean}s (sigma {args.latency_sigma})"
+    )
+    print(f"  ticks/sec:             {args.ticks / total:10.3f}")
+    print(f"  tick wall time p50:    {np.percentile(ticks, 50):10.3f} s")
+    print(f"  agent tick p50:        {np.percentile(latencies, 50):10.3f} s")
+    print(f"  agent tick p99:        {np.percentile(latencies, 99):10.3f} s")
+    print(f"  agent ticks failed:    {failed:10d} of {len(latencies)}")
+    print(f"  LLM requests:          {app.state.requests:10d}")
+    print(f"  DB queries/tick:       {np.mean(queries):10.1f}")
+    print(f"  DB queries/agent tick: {sum(queries) / max(1, len(latencies)):10.1f}")
+    print(f"  update conflicts:      {conflicts:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Local OpenAI-compatible chat completion server for load testing.
+
+Answers every request after a random latency with either a text reply (requests
+without tools) or a single tool call. The tool is drawn from the tools sent with
+the request, i.e. the adapted `engine.tools.available_tools` of the agent, and
+its arguments are derived from the prompt: coordinates of observed resources,
+IDs of observed agents and conversations, and the agent's own location.
+
+Errors and rate limits can be injected to exercise the retry path of the
+LLMScheduler. Rate limited responses carry a Retry-After header.
+
+Run with:
+    uv run python -m benchmarks.mock_llm_server --port 8001 --latency-mean 0.8
+
+and point the simulation at it with OPENAI_BASEURL=http://127.0.0.1:8001/v1.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CHARS_PER_TOKEN = 4
+
+LOCATION_PATTERN = re.compile(r"location: \((\d+), (\d+)\)")
+RESOURCE_PATTERN = re.compile(
+    r"resource_id: [0-9a-f]{6}; type: [^;]+; location: \((\d+), (\d+)\)"
+)
+OWN_LOCATION_PATTERN = re.compile(r"Your current location: \[(\d+), (\d+)\]")
+ID_PATTERN = re.compile(r"(\w+_id): ([0-9a-f]{6})\b")
+
+
+@dataclass
+class MockConfig:
+    # Latency of a response is drawn from a log-normal distribution
+    latency_mean: float = 0.5
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int | None = None
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _latency(config: MockConfig, rng: random.Random) -> float:
+    """Draw a latency with the configured mean from a log-normal distribution."""
+    if config.latency_mean <= 0:
+        return 0.0
+    mu = math.log(config.latency_mean) - config.latency_sigma**2 / 2
+    return rng.lognormvariate(mu, config.latency_sigma)
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(
+                part.get("text", "") for part in content if isinstance(part, dict)
+            )
+        parts.append(str(content or ""))
+    return "\n".join(parts)
+
+
+def _arguments(tool: dict, prompt: str, rng: random.Random) -> dict:
+    """Make plausible arguments for a tool from the prompt."""
+    parameters = tool.get("parameters", {}).get("properties", {})
+    resources = [tuple(map(int, m)) for m in RESOURCE_PATTERN.findall(prompt)]
+    locations = [tuple(map(int, m)) for m in LOCATION_PATTERN.findall(prompt)]
+    own = OWN_LOCATION_PATTERN.search(prompt)
+    own_location = tuple(map(int, own.groups())) if own else (0, 0)
+
+    ids: dict[str, list[str]] = {}
+    for kind, id in ID_PATTERN.findall(prompt):
+        ids.setdefault(kind, []).append(id)
+
+    # Harvest observed resources, move towards them or somewhere close by
+    if tool["name"] == "harvest_resource" and resources:
+        target = rng.choice(resources)
+    elif resources or locations:
+        target = rng.choice(resources or locations)
+    else:
+        target = (
+            max(0, own_location[0] + rng.randint(-5, 5)),
+            max(0, own_location[1] + rng.randint(-5, 5)),
+        )
+
+    arguments = {}
+    for name, schema in parameters.items():
+        if name in ("agent_id", "simulation_id"):
+            continue
+        if name == "x":
+            arguments[name] = target[0]
+        elif name == "y":
+            arguments[name] = target[1]
+        elif name.endswith("_id"):
+            kind = "agent_id" if name == "other_agent_id" else name
+            candidates = ids.get(kind) or [
+                id for values in ids.values() for id in values
+            ]
+            arguments[name] = (
+                rng.choice(candidates) if candidates else uuid.uuid4().hex[:6]
+            )
+        elif schema.get("type") == "integer":
+            arguments[name] = rng.randint(1, 10)
+        elif schema.get("type") == "number":
+            arguments[name] = rng.uniform(0, 1)
+        elif schema.get("type") == "boolean":
+            arguments[name] = rng.random() < 0.5
+        else:
+            arguments[name] = f"Mock {name.replace('_', ' ')} {rng.randint(0, 9999)}."
+    return arguments
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(config.seed)
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+
+        await asyncio.sleep(_latency(config, rng))
+
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(config.retry_after)},
+                content={
+                    "error": {
+                        "message": "Rate limit reached (mock).",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "error": {
+                        "message": "Internal error (mock).",
+                        "type": "server_error",
+                    }
+                },
+            )
+
+        prompt = _prompt_text(body.get("messages", []))
+        tools = [tool["function"] for tool in body.get("tools") or []]
+
+        if tools:
+            tool = rng.choice(tools)
+            arguments = json.dumps(_arguments(tool, prompt, rng))
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:24]}",
+                        "type": "function",
+                        "function": {"name": tool["name"], "arguments": arguments},
+                    }
+                ],
+            }
+            finish_reason = "tool_calls"
+            completion = arguments
+        else:
+            completion = (
+                "I think step by step about my situation. I should look for the "
+                "closest resource and harvest it to keep my energy level up."
+            )
+            message = {"role": "assistant", "content": completion}
+            finish_reason = "stop"
+
+        prompt_tokens = _tokens(prompt + json.dumps(tools))
+        completion_tokens = _tokens(completion)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {"index": 0, "message": message, "finish_reason": finish_reason}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-mean", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_arguments(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_mean=args.latency_mean,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(config_from_arguments(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
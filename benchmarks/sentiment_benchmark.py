@@ -0,0 +1,158 @@
+"""
+Accuracy and throughput of the sentiment backends of `engine.sentiment`.
+
+Scores a fixed corpus of hand-labeled conversation messages with every backend
+and reports the load time, the messages scored per second in batches of
+--batch-size, the accuracy of the labels (a score within --neutral of 0 counts
+as neutral) and the agreement with the first backend that could be loaded,
+usually the full precision torch model.
+
+Run with:
+    uv run python -m benchmarks.sentiment_benchmark --backends torch onnx lexicon
+
+The onnx backend exports and quantizes the model on its first run, which is
+included in its load time.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from engine.sentiment import BACKENDS, preprocess
+
+# Messages in the style of the agents' conversations, labeled 1 (positive),
+# 0 (neutral) or -1 (negative)
+CORPUS = [
+    ("Hello! Nice to meet you, I hope you are doing well.", 1),
+    ("Thanks a lot for sharing the berries with me, that was very kind.", 1),
+    ("I would love to harvest the tree together with you!", 1),
+    ("Great idea, let's meet at the resource next to the river.", 1),
+    ("You are a true friend, I am glad we found each other.", 1),
+    ("That worked perfectly, my energy is back up. Thank you!", 1),
+    ("Sure, I am happy to help you with the harvest.", 1),
+    ("It was a pleasure talking to you, see you around!", 1),
+    ("I really enjoy our conversations, they make my day better.", 1),
+    ("Wonderful, with your help we will both survive this.", 1),
+    ("I trust you, let's work together from now on.", 1),
+    ("Welcome to the area! There is plenty of food to the east.", 1),
+    ("Good luck on your way, I hope you find what you need.", 1),
+    ("Amazing, we got the resource just in time!", 1),
+    ("I appreciate that you waited for me.", 1),
+    ("Yes, count me in. Together we are stronger.", 1),
+    ("I am at (12, 7). Where are you?", 0),
+    ("The resource at (3, 4) regrows in a few ticks.", 0),
+    ("I am going to move north to look for food.", 0),
+    ("Which resource are you planning to harvest next?", 0),
+    ("There are two agents near the lake.", 0),
+    ("My energy level is 14 right now.", 0),
+    ("I will check the area around the hill.", 0),
+    ("Conversation ended: Reached the maximum number of messages.", 0),
+    ("Let me know when you reach the resource.", 0),
+    ("The tree needs two agents to be harvested.", 0),
+    ("I moved three steps to the west.", 0),
+    ("What is your plan for the next ticks?", 0),
+    ("I have not seen any other resources yet.", 0),
+    ("We can talk again after I harvested.", 0),
+    ("I am heading to the coordinates you sent.", 0),
+    ("The map ends at x 50.", 0),
+    ("I hate that you took the last berries without asking.", -1),
+    ("You lied to me, there was no resource at that location.", -1),
+    ("Leave me alone, I do not want to talk to you.", -1),
+    ("This is unfair, I waited for you and you never came.", -1),
+    ("I am starving and nobody helps me.", -1),
+    ("That was a terrible plan, we both lost energy for nothing.", -1),
+    ("Stop following me, you are annoying.", -1),
+    ("I am not happy with how you treated me.", -1),
+    ("You are selfish, you only think about yourself.", -1),
+    ("Unfortunately I am too tired to keep going, I am dying.", -1),
+    ("Conversation ended: Agent died from energy depletion", -1),
+    ("I don't trust you anymore after what happened.", -1),
+    ("Go away, I found this resource first.", -1),
+    ("Your idea failed and now I have almost no energy left.", -1),
+    ("I am angry that you declined my request again.", -1),
+    ("This is the worst day, everything went wrong.", -1),
+]
+
+
+def classify(scores: np.ndarray, neutral: float) -> np.ndarray:
+    return np.where(np.abs(scores) < neutral, 0, np.sign(scores)).astype(int)
+
+
+def run_backend(name: str, args: argparse.Namespace) -> dict | None:
+    backend = BACKENDS[name]()
+    start = time.perf_counter()
+    try:
+        backend.load()
+    except Exception as e:
+        print(f"{name:>8}: not available ({e})")
+        return None
+    load_seconds = time.perf_counter() - start
+
+    texts = [preprocess(message) for message, _ in CORPUS]
+    scores = []
+    for i in range(0, len(texts), args.batch_size):
+        scores.extend(backend.score(texts[i : i + args.batch_size]))
+
+    messages = texts * args.repeat
+    start = time.perf_counter()
+    for i in range(0, len(messages), args.batch_size):
+        backend.score(messages[i : i + args.batch_size])
+    seconds = time.perf_counter() - start
+
+    return {
+        "load_seconds": load_seconds,
+        "messages_per_second": len(messages) / seconds,
+        "scores": np.array(scores),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Times the corpus is scored for the throughput.",
+    )
+    parser.add_argument("--neutral", type=float, default=0.25)
+    args = parser.parse_args()
+
+    labels = np.array([label for _, label in CORPUS])
+    reference = None
+    print(
+        f"{len(CORPUS)} messages, batch size {args.batch_size}, "
+        f"neutral below |score| {args.neutral}"
+    )
+    print(
+        f"{'backend':>8} {'load s':>8} {'msgs/s':>10} {'accuracy':>9} "
+        f"{'MAE ref':>8} {'corr ref':>9}"
+    )
+    for name in args.backends:
+        result = run_backend(name, args)
+        if result is None:
+            continue
+
+        scores = result["scores"]
+        accuracy = np.mean(classify(scores, args.neutral) == labels)
+        if reference is None:
+            reference = scores
+        mae = np.mean(np.abs(scores - reference))
+        correlation = (
+            np.corrcoef(scores, reference)[0, 1]
+            if np.std(scores) > 0 and np.std(reference) > 0
+            else float("nan")
+        )
+        print(
+            f"{name:>8} {result['load_seconds']:8.2f} "
+            f"{result['messages_per_second']:10.1f} {accuracy:9.1%} "
+            f"{mae:8.3f} {correlation:9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
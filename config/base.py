@@ -1,10 +1,15 @@
 # Third Party
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from config.cassette import CassetteSettings
 from config.db import DBSettings
+from config.intents import IntentSettings
 from config.milvus import MilvusSettings
 from config.nats import NatsSettings
 from config.openai import OpenAISettings
+from config.sentiment import SentimentSettings
+from config.supervisor import SupervisorSettings
+from config.workqueue import WorkQueueSettings
 
 
 class Settings(BaseSettings):
@@ -18,8 +23,22 @@ class Settings(BaseSettings):
     milvus: MilvusSettings = MilvusSettings()
     openai: OpenAISettings = OpenAISettings()
     db: DBSettings = DBSettings()
+    cassette: CassetteSettings = CassetteSettings()
+    supervisor: SupervisorSettings = SupervisorSettings()
+    workqueue: WorkQueueSettings = WorkQueueSettings()
+    intents: IntentSettings = IntentSettings()
+    sentiment: SentimentSettings = SentimentSettings()
 
     planning_enabled: bool = False
+    # Charge the region energy cost for every step taken instead of once per move
+    movement_cost_per_step: bool = False
+    # Seconds to wait for agents each tick, None waits for the slowest agent
+    tick_deadline: float | None = None
+    # Times a read-modify-write is retried after a concurrent update of its rows
+    conflict_retries: int = 3
+    # Every n-th tick snapshots all relationships, the ticks in between only the
+    # changed ones
+    relationship_keyframes: int = 100
 
 
 settings = Settings()
@@ -0,0 +1,12 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings
+
+
+class CassetteSettings(BaseSettings):
+    # off: call the model, record: call the model and store the responses,
+    # replay: serve the stored responses
+    mode: Literal["off", "record", "replay"] = "off"
+    path: str = "tests/cassettes/default.jsonl"
+    # What to do in replay mode if no response is stored for a request
+    fallback: Literal["error", "live", "record"] = "error"
@@ -0,0 +1,9 @@
+from pydantic_settings import BaseSettings
+
+
+class IntentSettings(BaseSettings):
+    # Record the intents of world changing tools and resolve them at the end of
+    # the tick instead of applying them right away, see engine.intents
+    enabled: bool = False
+    # Seed of the order in which the agents' intents are resolved
+    seed: int = 0
@@ -8,6 +8,11 @@ from pydantic_settings import BaseSettings
 class OpenAISettings(BaseSettings):
     baseurl: str = ""
     apikey: str = ""
+    # Attempts to retry a rate limited call before giving up
+    retries: int = 5
+    # Idle connections kept alive per event loop and seconds they are kept
+    connections: int = 100
+    keepalive: float = 60.0
 
 
 @dataclass
@@ -15,6 +20,13 @@ class ModelEntry:
     name: str
     info: ModelInfo
     reasoning: bool = True
+    # Reason and act in one call instead of a reasoning call followed by a tool call
+    single_call: bool = False
+    # Maximum number of concurrent calls to the model
+    max_concurrency: int = 8
+    # Rate limits of the provider, None if unlimited
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
 
 
 ModelName = Literal[
@@ -0,0 +1,22 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings
+
+
+class SentimentSettings(BaseSettings):
+    # torch: full precision RoBERTa, onnx: int8 quantized RoBERTa on ONNX Runtime
+    # (needs the onnx and onnxruntime packages), lexicon: word list, for very
+    # high message rates. See benchmarks/sentiment_benchmark.py
+    backend: Literal["torch", "onnx", "lexicon"] = "torch"
+    # Where the quantized model of the onnx backend is exported to on first use
+    onnxpath: str = "./data/sentiment/model.int8.onnx"
+    # Most messages scored in one forward pass of the model
+    batchsize: int = 32
+    # Seconds the first message of a batch waits for more messages
+    batchwait: float = 0.01
+    # Scores of recent messages kept in memory, 0 disables the cache
+    cachesize: int = 10000
+    # File the cached scores are stored in across restarts, None keeps them in memory
+    cachepath: str | None = None
+    # Load the model in the background when the API starts instead of on first use
+    warmup: bool = True
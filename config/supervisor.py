@@ -0,0 +1,8 @@
+from pydantic_settings import BaseSettings
+
+
+class SupervisorSettings(BaseSettings):
+    # Worker processes hosting the simulations, 0 runs them in threads of the API
+    processes: int = 0
+    # Seconds between the liveness reports of a worker
+    heartbeat: float = 5.0
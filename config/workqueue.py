@@ -0,0 +1,13 @@
+from pydantic_settings import BaseSettings
+
+
+class WorkQueueSettings(BaseSettings):
+    # Publish agent ticks to a JetStream work queue instead of running them in
+    # the simulation process, see engine.runners.agent_queue
+    enabled: bool = False
+    stream: str = "agent-ticks"
+    bucket: str = "agent-tick-results"
+    # Seconds to wait for the agents of a tick if no tick deadline is set
+    timeout: float = 600.0
+    # Seconds a worker may hold a job without reporting progress
+    ackwait: float = 60.0
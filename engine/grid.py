@@ -1,37 +1,71 @@
-import pathfind
+import heapq
+
+import numpy as np
+
+# Grid is 4-connected, agents cannot move diagonally
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
 
 
 class Grid:
     """Interface for 2D map objects and finding the shortest
-    path for an agent's location and destination."""
+    path for an agent's location and destination.
+
+    The map is a NumPy array indexed as [x, y] that is built once per world and
+    updated in place. Neighbours are computed on the fly during the search, so
+    finding a path only touches the cells around the path instead of the whole
+    world.
+    """
+
+    _grids: dict[str, "Grid"] = {}
 
     def __init__(self, size_x: int, size_y: int):
         """Initialize the grid with the given size."""
         self.size_x = size_x
         self.size_y = size_y
 
-        self.grid = [[0 for _ in range(size_x)] for _ in range(size_y)]
-        for i in range(size_y):
-            for j in range(size_x):
-                # Initialize each cell as walkable (1)
-                # Grid is later updated with field of view of agent, i.e. obstacles (-1)
-                self.grid[i][j] = 1
+        # Initialize each cell as walkable (1)
+        # Grid is later updated with field of view of agent, i.e. obstacles (-1)
+        self.grid = np.ones((size_x, size_y), dtype=np.int8)
+
+        # Obstacles set by the last field of view
+        self._fov_obstacles: list[tuple[int, int]] = []
 
-        self.graph: pathfind.transform.matrix2graph = None
+    @classmethod
+    def for_world(cls, world_id: str, size_x: int, size_y: int) -> "Grid":
+        """Get the cached grid of a world, creating it on first use."""
+        grid = cls._grids.get(world_id)
+        if grid is None or (grid.size_x, grid.size_y) != (size_x, size_y):
+            grid = cls(size_x, size_y)
+            cls._grids[world_id] = grid
+        return grid
+
+    @classmethod
+    def drop(cls, world_id: str) -> None:
+        """Drop the cached grid of a world."""
+        cls._grids.pop(world_id, None)
 
     def set_agent_field_of_view(
         self, agent: tuple[int, int], fov: int, obstacles: list[tuple[int, int]]
     ):
-        """Set the field of view of an agent."""
-        x, y = agent
-        for i in range(max(0, x - fov - 1), min(self.size_x, x + fov)):
-            for j in range(max(0, y - fov - 1), min(self.size_y, y + fov)):
-                if (i, j) in obstacles:
-                    # All cells that are an obstacle are not walkable (-1)
-                    self.grid[i][j] = -1
+        """Set the field of view of an agent.
 
-        # Update the graph with the new map
-        self.graph = pathfind.transform.matrix2graph(self.grid, diagonal=False)
+        Only obstacles within the field of view are known to the agent. The
+        obstacles of the previous field of view are cleared first, so the update
+        only touches the changed cells instead of the whole map.
+        """
+        for i, j in self._fov_obstacles:
+            self.grid[i, j] = 1
+
+        x, y = agent
+        self._fov_obstacles = [
+            (i, j)
+            for i, j in obstacles
+            if max(0, x - fov) <= i < min(self.size_x, x + fov + 1)
+            and max(0, y - fov) <= j < min(self.size_y, y + fov + 1)
+        ]
+        for i, j in self._fov_obstacles:
+            # All cells that are an obstacle are not walkable (-1)
+            self.grid[i, j] = -1
 
     def _convert_coordinate(self, c: str) -> tuple[int, int]:
         """Convert a coordinate-String to a tuple of integers."""
@@ -46,11 +80,51 @@ class Grid:
 
         return (x, y)
 
-    def _convert_path(self, path: list[str]) -> list[tuple[int, int]]:
-        """Convert path of coordinate-Strings to a list of tuples of integers."""
-        if not isinstance(path, list):
-            raise ValueError("Path must be a list.")
-        return [self._convert_coordinate(c) for c in path]
+    def _is_walkable(self, x: int, y: int) -> bool:
+        return 0 <= x < self.size_x and 0 <= y < self.size_y and self.grid[x, y] > 0
+
+    def _find_path(
+        self, start: tuple[int, int], end: tuple[int, int]
+    ) -> list[tuple[int, int]]:
+        """Find the shortest path from start to end with A* on the implicit grid graph."""
+        if not self._is_walkable(*start) or not self._is_walkable(*end):
+            return []
+
+        grid = self.grid
+        size_x, size_y = self.size_x, self.size_y
+        end_x, end_y = end
+
+        came_from: dict[tuple[int, int], tuple[int, int] | None] = {start: None}
+        cost: dict[tuple[int, int], int] = {start: 0}
+        # Ties on the estimate are broken towards the node closest to the goal
+        h = abs(start[0] - end_x) + abs(start[1] - end_y)
+        queue = [(h, 0, start)]
+
+        while queue:
+            _, neg_g, node = heapq.heappop(queue)
+            g = -neg_g
+            if node == end:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = came_from[node]
+                return path[::-1]
+            if g > cost[node]:
+                continue
+
+            x, y = node
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < size_x and 0 <= ny < size_y) or grid[nx, ny] < 0:
+                    continue
+                neighbour = (nx, ny)
+                if neighbour not in cost or g + 1 < cost[neighbour]:
+                    cost[neighbour] = g + 1
+                    came_from[neighbour] = node
+                    h = abs(nx - end_x) + abs(ny - end_y)
+                    heapq.heappush(queue, (g + 1 + h, -(g + 1), neighbour))
+
+        return []
 
     def get_path(
         self,
@@ -59,22 +133,30 @@ class Grid:
         start_int: tuple[int, int] = None,
         end_int: tuple[int, int] = None,
     ) -> tuple[list[tuple[int, int]], int]:
-        """Get the path from start to end using Jump Point Search (JPS)."""
+        """Get the shortest path from start to end using A*."""
 
         try:
-            start = start_str if start_str else f"{start_int[0]},{start_int[1]}"
-            end = end_str if end_str else f"{end_int[0]},{end_int[1]}"
-        except ValueError:
+            start = (
+                self._convert_coordinate(start_str)
+                if start_str
+                else (int(start_int[0]), int(start_int[1]))
+            )
+            end = (
+                self._convert_coordinate(end_str)
+                if end_str
+                else (int(end_int[0]), int(end_int[1]))
+            )
+        except (TypeError, ValueError):
             raise ValueError(
                 "Start and End must be either in the format 'x,y' or as tuple [x,y]."
             )
         if start == end:
             raise ValueError("Start and End coordinates must be different.")
 
-        path = pathfind.find(self.graph, start, end, method="jps")
+        path = self._find_path(start, end)
         if not path:
             raise ValueError(
                 f"No path found from {start} to {end}. The destination is unreachable."
             )
 
-        return self._convert_path(path), (len(path) - 1)
+        return path, (len(path) - 1)
@@ -0,0 +1,270 @@
+"""
+Intent-based execution of the world changing tools.
+
+With `settings.intents.enabled`, the `move`, `random_move`, `harvest_resource`
+and `start_conversation` tools do not write to the database from the agents'
+concurrent turns. They record an intent in the IntentBuffer of the simulation,
+and the SimulationRunner resolves all intents of a tick in one pass once the
+agents have run:
+
+- Agents are resolved in an order drawn from a random generator seeded with
+  `settings.intents.seed`, the simulation and the tick, and the intents of an
+  agent in the order it recorded them. The outcome of a tick therefore does
+  not depend on which LLM call returned first.
+- Intents are checked against the state left by the intents before them, so
+  conflicts such as two agents harvesting the same resource or requesting a
+  conversation with each other go to the agent that comes first. Moves reach
+  the spatial index once the transaction is committed, so paths are blocked
+  by the agents at their positions from before the resolution.
+- All accepted intents are applied in one transaction. A rejected intent is
+  rolled back to a savepoint and reported to its agent in an action log.
+
+Agent turns that run on the agent tick work queue or finish after the tick
+deadline still work: queue workers have no buffer and write directly, and late
+intents are resolved at the next tick boundary.
+"""
+
+import random
+import threading
+from dataclasses import dataclass
+
+from faststream.nats import NatsBroker
+from loguru import logger
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import Session
+
+from config import settings
+
+from engine.spatial import SpatialIndex
+
+from messages.agent.agent_action import AgentActionMessage
+from messages.agent.agent_communication import AgentCommunicationMessage
+from messages.world.agent_moved import AgentMovedMessage
+
+from services.agent import AgentService, MovementTruncated
+from services.resource import ResourceService
+
+from schemas.action_log import ActionLog
+
+from utils import compute_distance
+
+
+@dataclass
+class MoveIntent:
+    """Move to a destination, or in a random direction without one."""
+
+    agent_id: str
+    destination: tuple[int, int] | None = None
+
+    def describe(self) -> str:
+        if self.destination is None:
+            return "random_move()"
+        return f"move(x={self.destination[0]}, y={self.destination[1]})"
+
+
+@dataclass
+class HarvestIntent:
+    """Harvest the resource at a location or join its harvest."""
+
+    agent_id: str
+    location: tuple[int, int]
+
+    def describe(self) -> str:
+        return f"harvest_resource(x={self.location[0]}, y={self.location[1]})"
+
+
+@dataclass
+class ConversationIntent:
+    """Request a conversation with another agent."""
+
+    agent_id: str
+    other_agent_id: str
+    message: str
+
+    def describe(self) -> str:
+        return f"start_conversation(other_agent_id={self.other_agent_id})"
+
+
+Intent = MoveIntent | HarvestIntent | ConversationIntent
+
+
+class IntentBuffer:
+    """Intents recorded by the agents of a simulation since the last resolution."""
+
+    _buffers: dict[str, "IntentBuffer"] = {}
+
+    def __init__(self, simulation_id: str):
+        self.simulation_id = simulation_id
+        self._intents: dict[str, list[Intent]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, simulation_id: str) -> "IntentBuffer | None":
+        """Get the buffer of a simulation, None if its tools apply directly."""
+        return cls._buffers.get(simulation_id)
+
+    @classmethod
+    def register(cls, simulation_id: str, buffer: "IntentBuffer") -> None:
+        """Register the buffer of a simulation."""
+        cls._buffers[simulation_id] = buffer
+
+    @classmethod
+    def drop(cls, simulation_id: str) -> None:
+        """Drop the buffer of a simulation."""
+        cls._buffers.pop(simulation_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(intents) for intents in self._intents.values())
+
+    def record(self, intent: Intent) -> str:
+        """Record an intent and get the tool response for the agent."""
+        with self._lock:
+            self._intents.setdefault(intent.agent_id, []).append(intent)
+        logger.debug(
+            f"[SIM {self.simulation_id}][AGENT {intent.agent_id}] Recorded intent {intent.describe()}"
+        )
+        return f"Your action {intent.describe()} is carried out at the end of the tick."
+
+    def drain(self) -> dict[str, list[Intent]]:
+        """Remove and return the recorded intents by agent ID."""
+        with self._lock:
+            intents, self._intents = self._intents, {}
+        return intents
+
+    def order(self, intents: dict[str, list[Intent]], rng: random.Random):
+        """Order intents for resolution: agents shuffled, each agent's in sequence."""
+        agent_ids = sorted(intents)
+        rng.shuffle(agent_ids)
+        return [intent for agent_id in agent_ids for intent in intents[agent_id]]
+
+    def _apply(
+        self,
+        db: Session,
+        agent_service: AgentService,
+        resource_service: ResourceService,
+        intents: dict[str, list[Intent]],
+        tick: int,
+    ):
+        """Apply the intents of a tick in their resolution order and commit."""
+        rng = random.Random(f"{settings.intents.seed}:{self.simulation_id}:{tick}")
+
+        moves = []
+        harvests = []
+        conversations = []
+        rejected = []
+        for intent in self.order(intents, rng):
+            agent = agent_service.get_by_id(intent.agent_id)
+            savepoint = db.begin_nested()
+            try:
+                if agent.dead:
+                    raise ValueError("You are dead.")
+                if isinstance(intent, MoveIntent):
+                    start_location = (agent.x_coord, agent.y_coord)
+                    try:
+                        if intent.destination is None:
+                            agent_service.move_agent_in_random_direction(
+                                agent, rng=rng, commit=False
+                            )
+                        else:
+                            agent_service.move_agent(
+                                agent, intent.destination, commit=False
+                            )
+                    except MovementTruncated:
+                        pass
+                    moves.append((agent, intent, start_location))
+                elif isinstance(intent, HarvestIntent):
+                    resource = resource_service.get_by_location(
+                        agent.simulation.world.id, *intent.location
+                    )
+                    agent_service.reduce_energy(agent_id=agent.id, commit=False)
+                    harvests.append(resource_service.join_harvest(resource, agent))
+                else:
+                    agent_service.reduce_energy(agent_id=agent.id, commit=False)
+                    conversations.append(
+                        agent_service.request_conversation(
+                            agent, intent.other_agent_id, intent.message, commit=False
+                        )
+                    )
+                savepoint.commit()
+            except StaleDataError:
+                raise
+            except Exception as e:
+                savepoint.rollback()
+                logger.info(
+                    f"[SIM {self.simulation_id}][AGENT {intent.agent_id}] Intent {intent.describe()} rejected: {e}"
+                )
+                action_log = ActionLog(
+                    agent_id=intent.agent_id,
+                    simulation_id=self.simulation_id,
+                    action=intent.describe(),
+                    feedback=f"ERROR!!! {e}",
+                    tick=tick,
+                )
+                db.add(action_log)
+                rejected.append(action_log)
+
+        db.commit()
+        return moves, harvests, conversations, rejected
+
+    async def resolve(self, db: Session, nats: NatsBroker, tick: int) -> None:
+        """Resolve the recorded intents and apply them in one transaction.
+
+        The transaction is resolved again from the start if it conflicts with a
+        concurrent update, which leads to the same order of the intents.
+        """
+        intents = self.drain()
+        if not intents:
+            return
+
+        agent_service = AgentService(db, nats)
+        resource_service = ResourceService(db, nats)
+        moves, harvests, conversations, rejected = agent_service.retry_on_conflict(
+            self.simulation_id,
+            lambda: self._apply(db, agent_service, resource_service, intents, tick),
+        )
+        logger.info(
+            f"[SIM {self.simulation_id}] Resolved {sum(map(len, intents.values()))} intents at tick {tick}, {len(rejected)} rejected"
+        )
+
+        # Rejected intents and retried transactions leave no stale positions
+        index = SpatialIndex.get(self.simulation_id)
+        for agent, intent, start_location in moves:
+            new_location = (agent.x_coord, agent.y_coord)
+            if index is not None:
+                index.agents.move(agent.id, *new_location)
+            agent_moved_message = AgentMovedMessage(
+                simulation_id=self.simulation_id,
+                id=agent.id,
+                start_location=start_location,
+                new_location=new_location,
+                destination=str(intent.destination or new_location),
+                num_steps=compute_distance(start_location, new_location),
+                new_energy_level=agent.energy_level,
+            )
+            await agent_moved_message.publish(nats)
+
+        for resource, harvesters, action_logs in harvests:
+            if harvesters:
+                await resource_service.finish_harvest(resource, harvesters, action_logs)
+
+        for conversation, message_model in conversations:
+            agent_communication_message = AgentCommunicationMessage(
+                agent_id=conversation.agent_a_id,
+                simulation_id=self.simulation_id,
+                content=message_model.content,
+                id=message_model.id,
+                to_agent_id=conversation.agent_b_id,
+                created_at=message_model.created_at,
+            )
+            await agent_communication_message.publish(nats)
+
+        for action_log in rejected:
+            agent_action_message = AgentActionMessage(
+                id=action_log.id,
+                simulation_id=action_log.simulation_id,
+                agent_id=action_log.agent_id,
+                action=action_log.action,
+                tick=action_log.tick,
+                created_at=action_log.created_at,
+            )
+            await agent_action_message.publish(nats)
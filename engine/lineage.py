@@ -0,0 +1,49 @@
+from sqlalchemy import and_, or_
+from sqlmodel import Session
+
+from schemas.agent import Agent
+
+
+class AgentLineage:
+    """Chain of an agent and the agents of parent simulations it was forked from.
+
+    Forked simulations share the history of their parents instead of copying it:
+    the action logs, memory logs and messages an agent wrote before a fork stay
+    with its parent agent. Every entry of the lineage holds the ID of an agent
+    in the chain and the last tick of its history that belongs to the lineage,
+    None for the agent itself.
+    """
+
+    def __init__(self, entries: list[tuple[str, int | None]]):
+        self.entries = entries
+
+    @classmethod
+    def load(cls, db: Session, agent: Agent) -> "AgentLineage":
+        """Load the lineage of an agent. Agents that were not forked need no query."""
+        entries = [(agent.id, None)]
+        until = None
+        while agent.parent_agent_id is not None:
+            fork_tick = agent.simulation.fork_tick
+            until = fork_tick if until is None else min(until, fork_tick)
+            agent = db.get(Agent, agent.parent_agent_id)
+            entries.append((agent.id, until))
+        return cls(entries)
+
+    @property
+    def agent_ids(self) -> list[str]:
+        return [agent_id for agent_id, _ in self.entries]
+
+    def filter(self, agent_column, tick_column):
+        """Build a filter that matches the rows of the lineage's history."""
+        if len(self.entries) == 1:
+            return agent_column == self.entries[0][0]
+        return or_(
+            *[
+                (
+                    agent_column == agent_id
+                    if until is None
+                    else and_(agent_column == agent_id, tick_column <= until)
+                )
+                for agent_id, until in self.entries
+            ]
+        )
@@ -33,7 +33,8 @@ from engine.context.conversation import (
 from engine.context.observations.agent import AgentObservation
 from engine.context.observations.resource import ResourceObservation
 from engine.context.system import SystemDescription
-from engine.llm.autogen.base import BaseAgent
+from engine.llm.autogen.base import SINGLE_CALL_INSTRUCTION, BaseAgent
+from engine.snapshot import WorldSnapshot
 from engine.tools import available_tools
 
 from messages.agent.agent_prompt import AgentPromptMessage
@@ -57,6 +58,7 @@ class AutogenAgent(BaseAgent):
         db: Session,
         nats: Nats,
         agent: Agent,
+        snapshot: WorldSnapshot | None = None,
     ):
         super().__init__(
             db=db,
@@ -65,6 +67,7 @@ class AutogenAgent(BaseAgent):
             tools=available_tools,
             system_prompt=SystemPrompt(agent),
             description=SystemDescription(agent),
+            snapshot=snapshot,
         )
         self.region_service = RegionService(self._db, self._nats)
         self.action_log_service = ActionLogService(self._db, self._nats)
@@ -74,7 +77,9 @@ class AutogenAgent(BaseAgent):
     def get_context(self):
         """Load the context from the database or other storage."""
 
-        observations = self.agent_service.get_world_context(self.agent)
+        observations = self.agent_service.get_world_context(
+            self.agent, snapshot=self.snapshot
+        )
         actions = self.agent_service.get_last_k_actions(self.agent, k=10)
         last_conversation = self.conversation_service.get_last_conversation_by_agent_id(
             self.agent.id, max_tick_age=self.agent.simulation.tick - 20
@@ -101,9 +106,14 @@ class AutogenAgent(BaseAgent):
         ]
         context += "\n\n---\n".join(parts)
 
-        outstanding_requests = self.agent_service.get_outstanding_conversation_requests(
+        if self.snapshot is None or self.snapshot.has_outstanding_conversation_request(
             self.agent.id
-        )
+        ):
+            outstanding_requests = (
+                self.agent_service.get_outstanding_conversation_requests(self.agent.id)
+            )
+        else:
+            outstanding_requests = []
 
         if outstanding_requests:
             context += OutstandingConversationContext(self.agent).build(
@@ -121,7 +131,16 @@ class AutogenAgent(BaseAgent):
 
         adapted_tools = tools
 
-        if self.agent_service.has_outstanding_conversation_request(self.agent.id):
+        if self.snapshot is not None:
+            has_outstanding_request = (
+                self.snapshot.has_outstanding_conversation_request(self.agent.id)
+            )
+        else:
+            has_outstanding_request = (
+                self.agent_service.has_outstanding_conversation_request(self.agent.id)
+            )
+
+        if has_outstanding_request:
             logger.info(
                 f"[COMMUNICATION] | Agent {self.agent.id} has an outstanding conversation request. Adapting tools."
             )
@@ -206,6 +225,13 @@ class AutogenAgent(BaseAgent):
         if reason:
             self.next_tools = list(adapted_tools)
             # "Answer with a comprehensive explanation about which 2 tools you want to call next. Remember, you cannot only call update_plan, you MUST call another tool."
+        elif self.single_call:
+            # Reason and act on the full context in one call
+            self.tools = adapted_tools
+
+            self._client, self.autogen_agent = self._initialize_llm()
+
+            context += SINGLE_CALL_INSTRUCTION
         else:
             self.tools = adapted_tools
 
@@ -249,7 +275,10 @@ class AutogenAgent(BaseAgent):
         """
         Generate the next action with reasoning.
         This is a wrapper around the generate method with reason=True.
+        In single call mode the reasoning is part of the tool call.
         """
+        if self.single_call:
+            return await self.generate(reason=False)
         reasoning_output = await self.generate(reason=True)
         return await self.generate(
             reason=False, reasoning_output=reasoning_output.messages[-1].content
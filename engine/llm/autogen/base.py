@@ -1,24 +1,26 @@
+import inspect
 import re
-from functools import partial
+from functools import partial, wraps
 from types import CoroutineType
-from typing import Any, Callable, List
+from typing import Annotated, Any, Callable, List
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.base import TaskResult
 from autogen_core import CancellationToken, FunctionCall
+from autogen_core.models import RequestUsage
 from autogen_core.tools import BaseTool, FunctionTool
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from langfuse.decorators import langfuse_context
 from loguru import logger
 from sqlmodel import Session
 
 from clients.nats import Nats
 
-from config import settings
 from config.openai import AvailableModels
 
 from engine.context.base import BaseContext
 from engine.context.system import SystemDescription, SystemPrompt
+from engine.llm.pool import LLMPool
+from engine.snapshot import WorldSnapshot
 
 from messages.agent.agent_action import AgentActionMessage
 from messages.agent.agent_prompt import AgentPromptMessage
@@ -32,6 +34,10 @@ from schemas.agent import Agent
 
 from utils import extract_tool_call_info, summarize_tool_call
 
+REASONING_ARGUMENT = "reasoning"
+
+SINGLE_CALL_INSTRUCTION = "\n\n---\nReason about your next action. Think step by step and write your reasoning into the `reasoning` argument of the tool call you make."
+
 
 class BaseAgent:
     def __init__(
@@ -42,11 +48,13 @@ class BaseAgent:
         tools: List[BaseTool],
         system_prompt: BaseContext,
         description: BaseContext,
+        snapshot: WorldSnapshot | None = None,
     ):
         self.agent = agent
         self.model = AvailableModels.get(agent.model)
         self.system_prompt = system_prompt
         self.description = description
+        self.snapshot = snapshot
 
         self._db = db
         self._nats = nats
@@ -58,30 +66,29 @@ class BaseAgent:
         self.tools = list(tools)  # Make a shallow copy to avoid sharing memory address
         self.next_tools = list(tools)
         self.parallel_tool_calls = False
+        # Reason and act in one call by adding a reasoning argument to every tool
+        self.single_call = self.model.single_call and self.model.info.get(
+            "function_calling", False
+        )
+
+        self._pool = LLMPool.current()
 
         self._client, self.autogen_agent = self._initialize_llm()
 
     def _initialize_llm(self):
-
+        """
+        Build the assistant agent of this agent with the current tools and prompts
+        on a pooled client and pooled bound tools. Assistant agents are cheap to
+        build and keep their state in private attributes, so they are not reused.
+        """
         if len(self.tools) == 0:
-            client = OpenAIChatCompletionClient(
-                model=self.model.name,
-                model_info=self.model.info,
-                base_url=settings.openai.baseurl,
-                api_key=settings.openai.apikey,
-            )
-
+            client = self._pool.get_client(self.model)
             tools = []
-
         else:
-            client = OpenAIChatCompletionClient(
-                model=self.model.name,
-                model_info=self.model.info,
-                base_url=settings.openai.baseurl,
-                api_key=settings.openai.apikey,
-                parallel_tool_calls=self.parallel_tool_calls,
+            client = self._pool.get_client(
+                self.model, parallel_tool_calls=self.parallel_tool_calls
             )
-            tools: List[BaseTool] = [self._make_bound_tool(tool) for tool in self.tools]
+            tools: List[BaseTool] = [self._get_bound_tool(tool) for tool in self.tools]
 
         autogen = AssistantAgent(
             name=re.sub(r"\W|^(?=\d)", "_", self.agent.name),
@@ -95,13 +102,27 @@ class BaseAgent:
 
         return (client, autogen)
 
+    def _get_bound_tool(self, func: Callable) -> FunctionTool:
+        """
+        Get the bound tool of `func` for this agent, building its schema on first use.
+        """
+        key = (self.agent.id, func.__name__, self.single_call)
+        tool = self._pool.tools.get(key)
+        if tool is None:
+            tool = self._make_bound_tool(func)
+            self._pool.tools[key] = tool
+        return tool
+
     def _make_bound_tool(
         self, func: Callable, *, name: str | None = None, description: str | None = None
     ) -> FunctionTool:
         """
         Wraps `func` so that every call gets self.id and self.simulation_id
         injected as the last two positional args, then wraps that in a FunctionTool.
+        In single call mode the tool additionally takes the reasoning of the agent.
         """
+        if self.single_call:
+            func = self._with_reasoning_argument(func)
         bound = partial(
             func, agent_id=self.agent.id, simulation_id=self.agent.simulation_id
         )
@@ -111,6 +132,39 @@ class BaseAgent:
             func=bound,
         )
 
+    @staticmethod
+    def _with_reasoning_argument(func: Callable) -> Callable:
+        """
+        Wraps `func` so that its schema asks the model for its reasoning as the first
+        argument. The reasoning is dropped before `func` is called.
+        """
+        annotation = Annotated[
+            str,
+            "Your step by step reasoning about the situation and why you take this action.",
+        ]
+
+        @wraps(func)
+        async def with_reasoning(*args, **kwargs):
+            kwargs.pop(REASONING_ARGUMENT, None)
+            return await func(*args, **kwargs)
+
+        signature = inspect.signature(func)
+        with_reasoning.__signature__ = signature.replace(
+            parameters=[
+                inspect.Parameter(
+                    REASONING_ARGUMENT,
+                    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                    annotation=annotation,
+                ),
+                *signature.parameters.values(),
+            ]
+        )
+        with_reasoning.__annotations__ = {
+            REASONING_ARGUMENT: annotation,
+            **func.__annotations__,
+        }
+        return with_reasoning
+
     async def run_autogen_agent(
         self,
         context: List[str],
@@ -164,10 +218,12 @@ class BaseAgent:
 
         await agent_response_message.publish(self._nats)
 
+        # The client is shared with other agents, so count the usage of this run only
+        usage = self._get_usage(output)
         langfuse_context.update_current_observation(
             usage_details={
-                "input_tokens": self._client.actual_usage().prompt_tokens,
-                "output_tokens": self._client.actual_usage().completion_tokens,
+                "input_tokens": usage.prompt_tokens,
+                "output_tokens": usage.completion_tokens,
             },
             input=context,
             output=output.messages[-1].content,
@@ -180,6 +236,30 @@ class BaseAgent:
 
         return output
 
+    def _get_usage(self, output: TaskResult) -> RequestUsage:
+        """
+        Sum up the model usage of all messages of a run.
+        """
+        usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        for message in output.messages:
+            if message.models_usage is not None:
+                usage.prompt_tokens += message.models_usage.prompt_tokens
+                usage.completion_tokens += message.models_usage.completion_tokens
+        return usage
+
+    def extract_reasoning(self, output: TaskResult) -> str | None:
+        """
+        Get the reasoning the agent passed along with its tool calls in single call mode.
+        """
+        calls = extract_tool_call_info(output)["ToolCallRequestEvent"]
+        reasoning = [
+            call["arguments"][REASONING_ARGUMENT]
+            for call in calls
+            if isinstance(call["arguments"], dict)
+            and REASONING_ARGUMENT in call["arguments"]
+        ]
+        return "\n".join(reasoning) if reasoning else None
+
     def _add_feedback(self, output: TaskResult, tool_calls: list[FunctionCall]) -> bool:
         return None
 
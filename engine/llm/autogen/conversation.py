@@ -15,7 +15,8 @@ from engine.context.system import (
     SystemDescription,
     SystemPrompt,
 )
-from engine.llm.autogen.base import BaseAgent
+from engine.llm.autogen.base import SINGLE_CALL_INSTRUCTION, BaseAgent
+from engine.snapshot import WorldSnapshot
 from engine.tools.conversation_tools import continue_conversation, end_conversation
 from engine.tools.plan_tools import make_plan
 
@@ -44,6 +45,7 @@ class ConversationAgent(BaseAgent):
         nats: Nats,
         agent: Agent,
         conversation: Conversation,
+        snapshot: WorldSnapshot | None = None,
     ):
         super().__init__(
             db=db,
@@ -52,6 +54,7 @@ class ConversationAgent(BaseAgent):
             tools=[end_conversation, continue_conversation],
             system_prompt=ConversationSystemPrompt(agent),
             description=SystemDescription(agent),
+            snapshot=snapshot,
         )
         self.conversation = conversation
 
@@ -78,6 +81,8 @@ class ConversationAgent(BaseAgent):
             context += "\n\n---\nYou are reasoning about the next action to take. Please think step by step and provide a detailed explanation of your reasoning."
         else:
             self.toggle_tools(use_tools=True)
+            if self.single_call:
+                context += SINGLE_CALL_INSTRUCTION
             self._update_langfuse_trace_name(f"Conversation Tick {self.agent.name}")
 
         if reasoning_output:
@@ -89,7 +94,9 @@ class ConversationAgent(BaseAgent):
     def get_context(self):
         """Load the context from the database or other storage."""
 
-        observations = self.agent_service.get_world_context(self.agent)
+        observations = self.agent_service.get_world_context(
+            self.agent, snapshot=self.snapshot
+        )
         actions = self.agent_service.get_last_k_actions(self.agent, k=10)
 
         context = "Current Tick: " + str(self.agent.simulation.tick) + "\n"
@@ -113,7 +120,10 @@ class ConversationAgent(BaseAgent):
         """
         Generate the next action with reasoning.
         This is a wrapper around the generate method with reason=True.
+        In single call mode the reasoning is part of the tool call.
         """
+        if self.single_call:
+            return await self.generate(reason=False)
         reasoning_output = await self.generate(reason=True)
         return await self.generate(
             reason=False, reasoning_output=reasoning_output.messages[-1].content
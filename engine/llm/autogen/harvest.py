@@ -18,7 +18,8 @@ from engine.context.system import (
     SystemDescription,
     SystemPrompt,
 )
-from engine.llm.autogen.base import BaseAgent
+from engine.llm.autogen.base import SINGLE_CALL_INSTRUCTION, BaseAgent
+from engine.snapshot import WorldSnapshot
 from engine.tools.harvesting_tools import continue_waiting, stop_waiting
 
 from messages.agent.agent_prompt import AgentPromptMessage
@@ -45,6 +46,7 @@ class HarvestingAgent(BaseAgent):
         db: Session,
         nats: Nats,
         agent: Agent,
+        snapshot: WorldSnapshot | None = None,
     ):
         super().__init__(
             db=db,
@@ -53,6 +55,7 @@ class HarvestingAgent(BaseAgent):
             tools=[continue_waiting, stop_waiting],
             system_prompt=HarvestingSystemPrompt(agent),
             description=SystemDescription(agent),
+            snapshot=snapshot,
         )
         self.conversation_service = ConversationService(self._db, self._nats)
 
@@ -68,6 +71,8 @@ class HarvestingAgent(BaseAgent):
             context += "\n\n---\nYou are reasoning about the next action to take. Please think step by step and provide a detailed explanation of your reasoning."
         else:
             self.toggle_tools(use_tools=True)
+            if self.single_call:
+                context += SINGLE_CALL_INSTRUCTION
             self._update_langfuse_trace_name(f"Harvesting Tick {self.agent.name}")
 
         if reasoning_output:
@@ -80,7 +85,9 @@ class HarvestingAgent(BaseAgent):
     def get_context(self):
         """Load the context from the database or other storage."""
 
-        observations = self.agent_service.get_world_context(self.agent)
+        observations = self.agent_service.get_world_context(
+            self.agent, snapshot=self.snapshot
+        )
         actions = self.agent_service.get_last_k_actions(self.agent, k=10)
 
         last_conversation = self.conversation_service.get_last_conversation_by_agent_id(
@@ -118,7 +125,10 @@ class HarvestingAgent(BaseAgent):
         """
         Generate the next action with reasoning.
         This is a wrapper around the generate method with reason=True.
+        In single call mode the reasoning is part of the tool call.
         """
+        if self.single_call:
+            return await self.generate(reason=False)
         reasoning_output = await self.generate(reason=True)
         return await self.generate(
             reason=False, reasoning_output=reasoning_output.messages[-1].content
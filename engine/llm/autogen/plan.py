@@ -18,6 +18,7 @@ from engine.context.conversation import (
     PreviousConversationContext,
 )
 from engine.llm.autogen.base import BaseAgent
+from engine.snapshot import WorldSnapshot
 from engine.tools.memory_tools import update_plan
 
 from services.conversation import ConversationService
@@ -33,6 +34,7 @@ class PlanAgent(BaseAgent):
         db: Session,
         nats: Nats,
         agent: Agent,
+        snapshot: WorldSnapshot | None = None,
     ):
         super().__init__(
             db=db,
@@ -41,6 +43,7 @@ class PlanAgent(BaseAgent):
             tools=[update_plan],
             system_prompt=SystemPrompt(agent),
             description=SystemDescription(agent),
+            snapshot=snapshot,
         )
         self.conversation_service = ConversationService(self._db, self._nats)
 
@@ -72,7 +75,9 @@ class PlanAgent(BaseAgent):
     def get_context(self):
         """Load the context from the database or other storage."""
 
-        observations = self.agent_service.get_world_context(self.agent)
+        observations = self.agent_service.get_world_context(
+            self.agent, snapshot=self.snapshot
+        )
         actions = self.agent_service.get_last_k_actions(self.agent, k=10)
         last_conversation = self.conversation_service.get_last_conversation_by_agent_id(
             self.agent.id, max_tick_age=self.agent.simulation.tick - 20
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Mapping, Sequence
+
+from autogen_core.models import CreateResult, LLMMessage
+from loguru import logger
+
+from config import settings
+from config.openai import ModelEntry
+
+from engine.llm.scheduler import ScheduledChatCompletionClient
+
+# IDs of all models are 6 hex characters (see schemas.base.BaseModel). Only the
+# values of ID fields such as `agent_id: ...`, `"resource_id": "..."` or `ID: ...`
+# count as IDs, so six digit numbers and words like "facade" are left alone
+ID_PATTERN = re.compile(
+    r"(?:\bID|\bid|_id)[\\\"']*\s*[:=]\s*[\\\"']*([0-9a-f]{6})(?![0-9A-Za-z])"
+)
+
+
+def _replace_ids(text: str, ids: dict[str, str]) -> str:
+    """Replace every occurrence of the given IDs in a text by their replacement."""
+    if not ids:
+        return text
+    pattern = re.compile(
+        r"(?<![0-9A-Za-z])(" + "|".join(map(re.escape, ids)) + r")(?![0-9A-Za-z])"
+    )
+    return pattern.sub(lambda match: ids[match.group(1)], text)
+
+
+class Cassette:
+    """Recorded LLM responses stored as JSON lines, keyed by a hash of the request.
+
+    The key covers the model, all messages (system prompt and context) and the
+    tool schemas of a request. IDs are generated anew for every simulation, so
+    they are replaced by placeholders numbered by their first appearance in the
+    request before hashing, and mapped back to the IDs of the current request
+    when a response is replayed. Identical requests are answered with their
+    recorded responses in order, repeating the last one.
+    """
+
+    _cassettes: dict[str, "Cassette"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._responses: dict[str, list[str]] = {}
+        self._positions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses.setdefault(entry["key"], []).append(
+                            entry["response"]
+                        )
+            logger.info(f"Loaded {len(self._responses)} requests from cassette {path}")
+
+    @classmethod
+    def get(cls, path: str) -> "Cassette":
+        """Get the cassette stored at the given path, loading it on first use."""
+        with cls._registry_lock:
+            cassette = cls._cassettes.get(path)
+            if cassette is None:
+                cassette = cls(path)
+                cls._cassettes[path] = cassette
+            return cassette
+
+    @staticmethod
+    def normalize(text: str) -> tuple[str, dict[str, str]]:
+        """Replace all IDs in a request by placeholders.
+
+        IDs are collected from the ID fields of the request, and all their
+        occurrences are replaced, also where an ID is mentioned without a field.
+
+        Returns:
+            The normalized text and the mapping of IDs to placeholders.
+        """
+        ids: dict[str, str] = {}
+        for match in ID_PATTERN.finditer(text):
+            ids.setdefault(match.group(1), f"<id:{len(ids)}>")
+        return _replace_ids(text, ids), ids
+
+    @staticmethod
+    def key(request: str) -> str:
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def play(self, key: str, ids: dict[str, str]) -> str | None:
+        """Get the next recorded response of a request, with the IDs of the request."""
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            response = responses[min(position, len(responses) - 1)]
+
+        for id, placeholder in ids.items():
+            response = response.replace(placeholder, id)
+        return response
+
+    def record(self, key: str, ids: dict[str, str], request: str, response: str):
+        """Store the response of a request, replacing the IDs of the request."""
+        response = _replace_ids(response, ids)
+
+        with self._lock:
+            self._responses.setdefault(key, []).append(response)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(
+                    json.dumps({"key": key, "request": request, "response": response})
+                    + "\n"
+                )
+
+
+class CassetteChatCompletionClient(ScheduledChatCompletionClient):
+    """Chat completion client that records or replays responses from a cassette.
+
+    Replayed responses are served without calling the model or going through the
+    LLMScheduler. Requests that are not on the cassette are handled according
+    to `settings.cassette.fallback`.
+    """
+
+    def __init__(self, model: ModelEntry, **kwargs):
+        if settings.cassette.mode == "replay" and not kwargs.get("api_key"):
+            # Replaying does not need credentials unless it falls back to the model
+            kwargs["api_key"] = "cassette"
+        super().__init__(model, **kwargs)
+        self._cassette = Cassette.get(settings.cassette.path)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Any] = [],
+        json_output: Any = None,
+        extra_create_args: Mapping[str, Any] = {},
+        **kwargs,
+    ) -> CreateResult:
+        request, ids = Cassette.normalize(
+            json.dumps(
+                {
+                    "model": self._model_entry.name,
+                    "messages": [
+                        message.model_dump(mode="json") for message in messages
+                    ],
+                    "tools": [getattr(tool, "schema", tool) for tool in tools],
+                    "json_output": str(json_output),
+                },
+                sort_keys=True,
+            )
+        )
+        key = Cassette.key(request)
+
+        record = settings.cassette.mode == "record"
+        if settings.cassette.mode == "replay":
+            response = self._cassette.play(key, ids)
+            if response is not None:
+                return CreateResult.model_validate_json(response)
+
+            if settings.cassette.fallback == "error":
+                raise ValueError(
+                    f"No recorded response for request {key} on cassette {self._cassette.path}."
+                )
+            logger.warning(
+                f"[LLM {self._model_entry.name}] Request {key} not on cassette, calling the model"
+            )
+            record = settings.cassette.fallback == "record"
+
+        result = await super().create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            **kwargs,
+        )
+        if record:
+            self._cassette.record(key, ids, request, result.model_dump_json())
+        return result
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from weakref import WeakKeyDictionary
+
+import httpx
+from autogen_core.tools import FunctionTool
+from loguru import logger
+
+from config import settings
+from config.openai import ModelEntry
+
+from engine.llm.cassette import CassetteChatCompletionClient
+from engine.llm.scheduler import ScheduledChatCompletionClient
+
+
+class LLMPool:
+    """Pool of LLM clients and bound tools of one event loop.
+
+    Clients are shared by all agents using the same model, base URL and parallel
+    tool call setting, so their keep-alive HTTP connections are reused across
+    calls. Bound tools are kept per agent and reused across tool toggles and
+    ticks.
+
+    HTTP connections cannot be shared between event loops, so every simulation
+    thread gets its own pool. Pools are dropped together with their loop.
+    """
+
+    _pools: "WeakKeyDictionary[asyncio.AbstractEventLoop, LLMPool]" = (
+        WeakKeyDictionary()
+    )
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.clients: dict[
+            tuple[str, str, bool | None], ScheduledChatCompletionClient
+        ] = {}
+        self.tools: dict[tuple[str, str, bool], FunctionTool] = {}
+
+    @classmethod
+    def current(cls) -> "LLMPool":
+        """Get the pool of the running event loop.
+
+        Outside of an event loop a fresh pool is returned that is not shared.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return cls()
+
+        with cls._lock:
+            pool = cls._pools.get(loop)
+            if pool is None:
+                pool = cls()
+                cls._pools[loop] = pool
+            return pool
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the clients of the running event loop and drop its pool."""
+        with cls._lock:
+            pool = cls._pools.pop(asyncio.get_running_loop(), None)
+        if pool is None:
+            return
+        for client in pool.clients.values():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close LLM client: {e}")
+
+    def get_client(
+        self, model: ModelEntry, parallel_tool_calls: bool | None = None
+    ) -> ScheduledChatCompletionClient:
+        """Get the client of a model, creating it on first use.
+
+        Clients created for calls without tools do not set parallel tool calls.
+        """
+        key = (model.name, settings.openai.baseurl, parallel_tool_calls)
+        client = self.clients.get(key)
+        if client is None:
+            kwargs = {}
+            if parallel_tool_calls is not None:
+                kwargs["parallel_tool_calls"] = parallel_tool_calls
+            client_class = (
+                ScheduledChatCompletionClient
+                if settings.cassette.mode == "off"
+                else CassetteChatCompletionClient
+            )
+            client = client_class(
+                model=model,
+                base_url=settings.openai.baseurl,
+                api_key=settings.openai.apikey,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=settings.openai.connections,
+                        keepalive_expiry=settings.openai.keepalive,
+                    ),
+                    timeout=httpx.Timeout(600.0, connect=5.0),
+                ),
+                **kwargs,
+            )
+            self.clients[key] = client
+        return client
@@ -0,0 +1,313 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping, Sequence, TypeVar
+
+import openai
+from autogen_core.models import CreateResult, LLMMessage
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from loguru import logger
+
+from config import settings
+from config.openai import ModelEntry
+
+T = TypeVar("T")
+
+# Rough number of characters per token used to estimate the size of a request
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills `per_minute` tokens every minute.
+
+    Reservations are taken immediately and may drive the bucket negative; the
+    caller then waits until the debt is refilled. This keeps waiting callers in
+    arrival order instead of letting them race for freshly refilled tokens.
+    """
+
+    def __init__(self, per_minute: int):
+        if per_minute < 1:
+            raise ValueError("Budget per minute must be at least 1.")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Reserve `amount` tokens and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            # A single request larger than the bucket must still be able to run
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Take (or with a negative amount give back) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class ConcurrencyLimiter:
+    """Semaphore that can be shared by coroutines running on different event loops.
+
+    Simulations tick in their own threads with their own event loops, so a plain
+    asyncio.Semaphore cannot cap the calls to a model across simulations. Free
+    slots are handed directly to the longest waiting coroutine.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1.")
+        self.limit = limit
+        self._active = 0
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    queued = True
+                except ValueError:
+                    queued = False
+            # The slot was already handed over before the cancellation arrived
+            if not queued and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if loop.is_closed():
+                    continue
+                loop.call_soon_threadsafe(self._hand_over, future)
+                return
+            self._active -= 1
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            # The waiter is gone, pass the slot on to the next one
+            self.release()
+        else:
+            future.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class ModelBudget:
+    """Concurrency and rate limit budget of a single model."""
+
+    def __init__(self, model: ModelEntry):
+        self.name = model.name
+        self.slots = ConcurrencyLimiter(model.max_concurrency)
+        self.requests = (
+            TokenBucket(model.requests_per_minute)
+            if model.requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(model.tokens_per_minute) if model.tokens_per_minute else None
+        )
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all calls to the model for the given number of seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        with self._lock:
+            wait = max(0.0, self._paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    async def wait_for_budget(self, estimated_tokens: int) -> None:
+        """Reserve the budget of one call and wait until it may be sent."""
+        wait = self._wait_time(estimated_tokens)
+        if wait > 0:
+            logger.debug(f"[LLM {self.name}] Waiting {wait:.2f}s for rate limit budget")
+            await asyncio.sleep(wait)
+        # A Retry-After received while waiting holds back the call as well
+        with self._lock:
+            wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class LLMScheduler:
+    """Schedules LLM calls within the concurrency and rate limits of each model.
+
+    Budgets are kept per model in a process-wide registry, so agents of all
+    running simulations share the limits of the provider. Calls queue for a
+    free slot and budget instead of failing, and rate limit errors are retried
+    after the Retry-After interval sent by the provider.
+    """
+
+    _budgets: dict[str, ModelBudget] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_budget(cls, model: ModelEntry) -> ModelBudget:
+        """Get the budget of a model, creating it on first use."""
+        with cls._lock:
+            budget = cls._budgets.get(model.name)
+            if budget is None:
+                budget = ModelBudget(model)
+                cls._budgets[model.name] = budget
+            return budget
+
+    @classmethod
+    async def run(
+        cls,
+        model: ModelEntry,
+        request: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        count_tokens: Callable[[T], int] | None = None,
+    ) -> T:
+        """Run an LLM request once the model has a free slot and enough budget.
+
+        Args:
+            model: The model the request is sent to.
+            request: Factory creating the request coroutine, called once per attempt.
+            estimated_tokens: Estimated number of tokens the request will use.
+            count_tokens: Returns the actual number of tokens used by a result, used
+                to correct the estimate in the token budget.
+        """
+        budget = cls.get_budget(model)
+        retries = settings.openai.retries
+
+        for attempt in range(retries + 1):
+            await budget.wait_for_budget(estimated_tokens)
+            async with budget.slots:
+                try:
+                    result = await request()
+                except openai.RateLimitError as e:
+                    delay = _retry_after(e)
+                    if delay is None:
+                        # Exponential backoff with jitter if the provider sends no hint
+                        delay = min(2**attempt, 60) + random.uniform(0, 1)
+                    budget.pause(delay)
+                    if attempt == retries:
+                        raise
+                    logger.warning(
+                        f"[LLM {model.name}] Rate limited, retrying in {delay:.2f}s "
+                        f"(attempt {attempt + 1}/{retries})"
+                    )
+                    continue
+
+            if budget.tokens is not None and count_tokens is not None:
+                budget.tokens.adjust(count_tokens(result) - estimated_tokens)
+            return result
+
+
+class ScheduledChatCompletionClient(OpenAIChatCompletionClient):
+    """OpenAI chat completion client whose calls go through the LLMScheduler.
+
+    Retries of the OpenAI SDK are disabled, rate limit errors are retried by the
+    scheduler so every caller of the model backs off together.
+    """
+
+    def __init__(self, model: ModelEntry, **kwargs):
+        self._model_entry = model
+        super().__init__(
+            model=model.name, model_info=model.info, max_retries=0, **kwargs
+        )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Any] = [],
+        json_output: Any = None,
+        extra_create_args: Mapping[str, Any] = {},
+        **kwargs,
+    ) -> CreateResult:
+        create = super().create
+        return await LLMScheduler.run(
+            self._model_entry,
+            lambda: create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                **kwargs,
+            ),
+            estimated_tokens=_estimate_tokens(messages, tools),
+            count_tokens=lambda result: result.usage.prompt_tokens
+            + result.usage.completion_tokens,
+        )
+
+
+def _estimate_tokens(messages: Sequence[LLMMessage], tools: Sequence[Any]) -> int:
+    """Estimate the number of tokens of a request from its size in characters."""
+    chars = sum(len(str(message.content)) for message in messages)
+    chars += sum(len(str(getattr(tool, "schema", tool))) for tool in tools)
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def _retry_after(error: openai.RateLimitError) -> float | None:
+    """Get the number of seconds to wait from the Retry-After headers of a response."""
+    headers = error.response.headers if error.response is not None else {}
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            return max(
+                0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()
+            )
+        except (TypeError, ValueError):
+            pass
+
+    return None
@@ -0,0 +1,75 @@
+import numpy as np
+
+from schemas.region import Region
+
+
+class RegionRaster:
+    """Per-world raster of region indices for O(1) region lookups.
+
+    Regions are immutable once a world has been divided, so the raster is built
+    once per world and cached. Every cell holds the index of its region in the
+    region table (`region_ids`, `energy_costs`), or -1 if no region covers it.
+    """
+
+    _rasters: dict[str, "RegionRaster"] = {}
+
+    def __init__(self, size_x: int, size_y: int, regions: list[Region]):
+        self.size_x = size_x
+        self.size_y = size_y
+
+        self.region_ids = [region.id for region in regions]
+        self.energy_costs = np.array(
+            [region.region_energy_cost for region in regions], dtype=np.float64
+        )
+
+        self.raster = np.full((size_x, size_y), -1, dtype=np.int32)
+        for index, region in enumerate(regions):
+            self.raster[region.x_1 : region.x_2, region.y_1 : region.y_2] = index
+
+    @classmethod
+    def get(cls, world_id: str) -> "RegionRaster | None":
+        """Get the cached raster of a world, if one has been built."""
+        return cls._rasters.get(world_id)
+
+    @classmethod
+    def register(cls, world_id: str, raster: "RegionRaster") -> None:
+        """Cache the raster of a world."""
+        cls._rasters[world_id] = raster
+
+    @classmethod
+    def drop(cls, world_id: str) -> None:
+        """Drop the cached raster of a world."""
+        cls._rasters.pop(world_id, None)
+
+    def region_index_at(self, x: int, y: int) -> int:
+        """Get the index of the region at the given coordinates."""
+        if not (0 <= x < self.size_x and 0 <= y < self.size_y) or (
+            self.raster[x, y] < 0
+        ):
+            raise ValueError(f"No region found for coordinates ({x}, {y})")
+        return int(self.raster[x, y])
+
+    def region_id_at(self, x: int, y: int) -> str:
+        """Get the ID of the region at the given coordinates."""
+        return self.region_ids[self.region_index_at(x, y)]
+
+    def energy_cost_at(self, x: int, y: int) -> float:
+        """Get the energy cost of the region at the given coordinates."""
+        return float(self.energy_costs[self.region_index_at(x, y)])
+
+    def path_energy_cost(self, path: list[tuple[int, int]]) -> float:
+        """Get the summed energy cost of all cells of a path in one vectorized lookup."""
+        if not path:
+            return 0.0
+        xs, ys = np.asarray(path, dtype=np.intp).T
+        if (
+            xs.min() < 0
+            or ys.min() < 0
+            or xs.max() >= self.size_x
+            or ys.max() >= self.size_y
+        ):
+            raise ValueError("Path leaves the world boundaries.")
+        indices = self.raster[xs, ys]
+        if (indices < 0).any():
+            raise ValueError("Path crosses cells that are not covered by a region.")
+        return float(self.energy_costs[indices].sum())
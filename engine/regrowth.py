@@ -0,0 +1,63 @@
+import heapq
+import threading
+
+
+class RegrowthScheduler:
+    """Per-simulation priority queue of the ticks at which resources regrow.
+
+    Resources are scheduled when a harvest makes them unavailable, so a world
+    tick only touches the resources that are due instead of checking all of
+    them. The queue only lives in memory. The first world tick schedules the
+    harvested resources from the database, which rebuilds the queue when a
+    simulation is (re)started. While agent ticks run in other processes, every
+    world tick also schedules the resources harvested since `scanned_tick`.
+
+    Entries are hints: a resource that is due but still has harvesters is
+    rescheduled by the caller, and the regrow condition itself is checked in
+    the database.
+    """
+
+    _schedulers: dict[str, "RegrowthScheduler"] = {}
+
+    def __init__(self):
+        self._heap: list[tuple[int, str]] = []
+        self._entries: set[tuple[int, str]] = set()
+        self._lock = threading.Lock()
+        # Tick of the last scan of the database for harvested resources
+        self.scanned_tick = -1
+
+    @classmethod
+    def get(cls, simulation_id: str) -> "RegrowthScheduler | None":
+        """Get the scheduler of a simulation, if one has been built."""
+        return cls._schedulers.get(simulation_id)
+
+    @classmethod
+    def register(cls, simulation_id: str, scheduler: "RegrowthScheduler") -> None:
+        """Register the scheduler of a simulation."""
+        cls._schedulers[simulation_id] = scheduler
+
+    @classmethod
+    def drop(cls, simulation_id: str) -> None:
+        """Drop the scheduler of a simulation."""
+        cls._schedulers.pop(simulation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, resource_id: str, tick: int) -> None:
+        """Schedule a resource to regrow at the given tick, unless it already is."""
+        entry = (tick, resource_id)
+        with self._lock:
+            if entry not in self._entries:
+                self._entries.add(entry)
+                heapq.heappush(self._heap, entry)
+
+    def pop_due(self, tick: int) -> list[str]:
+        """Remove and return the IDs of all resources due to regrow by the given tick."""
+        due = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= tick:
+                entry = heapq.heappop(self._heap)
+                self._entries.discard(entry)
+                due.add(entry[1])
+        return list(due)
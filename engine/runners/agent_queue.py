@@ -0,0 +1,327 @@
+"""
+Agent ticks over a NATS JetStream work queue.
+
+The SimulationRunner publishes one job per agent and tick to the work queue
+stream and waits for their results in a key-value bucket. Stateless workers,
+started with
+
+    uv run python -m engine.runners.agent_queue --concurrency 16
+
+on any machine with access to NATS and the database, run the jobs with
+`AgentRunner.tick_agent` and record their results. A result is keyed by
+simulation, agent and tick and created as a lease of the worker before the job
+runs, so a job that is delivered twice is only run once. The worker renews the
+lease while the job runs. A lease that has not been renewed for
+`settings.workqueue.ackwait` seconds belongs to a worker that died, and is
+taken over by the redelivery of the job.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from faststream.nats import NatsBroker
+from loguru import logger
+from nats.errors import TimeoutError as NatsTimeoutError
+from nats.js.api import (
+    ConsumerConfig,
+    KeyValueConfig,
+    RetentionPolicy,
+    StreamConfig,
+)
+from nats.js.errors import (
+    BucketNotFoundError,
+    KeyNotFoundError,
+    KeyWrongLastSequenceError,
+    NotFoundError,
+)
+from nats.js.kv import KeyValue
+
+from clients.nats import get_nats_broker
+
+from config import settings
+
+from engine import sentiment
+from engine.runners.agent_runner import AgentRunner
+
+from messages.agent.agent_tick_job import AgentTickJobMessage
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Results are only needed until the runner has collected them
+RESULT_TTL = 24 * 60 * 60
+
+# Identifies the worker holding the lease of a job
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class AgentTickQueue:
+    """Work queue of agent tick jobs and their results."""
+
+    def __init__(self, nats: NatsBroker, results: KeyValue):
+        self.nats = nats
+        self.results = results
+
+    @classmethod
+    async def connect(cls, nats: NatsBroker) -> "AgentTickQueue":
+        """Connect to the work queue stream and result bucket, creating them if needed."""
+        js = nats.stream
+        try:
+            await js.stream_info(settings.workqueue.stream)
+        except NotFoundError:
+            await js.add_stream(
+                StreamConfig(
+                    name=settings.workqueue.stream,
+                    subjects=["agent_ticks.>"],
+                    retention=RetentionPolicy.WORK_QUEUE,
+                )
+            )
+        try:
+            results = await js.key_value(settings.workqueue.bucket)
+        except BucketNotFoundError:
+            results = await js.create_key_value(
+                KeyValueConfig(bucket=settings.workqueue.bucket, ttl=RESULT_TTL)
+            )
+        return cls(nats, results)
+
+    @staticmethod
+    def result_key(simulation_id: str, agent_id: str, tick: int) -> str:
+        return f"{simulation_id}.{agent_id}.{tick}"
+
+    @staticmethod
+    def lease() -> bytes:
+        """Result of a job held by this worker, renewed while the job runs."""
+        return json.dumps(
+            {"status": RUNNING, "worker": WORKER_ID, "heartbeat": time.time()}
+        ).encode()
+
+    @staticmethod
+    def is_stale(result: dict) -> bool:
+        """Whether a result is the lease of a worker that stopped renewing it."""
+        return (
+            result["status"] == RUNNING
+            and time.time() - result.get("heartbeat", 0) > settings.workqueue.ackwait
+        )
+
+    async def publish(self, simulation_id: str, tick: int, agent_ids: list[str]):
+        """Publish the tick jobs of agents. Republished jobs are dropped by JetStream."""
+        for agent_id in agent_ids:
+            job = AgentTickJobMessage(
+                id=self.result_key(simulation_id, agent_id, tick),
+                simulation_id=simulation_id,
+                agent_id=agent_id,
+                tick=tick,
+            )
+            await self.nats.stream.publish(
+                job.get_channel_name(),
+                job.model_dump_json().encode(),
+                stream=settings.workqueue.stream,
+                headers={"Nats-Msg-Id": job.id},
+            )
+
+    async def reap_result(self, simulation_id: str, agent_id: str, tick: int) -> dict:
+        """Get the result of a job the runner stopped waiting for.
+
+        A job that no worker has claimed or whose lease is stale is marked as
+        failed, so a later delivery of the job skips it instead of running the
+        turn of a tick the simulation has moved on from.
+        """
+        key = self.result_key(simulation_id, agent_id, tick)
+        failed = {"status": FAILED, "error": "No worker finished the job"}
+        try:
+            entry = await self.results.get(key)
+        except KeyNotFoundError:
+            try:
+                await self.results.create(key, json.dumps(failed).encode())
+                return failed
+            except KeyWrongLastSequenceError:
+                entry = await self.results.get(key)
+
+        result = json.loads(entry.value)
+        if not self.is_stale(result):
+            return result
+        try:
+            await self.results.update(
+                key, json.dumps(failed).encode(), last=entry.revision
+            )
+            return failed
+        except KeyWrongLastSequenceError:
+            return json.loads((await self.results.get(key)).value)
+
+    async def wait(
+        self,
+        simulation_id: str,
+        tick: int,
+        agent_ids: list[str],
+        timeout: float,
+    ) -> dict[str, dict]:
+        """Wait until the jobs of a tick are finished or the timeout passes.
+
+        Returns:
+            The results of the finished jobs by agent ID.
+        """
+        pending = set(agent_ids)
+        finished: dict[str, dict] = {}
+        deadline = time.monotonic() + timeout
+
+        watcher = await self.results.watch(f"{simulation_id}.*.{tick}")
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await watcher.updates(timeout=remaining)
+                except NatsTimeoutError:
+                    break
+                if entry is None or entry.value is None:
+                    continue
+
+                agent_id = entry.key.split(".")[1]
+                result = json.loads(entry.value)
+                if agent_id in pending and result["status"] != RUNNING:
+                    pending.discard(agent_id)
+                    finished[agent_id] = result
+        finally:
+            await watcher.stop()
+        return finished
+
+    async def claim(self, key: str) -> int | None:
+        """Claim a job with a lease, taking over the stale lease of a dead worker.
+
+        Returns:
+            The revision of the lease, None if the job is finished or held by a
+            live worker.
+        """
+        try:
+            return await self.results.create(key, self.lease())
+        except KeyWrongLastSequenceError:
+            pass
+
+        try:
+            entry = await self.results.get(key)
+        except KeyNotFoundError:
+            return None
+        result = json.loads(entry.value)
+        if not self.is_stale(result):
+            return None
+        try:
+            revision = await self.results.update(key, self.lease(), last=entry.revision)
+        except KeyWrongLastSequenceError:
+            return None
+        logger.warning(
+            f"Took over the stale lease of {key} from {result.get('worker')}"
+        )
+        return revision
+
+    async def run_job(
+        self,
+        job: AgentTickJobMessage,
+        progress: Callable[[], Awaitable[None]] | None = None,
+    ) -> str:
+        """Run a tick job unless another delivery of it already has.
+
+        The lease of the job is renewed every half `settings.workqueue.ackwait`,
+        together with `progress`.
+        """
+        key = self.result_key(job.simulation_id, job.agent_id, job.tick)
+        revision = await self.claim(key)
+        if revision is None:
+            logger.debug(
+                f"[SIM {job.simulation_id}][AGENT {job.agent_id}] Tick {job.tick} already claimed, skipping duplicate"
+            )
+            return RUNNING
+
+        async def keep_alive():
+            nonlocal revision
+            while True:
+                await asyncio.sleep(settings.workqueue.ackwait / 2)
+                if progress is not None:
+                    await progress()
+                try:
+                    revision = await self.results.update(
+                        key, self.lease(), last=revision
+                    )
+                except KeyWrongLastSequenceError:
+                    logger.warning(
+                        f"[SIM {job.simulation_id}][AGENT {job.agent_id}] Lost the lease of tick {job.tick}"
+                    )
+                    return
+
+        heartbeat = asyncio.create_task(keep_alive())
+        start = time.perf_counter()
+        result = {"status": DONE}
+        try:
+            await AgentRunner.tick_agent(self.nats, job.agent_id)
+        except Exception as e:
+            logger.exception(
+                f"[SIM {job.simulation_id}][AGENT {job.agent_id}] Tick {job.tick} failed"
+            )
+            result = {"status": FAILED, "error": str(e)}
+        finally:
+            heartbeat.cancel()
+        result["seconds"] = time.perf_counter() - start
+
+        try:
+            await self.results.update(key, json.dumps(result).encode(), last=revision)
+        except KeyWrongLastSequenceError:
+            logger.warning(
+                f"[SIM {job.simulation_id}][AGENT {job.agent_id}] Lease of tick {job.tick} was taken over or given up, dropping the result"
+            )
+        return result["status"]
+
+    async def serve(self, concurrency: int):
+        """Pull and run tick jobs with at most `concurrency` jobs at a time."""
+        subscription = await self.nats.stream.pull_subscribe(
+            "agent_ticks.>",
+            durable="agent-tick-workers",
+            stream=settings.workqueue.stream,
+            config=ConsumerConfig(ack_wait=settings.workqueue.ackwait),
+        )
+        running: set[asyncio.Task] = set()
+        logger.info(f"Agent tick worker serving with concurrency {concurrency}")
+        while True:
+            if len(running) >= concurrency:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            running = {task for task in running if not task.done()}
+            try:
+                messages = await subscription.fetch(
+                    concurrency - len(running), timeout=5
+                )
+            except NatsTimeoutError:
+                continue
+            for message in messages:
+                running.add(asyncio.create_task(self._handle(message)))
+
+    async def _handle(self, message):
+        job = AgentTickJobMessage.model_validate_json(message.data)
+        try:
+            await self.run_job(job, progress=message.in_progress)
+        finally:
+            await message.ack()
+
+
+async def serve(concurrency: int):
+    if settings.sentiment.warmup:
+        sentiment.start_warm_up()
+    async with get_nats_broker() as nats:
+        queue = await AgentTickQueue.connect(nats)
+        await queue.serve(concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(serve(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from faststream.nats import NatsBroker
 from loguru import logger
 import openai
+from sqlmodel import Session
 
 from clients.db import get_session
 
@@ -11,6 +12,8 @@ from engine.llm.autogen.agent import AutogenAgent
 from engine.llm.autogen.conversation import ConversationAgent
 from engine.llm.autogen.harvest import HarvestingAgent
 from engine.llm.autogen.plan import PlanAgent
+from engine.snapshot import WorldSnapshot
+from engine.spatial import SpatialIndex
 
 from services.agent import AgentService
 from services.conversation import ConversationService
@@ -18,13 +21,44 @@ from services.conversation import ConversationService
 from schemas.carcass import Carcass
 from messages.agent.agent_dead import AgentDeadMessage
 
-import asyncio
-
 
 class AgentRunner:
 
     @staticmethod
-    async def tick_agent(nats: NatsBroker, agent_id: str):
+    def _die(db: Session, agent_service: AgentService, agent_id: str) -> Carcass | None:
+        """Mark an agent without energy as dead and leave its carcass.
+
+        Returns:
+            The carcass, None if the agent is dead already or has energy again.
+        """
+        agent = agent_service.get_by_id(agent_id)
+        if agent.dead or agent.energy_level > 0:
+            return None
+
+        agent.dead = True
+        agent.energy_level = 0
+        agent.harvesting_resource_id = None
+        carcass = Carcass(
+            simulation_id=agent.simulation_id,
+            agent_id=agent.id,
+            x_coord=agent.x_coord,
+            y_coord=agent.y_coord,
+            death_tick=agent.simulation.tick,
+        )
+        db.add(agent)
+        db.add(carcass)
+        db.commit()
+        return carcass
+
+    @staticmethod
+    async def tick_agent(
+        nats: NatsBroker, agent_id: str, snapshot: WorldSnapshot | None = None
+    ):
+        """Tick a single agent.
+
+        If a snapshot of the current tick is given, it is used to build the agent's
+        context and to skip conversation lookups the snapshot already rules out.
+        """
         with get_session() as db:
             try:
 
@@ -33,16 +67,19 @@ class AgentRunner:
                 agent = agent_service.get_by_id(agent_id)
 
                 # Check if agent should die from energy depletion
+                carcass = None
                 if not agent.dead and agent.energy_level <= 0:
+                    carcass = agent_service.retry_on_conflict(
+                        agent.simulation_id,
+                        lambda: AgentRunner._die(db, agent_service, agent_id),
+                    )
+                    agent = agent_service.get_by_id(agent_id)
+
+                if carcass is not None:
                     logger.info(
                         f"[SIM {agent.simulation.id}][AGENT {agent.id}] Agent {agent.name} has died from energy depletion!"
                     )
 
-                    # Mark agent as dead and create carcass
-                    agent.dead = True
-                    agent.energy_level = 0
-                    agent.harvesting_resource_id = None
-
                     conversations = agent_service.get_outstanding_conversation_requests(
                         agent.id
                     )
@@ -62,17 +99,17 @@ class AgentRunner:
                             reason="Agent died from energy depletion",
                         )
 
-                    carcass = Carcass(
-                        simulation_id=agent.simulation_id,
-                        agent_id=agent.id,
-                        x_coord=agent.x_coord,
-                        y_coord=agent.y_coord,
-                        death_tick=agent.simulation.tick,
+                    # Finish any remaining conversations with dead participants
+                    conversation_service.finish_conversations_of_dead_agents(
+                        agent.simulation_id
                     )
 
-                    db.add(agent)
-                    db.add(carcass)
-                    db.commit()
+                    index = SpatialIndex.get(agent.simulation_id)
+                    if index is not None:
+                        index.agents.remove(agent.id)
+                        index.carcasses.insert(
+                            carcass.id, carcass.x_coord, carcass.y_coord
+                        )
 
                     death_message = AgentDeadMessage(
                         id=agent.id,
@@ -101,7 +138,10 @@ class AgentRunner:
                     )
                     return
 
-                conversation = conversation_service.get_active_by_agent_id(agent_id)
+                if snapshot is None or snapshot.get_active_conversation(agent_id):
+                    conversation = conversation_service.get_active_by_agent_id(agent_id)
+                else:
+                    conversation = None
 
                 if conversation:
                     last_message = conversation_service.get_last_message(
@@ -120,11 +160,14 @@ class AgentRunner:
                         nats=nats,
                         agent=agent,
                         conversation=conversation,
+                        snapshot=snapshot,
                     )
                     await conversation_agent.generate_with_reasoning()
                     return
 
-                if agent_service.has_initialized_conversation(agent_id):
+                if (
+                    snapshot is None or snapshot.has_initialized_conversation(agent_id)
+                ) and agent_service.has_initialized_conversation(agent_id):
                     logger.info(
                         f"[SIM {agent.simulation.id}][TICK: {agent.simulation.tick}][AGENT {agent.id}][COMMUNICATION] Agent has initialized conversation, skipping tick"
                     )
@@ -138,6 +181,7 @@ class AgentRunner:
                         db=db,
                         nats=nats,
                         agent=agent,
+                        snapshot=snapshot,
                     )
                     await harvesting_agent.generate_with_reasoning()
                     return
@@ -146,17 +190,27 @@ class AgentRunner:
                         agent=agent,
                         db=db,
                         nats=nats,
+                        snapshot=snapshot,
                     )
                     model = AvailableModels.get(agent.agent.model)
 
                     logger.debug(
                         f"[SIM {agent.agent.simulation.id}][AGENT {agent.agent.id}] Ticking"
                     )
-                    if not model.reasoning:
+                    if agent.single_call:
+                        # Reasoning and action in one call
+                        db.refresh(agent.agent)
+                        agent.toggle_tools(use_tools=True)
+                        agent.toggle_parallel_tool_calls(use_parallel=False)
+                        output = await agent.generate_with_reasoning()
+                        reasoning = agent.extract_reasoning(output)
+
+                    elif not model.reasoning:
                         db.refresh(agent.agent)
 
                         agent.toggle_tools(use_tools=False)
                         reasoning_output = await agent.generate(reason=True)
+                        reasoning = reasoning_output.messages[1].content
                         logger.debug(
                             f"[SIM {agent.agent.simulation.id}][AGENT {agent.agent.id}] Ticked with reasoning output: {reasoning_output.messages[1].content}"
                         )
@@ -172,6 +226,7 @@ class AgentRunner:
                         agent.toggle_tools(use_tools=True)
                         agent.toggle_parallel_tool_calls(use_parallel=False)
                         await agent.generate(reason=False, reasoning_output=None)
+                        reasoning = None
 
                         # If planning is enabled, update the plan after generating the action
                         if agent.agent.model == "grok-3-mini":
@@ -182,6 +237,7 @@ class AgentRunner:
                                 db=db,
                                 nats=nats,
                                 agent=agent.agent,
+                                snapshot=snapshot,
                             )
                             await plan_agent.generate(
                                 reason=False,
@@ -193,14 +249,18 @@ class AgentRunner:
                             db=db,
                             nats=nats,
                             agent=agent.agent,
+                            snapshot=snapshot,
                         )
                         memory_agent.toggle_tools(use_tools=True)
                         memory_agent.toggle_parallel_tool_calls(use_parallel=False)
                         await memory_agent.generate(
                             reason=False,
-                            reasoning_output=reasoning_output.messages[1].content,
+                            reasoning_output=reasoning,
                         )
             except openai.RateLimitError as e:
-                logger.warning(f"OpenAI Rate Limit Error: {e}")
-                await asyncio.sleep(60)
+                # Rate limits are retried by the LLMScheduler, only give up the
+                # turn once its retries are exhausted
+                logger.warning(
+                    f"[AGENT {agent_id}] Rate limit retries exhausted, skipping tick: {e}"
+                )
                 return
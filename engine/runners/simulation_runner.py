@@ -1,7 +1,10 @@
 import asyncio
 import json
 import threading
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
 from faststream.nats import NatsBroker
 from loguru import logger
@@ -9,29 +12,61 @@ from sqlmodel import Session, select
 
 from clients.db import get_session
 
+from config import settings
+
+from engine.grid import Grid
+from engine.intents import IntentBuffer
 from engine.llm.autogen.agent import AutogenAgent
+from engine.llm.pool import LLMPool
+from engine.regrowth import RegrowthScheduler
+from engine.runners.agent_queue import FAILED, RUNNING, AgentTickQueue
 from engine.runners.agent_runner import AgentRunner
+from engine.snapshot import WorldSnapshot
+from engine.spatial import SpatialIndex
 
-from messages.agent.agent_action import AgentActionMessage
+from messages.agent.agent_late import AgentLateMessage
 from messages.simulation.simulation_tick import SimulationTickMessage
 from messages.world.resource_grown import ResourceGrownMessage
-from messages.world.resource_harvested import ResourceHarvestedMessage
 
-from services.agent import AgentService
-from services.conversation import ConversationService
+from services.base import ConflictCounter
 from services.relationship import RelationshipService
 from services.resource import ResourceService
 from services.simulation import SimulationService
 from services.world import WorldService
 
-from schemas.action_log import ActionLog
 from schemas.agent import Agent
+from schemas.world import World
+
+if TYPE_CHECKING:
+    from engine.runners.supervisor import SimulationSupervisor
+
+
+@dataclass
+class Straggler:
+    """Agent turn that was still running when the tick deadline passed."""
+
+    task: asyncio.Task
+    tick: int
+    deadline: float
+    finished_at: float | None = field(default=None)
 
 
 class SimulationRunner:
 
     _threads: dict[str, threading.Thread] = {}
     _stop_events: dict[str, threading.Event] = {}
+    # Agent turns carried over to the next tick, per simulation and agent
+    _stragglers: dict[str, dict[str, Straggler]] = {}
+    # Seconds past the deadline of every late turn, per simulation and agent
+    _lateness: dict[str, dict[str, list[float]]] = {}
+    # Concurrent update conflicts of every tick that had any, per simulation
+    _conflicts: dict[str, dict[int, int]] = {}
+    # Agent tick work queue and agents with unfinished remote turns, per simulation
+    _queues: dict[str, AgentTickQueue] = {}
+    _remote_pending: dict[str, dict[str, int]] = {}
+    # Hosts the simulation loops in worker processes if installed, see
+    # engine.runners.supervisor
+    _supervisor: "SimulationSupervisor | None" = None
 
     @staticmethod
     def start_simulation(
@@ -48,24 +83,31 @@ class SimulationRunner:
         db.add(simulation)
         db.commit()
 
-        # Start the simulation loop in a separate thread
+        if SimulationRunner._supervisor is not None:
+            SimulationRunner._supervisor.start(simulation.id, tick_interval)
+        else:
+            SimulationRunner._start_thread(simulation.id, tick_interval, nats)
+
+        return simulation.tick
+
+    @staticmethod
+    def _start_thread(id: str, tick_interval: int, nats: NatsBroker) -> None:
+        """Start the simulation loop in a separate thread of this process."""
         if (
-            simulation.id not in SimulationRunner._threads
-            or not SimulationRunner._threads[simulation.id].is_alive()
+            id not in SimulationRunner._threads
+            or not SimulationRunner._threads[id].is_alive()
         ):
             stop_event = threading.Event()
             SimulationRunner._stop_events[id] = stop_event
 
             thread = threading.Thread(
                 target=SimulationRunner._run_loop_in_thread,
-                args=(simulation.id, stop_event, tick_interval, nats),
+                args=(id, stop_event, tick_interval, nats),
                 daemon=True,
             )
             SimulationRunner._threads[id] = thread
             thread.start()
 
-        return simulation.tick
-
     @staticmethod
     def stop_simulation(id: str, db: Session, nats: NatsBroker):
         # Update the simulation status in the database
@@ -76,6 +118,15 @@ class SimulationRunner:
         db.add(simulation)
         db.commit()
 
+        if SimulationRunner._supervisor is not None:
+            SimulationRunner._supervisor.stop(id)
+        else:
+            SimulationRunner._stop_thread(id)
+        return simulation.tick
+
+    @staticmethod
+    def _stop_thread(id: str) -> None:
+        """Signal the simulation thread of this process to stop and wait for it."""
         logger.debug(SimulationRunner._stop_events)
         stop_event = SimulationRunner._stop_events.get(id)
         if stop_event:
@@ -84,8 +135,6 @@ class SimulationRunner:
         thread = SimulationRunner._threads.get(id)
         if thread is not None:
             # Check if we're trying to join from within the same thread
-            import threading
-
             current_thread = threading.current_thread()
             if thread != current_thread:
                 thread.join()
@@ -96,7 +145,185 @@ class SimulationRunner:
                 logger.debug(
                     f"Simulation {id} stopping from within simulation thread - cleanup will happen automatically"
                 )
-        return simulation.tick
+
+    @staticmethod
+    def get_running_simulations() -> list[str]:
+        """Get the IDs of the simulations with a live thread in this process."""
+        return [
+            id for id, thread in SimulationRunner._threads.items() if thread.is_alive()
+        ]
+
+    @staticmethod
+    def get_lateness(simulation_id: str) -> dict[str, dict[str, float]]:
+        """Get the lateness statistics of every agent that missed a tick deadline."""
+        return {
+            agent_id: {
+                "late_turns": len(seconds),
+                "total_seconds_late": sum(seconds),
+                "max_seconds_late": max(seconds),
+            }
+            for agent_id, seconds in SimulationRunner._lateness.get(
+                simulation_id, {}
+            ).items()
+        }
+
+    @staticmethod
+    def get_conflicts(simulation_id: str) -> dict[int, int]:
+        """Get the number of concurrent update conflicts of every tick that had any."""
+        return dict(SimulationRunner._conflicts.get(simulation_id, {}))
+
+    @staticmethod
+    async def collect_stragglers(nats: NatsBroker, simulation_id: str, tick: int):
+        """Collect the late agent turns that finished since the last tick boundary.
+
+        Their actions have been applied by now, so they are logged as part of the
+        boundary to `tick` and their lateness is recorded.
+        """
+        stragglers = SimulationRunner._stragglers.get(simulation_id, {})
+        for agent_id, straggler in list(stragglers.items()):
+            if not straggler.task.done():
+                continue
+            del stragglers[agent_id]
+
+            if not straggler.task.cancelled() and straggler.task.exception():
+                logger.opt(exception=straggler.task.exception()).error(
+                    f"[SIM {simulation_id}][AGENT {agent_id}] Late turn of tick {straggler.tick} failed"
+                )
+
+            finished_at = straggler.finished_at or time.monotonic()
+            seconds_late = max(0.0, finished_at - straggler.deadline)
+            SimulationRunner._lateness.setdefault(simulation_id, {}).setdefault(
+                agent_id, []
+            ).append(seconds_late)
+            logger.info(
+                f"[SIM {simulation_id}][AGENT {agent_id}] Turn of tick {straggler.tick} applied at tick {tick}, {seconds_late:.2f}s late"
+            )
+
+            late_message = AgentLateMessage(
+                id=agent_id,
+                simulation_id=simulation_id,
+                agent_id=agent_id,
+                tick=straggler.tick,
+                applied_tick=tick,
+                seconds_late=seconds_late,
+            )
+            await late_message.publish(nats)
+
+    @staticmethod
+    async def tick_agents(
+        nats: NatsBroker,
+        simulation_id: str,
+        tick: int,
+        agent_ids: list[str],
+        snapshot: WorldSnapshot,
+    ):
+        """Tick all agents, waiting at most `settings.tick_deadline` seconds.
+
+        Agents that are still running at the deadline keep running and are
+        skipped until their turn has been collected at a later tick boundary.
+        """
+        if settings.workqueue.enabled:
+            await SimulationRunner.tick_agents_remote(
+                nats, simulation_id, tick, agent_ids
+            )
+            return
+
+        if settings.tick_deadline is None:
+            await asyncio.gather(
+                *[
+                    AgentRunner.tick_agent(nats, agent_id, snapshot=snapshot)
+                    for agent_id in agent_ids
+                ]
+            )
+            return
+
+        stragglers = SimulationRunner._stragglers.setdefault(simulation_id, {})
+        tasks = {
+            agent_id: asyncio.create_task(
+                AgentRunner.tick_agent(nats, agent_id, snapshot=snapshot)
+            )
+            for agent_id in agent_ids
+            if agent_id not in stragglers
+        }
+        if not tasks:
+            return
+
+        deadline = time.monotonic() + settings.tick_deadline
+        _, pending = await asyncio.wait(tasks.values(), timeout=settings.tick_deadline)
+
+        for agent_id, task in tasks.items():
+            if task not in pending:
+                if not task.cancelled() and task.exception():
+                    logger.opt(exception=task.exception()).error(
+                        f"[SIM {simulation_id}][AGENT {agent_id}] Tick failed"
+                    )
+                continue
+
+            straggler = Straggler(task=task, tick=tick, deadline=deadline)
+            task.add_done_callback(
+                lambda _, straggler=straggler: setattr(
+                    straggler, "finished_at", time.monotonic()
+                )
+            )
+            stragglers[agent_id] = straggler
+            logger.warning(
+                f"[SIM {simulation_id}][AGENT {agent_id}] Missed the deadline of tick {tick}, carrying the turn over"
+            )
+
+    @staticmethod
+    async def tick_agents_remote(
+        nats: NatsBroker, simulation_id: str, tick: int, agent_ids: list[str]
+    ):
+        """Tick all agents through the agent tick work queue.
+
+        Waits at most `settings.tick_deadline` seconds, or
+        `settings.workqueue.timeout` without a deadline. Agents whose job is not
+        finished by then are skipped until it is, or until the job turns out to
+        be unclaimed or held by a worker that died at the next tick.
+        """
+        queue = SimulationRunner._queues.get(simulation_id)
+        if queue is None:
+            queue = await AgentTickQueue.connect(nats)
+            SimulationRunner._queues[simulation_id] = queue
+
+        pending = SimulationRunner._remote_pending.setdefault(simulation_id, {})
+        for agent_id, pending_tick in list(pending.items()):
+            result = await queue.reap_result(simulation_id, agent_id, pending_tick)
+            if result["status"] == RUNNING:
+                continue
+            if result["status"] == FAILED:
+                logger.error(
+                    f"[SIM {simulation_id}][AGENT {agent_id}] Late turn of tick {pending_tick} failed: {result.get('error')}"
+                )
+            else:
+                logger.info(
+                    f"[SIM {simulation_id}][AGENT {agent_id}] Late turn of tick {pending_tick} finished"
+                )
+            del pending[agent_id]
+
+        agent_ids = [agent_id for agent_id in agent_ids if agent_id not in pending]
+        if not agent_ids:
+            return
+        await queue.publish(simulation_id, tick, agent_ids)
+
+        timeout = (
+            settings.tick_deadline
+            if settings.tick_deadline is not None
+            else settings.workqueue.timeout
+        )
+        results = await queue.wait(simulation_id, tick, agent_ids, timeout)
+
+        for agent_id in agent_ids:
+            result = results.get(agent_id)
+            if result is None:
+                pending[agent_id] = tick
+                logger.warning(
+                    f"[SIM {simulation_id}][AGENT {agent_id}] Missed the deadline of tick {tick}, carrying the turn over"
+                )
+            elif result["status"] == FAILED:
+                logger.error(
+                    f"[SIM {simulation_id}][AGENT {agent_id}] Tick failed: {result.get('error')}"
+                )
 
     @staticmethod
     async def tick_simulation(db: Session, nats: NatsBroker, simulation_id: str):
@@ -106,6 +333,12 @@ class SimulationRunner:
         """
         simulation_service = SimulationService(db, nats)
         simulation = simulation_service.get_by_id(simulation_id)
+
+        # Late turns that finished since the last tick are applied at this boundary
+        await SimulationRunner.collect_stragglers(
+            nats, simulation.id, simulation.tick + 1
+        )
+
         simulation.tick += 1
         simulation.last_used = datetime.now(timezone.utc).isoformat()
         db.add(simulation)
@@ -126,11 +359,11 @@ class SimulationRunner:
             tick_message.model_dump_json(), tick_message.get_channel_name()
         )
 
-        agent_ids = db.exec(
-            select(Agent.id).where(
-                Agent.simulation_id == simulation.id, Agent.dead == False
-            )
-        ).all()
+        # Load one read-only snapshot of the world that is shared by all agents
+        with get_session() as snapshot_db:
+            snapshot = WorldSnapshot.load(snapshot_db, simulation.id)
+
+        agent_ids = snapshot.get_alive_agent_ids()
 
         # If no alive agents, stop simulation
         if not agent_ids:
@@ -140,8 +373,26 @@ class SimulationRunner:
             SimulationRunner.stop_simulation(simulation.id, db, nats)
             return
 
-        tasks = [AgentRunner.tick_agent(nats, agent_id) for agent_id in agent_ids]
-        await asyncio.gather(*tasks)
+        if settings.intents.enabled and IntentBuffer.get(simulation.id) is None:
+            IntentBuffer.register(simulation.id, IntentBuffer(simulation.id))
+
+        await SimulationRunner.tick_agents(
+            nats, simulation.id, simulation.tick, agent_ids, snapshot
+        )
+
+        # Apply the intents recorded by the agents' tools in one transaction
+        buffer = IntentBuffer.get(simulation.id)
+        if buffer is not None:
+            await buffer.resolve(db, nats, simulation.tick)
+
+        conflicts = ConflictCounter.pop(simulation.id)
+        if conflicts:
+            SimulationRunner._conflicts.setdefault(simulation.id, {})[
+                simulation.tick
+            ] = conflicts
+            logger.info(
+                f"[SIM {simulation.id}] {conflicts} concurrent update conflicts at tick {simulation.tick}"
+            )
 
         relationship_service = RelationshipService(db, nats)
         relationship_service.snapshot_relationship_graph(
@@ -158,20 +409,18 @@ class SimulationRunner:
         world = world_service.get_by_id(world_id)
         tick_counter = world.simulation.tick
 
-        # Cleanup outstanding conversations for dead agents
-        relationship_service = ConversationService(db, nats)
-        agent_service = AgentService(db, nats)
-        conversations = relationship_service.get_by_simulation_id(world.simulation_id)
-        for convo in conversations:
-            agent_a = agent_service.get_by_id(convo.agent_a_id)
-            agent_b = agent_service.get_by_id(convo.agent_b_id)
-            if (agent_a.dead or agent_b.dead) and not convo.finished:
-                convo.finished = True
-                db.add(convo)
-        db.commit()
+        resource_service = ResourceService(db, nats)
 
-        for resource in world.resources:
-            await SimulationRunner.tick_resource(db, nats, resource.id)
+        # Regrow the resources that are due in one statement
+        grown = resource_service.regrow_resources(world, tick_counter)
+        db.commit()
+        for resource_id, x, y in grown:
+            grown_message = ResourceGrownMessage(
+                simulation_id=world.simulation_id,
+                id=resource_id,
+                location=(x, y),
+            )
+            await grown_message.publish(nats)
 
         await nats.publish(
             json.dumps(
@@ -183,83 +432,6 @@ class SimulationRunner:
             f"simulation.{world.simulation.id}.world.{world.id}",
         )
 
-    @staticmethod
-    async def tick_resource(db: Session, nats: NatsBroker, resource_id: str):
-        """Update the resource"""
-        resource_service = ResourceService(db, nats)
-        resource = resource_service.get_by_id(resource_id)
-        tick = resource.simulation.tick
-
-        # Resource has regrown and is available for harvesting
-        if (
-            not resource.available
-            and len(resource.harvesters) == 0
-            and resource.last_harvest != -1
-            and resource.last_harvest + resource.regrow_time <= tick
-        ):
-            resource.available = True
-            resource.time_harvest = -1
-            db.add(resource)
-            db.commit()
-            grown_message = ResourceGrownMessage(
-                simulation_id=resource.world.simulation_id,
-                id=resource.id,
-                location=(resource.x_coord, resource.y_coord),
-            )
-            await grown_message.publish(nats)
-
-        # Resource is being harvested by enough agents and the harvest is finished
-        harvesters = resource.harvesters
-        if (
-            resource.available
-            and len(harvesters) >= resource.required_agents
-            #            and resource.start_harvest + resource.mining_time <= tick
-        ):
-            resource.available = False
-            resource.last_harvest = tick
-
-            all_harvesters = ",".join([f"{h.name} (ID:{h.id})" for h in harvesters])
-
-            for harv in harvesters:
-
-                # Update harvester's energy level
-                harv.energy_level += resource.energy_yield
-                harv.harvesting_resource_id = None
-                db.add(harv)
-
-                action_log = ActionLog(
-                    agent_id=harv.id,
-                    simulation_id=resource.world.simulation_id,
-                    tick=resource.simulation.tick,
-                    action=f"harvested_resource_finished(resource_id={resource.id}, location=({resource.x_coord}, {resource.y_coord}), energy_yield={resource.energy_yield}) together with {all_harvesters}. You successfully harvested the resource and gained {resource.energy_yield} energy. It is now not available anymore.",
-                )
-                db.add(action_log)
-
-                agent_action_message = AgentActionMessage(
-                    id=action_log.id,
-                    simulation_id=action_log.simulation_id,
-                    agent_id=action_log.agent_id,
-                    action=action_log.action,
-                    tick=action_log.tick,
-                    created_at=action_log.created_at,
-                )
-                await agent_action_message.publish(nats)
-
-                resource_harvested_message = ResourceHarvestedMessage(
-                    simulation_id=resource.world.simulation_id,
-                    id=resource.id,
-                    harvester_id=str([harv.id for harv in harvesters]),
-                    location=(resource.x_coord, resource.y_coord),
-                    start_tick=tick,
-                    end_tick=tick,
-                    new_energy_level=harv.energy_level,
-                )
-
-                await resource_harvested_message.publish(nats)
-
-            db.add(resource)
-            db.commit()
-
     @staticmethod
     def _run_loop_in_thread(
         simulation_id: str,
@@ -286,7 +458,11 @@ class SimulationRunner:
         db: Session,
         nats: NatsBroker,
     ):
+        world_id = None
         try:
+            world_id = db.exec(
+                select(World.id).where(World.simulation_id == simulation_id)
+            ).first()
             while not stop_event.is_set():
                 try:
                     await SimulationRunner.tick_simulation(
@@ -302,4 +478,18 @@ class SimulationRunner:
                 del SimulationRunner._threads[simulation_id]
             if simulation_id in SimulationRunner._stop_events:
                 del SimulationRunner._stop_events[simulation_id]
+            for straggler in SimulationRunner._stragglers.pop(
+                simulation_id, {}
+            ).values():
+                straggler.task.cancel()
+            SimulationRunner._queues.pop(simulation_id, None)
+            SimulationRunner._remote_pending.pop(simulation_id, None)
+            await LLMPool.close()
+            SpatialIndex.drop(simulation_id)
+            if world_id is not None:
+                Grid.drop(world_id)
+            RegrowthScheduler.drop(simulation_id)
+            IntentBuffer.drop(simulation_id)
+            SimulationRunner._conflicts.pop(simulation_id, None)
+            ConflictCounter.pop(simulation_id)
             logger.info(f"Simulation {simulation_id} shutdown gracefully")
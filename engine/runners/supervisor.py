@@ -0,0 +1,251 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+from loguru import logger
+
+from clients.nats import get_nats_broker
+
+from config import settings
+
+from engine import sentiment
+from engine.runners.simulation_runner import SimulationRunner
+
+
+@dataclass
+class WorkerReport:
+    """Liveness report a worker process sends to the supervisor."""
+
+    index: int
+    pid: int
+    simulations: list[str]
+    sent_at: float
+    # Number of commands the worker has processed
+    processed: int
+
+
+@dataclass
+class Worker:
+    """Worker process hosting a shard of simulations, as seen by the supervisor."""
+
+    index: int
+    process: multiprocessing.Process
+    commands: multiprocessing.Queue
+    simulations: dict[str, int] = field(default_factory=dict)
+    running: list[str] = field(default_factory=list)
+    # Number of commands sent, and the number of the start command per simulation
+    sent: int = 0
+    started: dict[str, int] = field(default_factory=dict)
+    last_seen: float | None = None
+    restarts: int = 0
+
+
+def _run_worker(
+    index: int,
+    commands: multiprocessing.Queue,
+    reports: multiprocessing.Queue,
+    heartbeat: float,
+) -> None:
+    """Entry point of a worker process."""
+    asyncio.run(_serve_worker(index, commands, reports, heartbeat))
+
+
+async def _serve_worker(
+    index: int,
+    commands: multiprocessing.Queue,
+    reports: multiprocessing.Queue,
+    heartbeat: float,
+) -> None:
+    """Run the simulations of a worker in its threads until it is shut down.
+
+    Every command is answered, and the worker reports at least once per
+    heartbeat, with the simulations that are still running in the worker.
+    """
+    logger.info(f"[WORKER {index}] Started with pid {os.getpid()}")
+    processed = 0
+    if settings.sentiment.warmup:
+        sentiment.start_warm_up()
+    async with get_nats_broker() as nats:
+        while True:
+            try:
+                command, simulation_id, tick_interval = await asyncio.to_thread(
+                    commands.get, True, heartbeat
+                )
+            except queue.Empty:
+                command = None
+            else:
+                processed += 1
+
+            if command == "start":
+                SimulationRunner._start_thread(simulation_id, tick_interval, nats)
+            elif command == "stop":
+                await asyncio.to_thread(SimulationRunner._stop_thread, simulation_id)
+            elif command == "shutdown":
+                for simulation_id in SimulationRunner.get_running_simulations():
+                    await asyncio.to_thread(
+                        SimulationRunner._stop_thread, simulation_id
+                    )
+                break
+
+            reports.put(
+                WorkerReport(
+                    index=index,
+                    pid=os.getpid(),
+                    simulations=SimulationRunner.get_running_simulations(),
+                    sent_at=time.time(),
+                    processed=processed,
+                )
+            )
+    logger.info(f"[WORKER {index}] Shut down")
+
+
+class SimulationSupervisor:
+    """Hosts simulations in worker processes instead of threads of the API.
+
+    Every worker process runs a shard of the simulations, each in its own thread
+    with its own event loop as in the API process, so simulations in different
+    workers do not share the GIL with each other or with the API. Simulations
+    are assigned to the worker hosting the fewest of them.
+
+    The supervisor talks to its workers over multiprocessing queues. A monitor
+    thread collects the liveness reports of the workers and restarts workers
+    whose process died, together with the simulations assigned to them.
+    """
+
+    def __init__(self, processes: int, heartbeat: float):
+        self.heartbeat = heartbeat
+        self._context = multiprocessing.get_context("spawn")
+        self._reports = self._context.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._workers = [self._spawn(index) for index in range(processes)]
+        self._monitor = threading.Thread(target=self._run_monitor, daemon=True)
+        self._monitor.start()
+
+    @classmethod
+    def install(cls, processes: int, heartbeat: float) -> "SimulationSupervisor":
+        """Start a supervisor and let the SimulationRunner host simulations in it."""
+        supervisor = cls(processes, heartbeat)
+        SimulationRunner._supervisor = supervisor
+        logger.info(f"Supervisor started {processes} worker processes")
+        return supervisor
+
+    def _spawn(self, index: int, restarts: int = 0) -> Worker:
+        commands = self._context.Queue()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(index, commands, self._reports, self.heartbeat),
+            name=f"simulation-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return Worker(
+            index=index, process=process, commands=commands, restarts=restarts
+        )
+
+    def start(self, simulation_id: str, tick_interval: int = 0) -> None:
+        """Start a simulation on the worker hosting the fewest simulations."""
+        with self._lock:
+            worker = next(
+                (w for w in self._workers if simulation_id in w.simulations),
+                None,
+            ) or min(self._workers, key=lambda w: len(w.simulations))
+            self._send_start(worker, simulation_id, tick_interval)
+        logger.info(f"[SIM {simulation_id}] Assigned to worker {worker.index}")
+
+    def stop(self, simulation_id: str) -> None:
+        """Stop a simulation on the worker hosting it."""
+        with self._lock:
+            for worker in self._workers:
+                if worker.simulations.pop(simulation_id, None) is not None:
+                    worker.started.pop(simulation_id, None)
+                    self._send(worker, ("stop", simulation_id, None))
+
+    def _send(self, worker: Worker, command: tuple) -> None:
+        worker.commands.put(command)
+        worker.sent += 1
+
+    def _send_start(
+        self, worker: Worker, simulation_id: str, tick_interval: int
+    ) -> None:
+        worker.simulations[simulation_id] = tick_interval
+        self._send(worker, ("start", simulation_id, tick_interval))
+        worker.started[simulation_id] = worker.sent
+
+    def status(self) -> list[dict]:
+        """Get the liveness of every worker and the simulations running in it."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive()
+                    and worker.last_seen is not None
+                    and now - worker.last_seen < 3 * self.heartbeat,
+                    "seconds_since_report": (
+                        now - worker.last_seen if worker.last_seen else None
+                    ),
+                    "restarts": worker.restarts,
+                    "assigned": list(worker.simulations),
+                    "running": worker.running,
+                }
+                for worker in self._workers
+            ]
+
+    def _run_monitor(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                report: WorkerReport = self._reports.get(timeout=self.heartbeat)
+            except queue.Empty:
+                report = None
+
+            with self._lock:
+                if report is not None:
+                    worker = self._workers[report.index]
+                    if worker.process.pid == report.pid:
+                        worker.last_seen = report.sent_at
+                        worker.running = report.simulations
+                        # Simulations that stopped on their own in the worker are
+                        # not restarted with it
+                        for simulation_id, started in list(worker.started.items()):
+                            if (
+                                report.processed >= started
+                                and simulation_id not in report.simulations
+                            ):
+                                logger.info(
+                                    f"[SIM {simulation_id}] No longer running in worker {worker.index}"
+                                )
+                                worker.simulations.pop(simulation_id, None)
+                                worker.started.pop(simulation_id)
+
+                if self._stopped.is_set():
+                    break
+                for index, worker in enumerate(self._workers):
+                    if worker.process.is_alive():
+                        continue
+                    logger.warning(
+                        f"[WORKER {index}] Process died with exit code {worker.process.exitcode}, restarting"
+                    )
+                    replacement = self._spawn(index, restarts=worker.restarts + 1)
+                    for simulation_id, tick_interval in worker.simulations.items():
+                        self._send_start(replacement, simulation_id, tick_interval)
+                    self._workers[index] = replacement
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Stop all simulations and worker processes."""
+        self._stopped.set()
+        SimulationRunner._supervisor = None
+        with self._lock:
+            for worker in self._workers:
+                self._send(worker, ("shutdown", None, None))
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                logger.warning(f"[WORKER {worker.index}] Did not shut down, killing")
+                worker.process.kill()
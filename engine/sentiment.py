@@ -1,25 +1,288 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
 import numpy as np
+from loguru import logger
 from scipy.special import softmax
-from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from config import settings
 
 """
 Sentiment analysis using the CardiffNLP Twitter RoBERTa model.
+
+The model runs on one of the backends below, selected by
+`settings.sentiment.backend`. It is loaded on first use, or ahead of time by
+`start_warm_up`, so importing this module does not load torch and transformers.
 """
 MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment-latest"
 
-# Lazy initialization: skip automatic download in offline environments
-_tokenizer = None
-_config = None
-_model = None
-try:
-    _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    _config = AutoConfig.from_pretrained(MODEL_NAME)
-    _model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-except Exception:
-    # likely offline or no HF access: disable sentiment analysis
-    _tokenizer = None
-    _config = None
-    _model = None
+
+def _scores_from_logits(logits: np.ndarray, config) -> list[float]:
+    """Turn the logits of a batch into scores between -1.0 and 1.0."""
+    probs = softmax(logits, axis=-1)
+    label2id = {label: idx for idx, label in config.id2label.items()}
+    neg = probs[:, label2id.get("negative", 0)]
+    pos = probs[:, label2id.get("positive", probs.shape[1] - 1)]
+    return (pos - neg).astype(np.float64).tolist()
+
+
+class SentimentBackend:
+    """Scores batches of preprocessed messages."""
+
+    name: str
+
+    def load(self) -> None:
+        """Load the model, raising if it is not available."""
+
+    def score(self, texts: list[str]) -> list[float]:
+        """Score every text between -1.0 (negative) and 1.0 (positive)."""
+        raise NotImplementedError
+
+
+class TorchBackend(SentimentBackend):
+    """The RoBERTa model in full precision on PyTorch."""
+
+    name = "torch"
+
+    def load(self) -> None:
+        from transformers import (
+            AutoConfig,
+            AutoModelForSequenceClassification,
+            AutoTokenizer,
+        )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.config = AutoConfig.from_pretrained(MODEL_NAME)
+        self.model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+
+    def score(self, texts: list[str]) -> list[float]:
+        import torch
+
+        inputs = self.tokenizer(
+            texts, return_tensors="pt", padding=True, truncation=True
+        )
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits.numpy()
+        return _scores_from_logits(logits, self.config)
+
+
+class OnnxBackend(SentimentBackend):
+    """The RoBERTa model with int8 weights on ONNX Runtime.
+
+    The model is exported to ONNX and its weights are quantized dynamically on
+    first use, and the result is stored at `settings.sentiment.onnxpath` for
+    later runs. Needs the onnx and onnxruntime packages.
+    """
+
+    name = "onnx"
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.sentiment.onnxpath
+
+    def load(self) -> None:
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.config = AutoConfig.from_pretrained(MODEL_NAME)
+        if not os.path.exists(self.path):
+            self.export(self.path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = onnxruntime.InferenceSession(
+            self.path, options, providers=["CPUExecutionProvider"]
+        )
+
+    @staticmethod
+    def export(path: str) -> None:
+        """Export the model to ONNX with its weights quantized to int8."""
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        logger.info(f"Exporting quantized sentiment model to {path}")
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+        model.eval()
+        inputs = tokenizer(["Nice to meet you!"], return_tensors="pt")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Other processes may export at the same time, so only the final
+        # rename makes the model visible
+        root, extension = os.path.splitext(path)
+        full_precision = f"{root}.{os.getpid()}.fp32{extension}"
+        quantized = f"{root}.{os.getpid()}{extension}"
+        try:
+            with torch.inference_mode():
+                torch.onnx.export(
+                    model,
+                    (inputs["input_ids"], inputs["attention_mask"]),
+                    full_precision,
+                    input_names=["input_ids", "attention_mask"],
+                    output_names=["logits"],
+                    dynamic_axes={
+                        "input_ids": {0: "batch", 1: "sequence"},
+                        "attention_mask": {0: "batch", 1: "sequence"},
+                        "logits": {0: "batch"},
+                    },
+                    opset_version=17,
+                )
+            quantize_dynamic(full_precision, quantized, weight_type=QuantType.QInt8)
+            os.replace(quantized, path)
+        finally:
+            for temporary in (full_precision, quantized):
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+
+    def score(self, texts: list[str]) -> list[float]:
+        inputs = self.tokenizer(
+            texts, return_tensors="np", padding=True, truncation=True
+        )
+        (logits,) = self.session.run(
+            ["logits"],
+            {
+                "input_ids": inputs["input_ids"].astype(np.int64),
+                "attention_mask": inputs["attention_mask"].astype(np.int64),
+            },
+        )
+        return _scores_from_logits(logits, self.config)
+
+
+# Valence of words and emoticons, from -3 (very negative) to 3 (very positive)
+LEXICON = {
+    **dict.fromkeys("love excellent amazing wonderful fantastic perfect".split(), 3.0),
+    **dict.fromkeys(
+        "great happy glad thanks thank grateful awesome friend friends delighted "
+        "beautiful best :) :-) :d".split(),
+        2.0,
+    ),
+    **dict.fromkeys(
+        "good nice like hello hi welcome help agree together share sure yes "
+        "pleasure kind fine fair enjoy hope cool safe trust better".split(),
+        1.0,
+    ),
+    **dict.fromkeys(
+        "no sorry busy tired hungry alone wait leave doubt problem lost difficult "
+        "worried unfortunately".split(),
+        -1.0,
+    ),
+    **dict.fromkeys(
+        "bad sad angry annoyed unfair wrong stupid selfish liar lie steal stole "
+        "enemy dying died dead death starving worse fail failed useless "
+        ":( :-(".split(),
+        -2.0,
+    ),
+    **dict.fromkeys("hate terrible awful horrible worst disgusting kill".split(), -3.0),
+}
+NEGATIONS = set(
+    "not never nothing nobody none neither nor cannot don't doesn't didn't won't "
+    "wouldn't can't couldn't isn't aren't wasn't weren't shouldn't dont cant "
+    "wont".split()
+)
+INTENSIFIERS = set("very really so extremely totally truly too".split())
+TOKEN_PATTERN = re.compile(r"[:;]-?[()dp]|[a-z']+")
+
+
+class LexiconBackend(SentimentBackend):
+    """Sums the valences of known words, a tiny fraction of the model's cost.
+
+    Valences are flipped within three words after a negation and increased by
+    half after an intensifier. The sum is normalized to (-1, 1) like in VADER.
+    """
+
+    name = "lexicon"
+    # Sum of valences at which the score reaches about 0.6
+    alpha = 15.0
+
+    def score(self, texts: list[str]) -> list[float]:
+        return [self._score(text) for text in texts]
+
+    def _score(self, text: str) -> float:
+        total = 0.0
+        negated = 0
+        boost = 1.0
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in NEGATIONS:
+                negated = 3
+                continue
+            if token in INTENSIFIERS:
+                boost = 1.5
+                continue
+            valence = LEXICON.get(token)
+            if valence is not None:
+                total += valence * boost * (-0.75 if negated else 1.0)
+            boost = 1.0
+            negated = max(0, negated - 1)
+        return total / math.sqrt(total * total + self.alpha)
+
+
+BACKENDS: dict[str, type[SentimentBackend]] = {
+    backend.name: backend for backend in (TorchBackend, OnnxBackend, LexiconBackend)
+}
+
+_backend: SentimentBackend | None = None
+# Set once loading finished, whether or not the model could be loaded
+_loaded = threading.Event()
+_load_lock = threading.Lock()
+# Running warm-up tasks, the event loop only keeps weak references to tasks
+_warm_up_tasks: set[asyncio.Task] = set()
+
+
+def load_model() -> bool:
+    """Load the model of the configured backend unless it has been loaded already.
+
+    Returns:
+        Whether the model is available.
+    """
+    global _backend
+    with _load_lock:
+        if not _loaded.is_set():
+            start = time.perf_counter()
+            try:
+                backend = BACKENDS[settings.sentiment.backend]()
+                backend.load()
+                _backend = backend
+                logger.info(
+                    f"Loaded {backend.name} sentiment backend in {time.perf_counter() - start:.1f}s"
+                )
+            except Exception as e:
+                # likely offline or no HF access: disable sentiment analysis
+                logger.warning(f"Sentiment model not available, scoring neutral: {e}")
+                _backend = None
+            _loaded.set()
+    return _backend is not None
+
+
+def is_ready() -> bool:
+    """Whether messages can be scored without waiting for the model to load."""
+    return _loaded.is_set()
+
+
+async def warm_up() -> None:
+    """Load the model in a worker thread, keeping the event loop responsive."""
+    await asyncio.to_thread(load_model)
+
+
+def start_warm_up() -> asyncio.Task:
+    """Run `warm_up` as a background task of the running event loop."""
+    task = asyncio.create_task(warm_up(), name="sentiment-warm-up")
+    _warm_up_tasks.add(task)
+    task.add_done_callback(_warm_up_tasks.discard)
+    return task
 
 
 def preprocess(text: str) -> str:
@@ -34,20 +297,229 @@ def preprocess(text: str) -> str:
     return " ".join(tokens)
 
 
+class SentimentCache:
+    """Least recently used scores of preprocessed messages.
+
+    Scores are keyed by a hash of the backend and the preprocessed text, so
+    repeated messages such as greetings and the reasons of ended conversations
+    are only scored once. With `settings.sentiment.cachepath`, new scores are
+    appended to a JSON lines file and loaded again on the next start. The file
+    is rewritten with the cached entries whenever it grew to twice the cache
+    size, on load and while scores are stored.
+    """
+
+    _instance: "SentimentCache | None" = None
+    _lock = threading.Lock()
+
+    def __init__(self, size: int, path: str | None = None):
+        self.size = size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._scores: OrderedDict[str, float] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Lines in the file at `path`
+        self._lines = 0
+
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._put(entry["key"], entry["score"])
+                        self._lines += 1
+            logger.info(f"Loaded {len(self._scores)} sentiment scores from {path}")
+            if self._lines > 2 * size:
+                self._compact()
+
+    @classmethod
+    def get(cls) -> "SentimentCache | None":
+        """Get the cache of this process, None if caching is disabled."""
+        with cls._lock:
+            if cls._instance is None and settings.sentiment.cachesize > 0:
+                cls._instance = cls(
+                    settings.sentiment.cachesize, settings.sentiment.cachepath
+                )
+            return cls._instance
+
+    @staticmethod
+    def key(backend: str, text: str) -> str:
+        return hashlib.sha256(f"{backend}\0{text}".encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> float | None:
+        """Get the cached score of a key, counting the hit or miss."""
+        with self._cache_lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def store(self, scores: dict[str, float]) -> None:
+        """Cache the scores of keys, evicting the least recently used ones."""
+        with self._cache_lock:
+            for key, score in scores.items():
+                self._put(key, score)
+            if self.path is not None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as file:
+                    for key, score in scores.items():
+                        file.write(json.dumps({"key": key, "score": score}) + "\n")
+                self._lines += len(scores)
+                if self._lines > 2 * self.size:
+                    self._compact()
+
+    def stats(self) -> dict:
+        """Get the hit and miss counters and the number of cached scores."""
+        with self._cache_lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "size": len(self._scores),
+                "capacity": self.size,
+            }
+
+    def _put(self, key: str, score: float) -> None:
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.size:
+            self._scores.popitem(last=False)
+
+    def _compact(self) -> None:
+        temporary = f"{self.path}.{os.getpid()}"
+        with open(temporary, "w", encoding="utf-8") as file:
+            for key, score in self._scores.items():
+                file.write(json.dumps({"key": key, "score": score}) + "\n")
+        os.replace(temporary, self.path)
+        self._lines = len(self._scores)
+
+
+def analyze_messages_sentiment(messages: list[str]) -> list[float]:
+    """
+    Returns a sentiment score between -1.0 (negative) and 1.0 (positive) for
+    every message, running the model once on the padded batch of messages.
+    """
+    # If model failed to load (offline), return neutral sentiment
+    if not load_model():
+        return [0.0] * len(messages)
+    texts = [preprocess(message) for message in messages]
+
+    cache = SentimentCache.get()
+    if cache is None:
+        return _backend.score(texts)
+
+    keys = [SentimentCache.key(_backend.name, text) for text in texts]
+    scores = [cache.lookup(key) for key in keys]
+    # Score every missing text once, even if it is repeated within the batch
+    missing = {
+        key: text for key, text, score in zip(keys, texts, scores) if score is None
+    }
+    if missing:
+        scored = dict(zip(missing, _backend.score(list(missing.values()))))
+        cache.store(scored)
+        scores = [
+            scored[key] if score is None else score for key, score in zip(keys, scores)
+        ]
+    return scores
+
+
 def analyze_message_sentiment(message: str) -> float:
     """
     Returns a sentiment score between -1.0 (negative) and 1.0 (positive)
     based on the CardiffNLP Twitter RoBERTa model.
     """
-    # If model failed to load (offline), return neutral sentiment
-    if _model is None or _tokenizer is None or _config is None:
-        return 0.0
-    text = preprocess(message)
-    inputs = _tokenizer(text, return_tensors="pt")
-    outputs = _model(**inputs)
-    scores = outputs.logits[0].detach().numpy()
-    probs = softmax(scores)
-    label2id = {label: idx for idx, label in _config.id2label.items()}
-    neg = probs[label2id.get("negative", 0)]
-    pos = probs[label2id.get("positive", len(probs) - 1)]
-    return float(pos - neg)
+    return analyze_messages_sentiment([message])[0]
+
+
+class SentimentBatcher:
+    """Scores the messages of concurrent conversations in batches.
+
+    Messages can be submitted from any thread or event loop. A worker thread
+    collects them into batches of at most `settings.sentiment.batchsize`
+    messages, waiting at most `settings.sentiment.batchwait` seconds after the
+    first message of a batch, and resolves the future of every message with its
+    score. The model runs outside of the event loops, so the agent ticks of a
+    simulation keep running while its messages are scored.
+    """
+
+    _instance: "SentimentBatcher | None" = None
+    _lock = threading.Lock()
+
+    def __init__(self, batch_size: int, max_wait: float):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: queue.Queue[tuple[str, Future] | None] = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="sentiment-batcher", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def get(cls) -> "SentimentBatcher":
+        """Get the batcher of this process, starting it on first use."""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    settings.sentiment.batchsize, settings.sentiment.batchwait
+                )
+            return cls._instance
+
+    def submit(self, message: str) -> Future:
+        """Queue a message for scoring."""
+        future = Future()
+        self._queue.put((message, future))
+        return future
+
+    async def analyze(self, message: str) -> float:
+        """Score a message with the next batch, see analyze_message_sentiment."""
+        return await asyncio.wrap_future(self.submit(message))
+
+    def close(self) -> None:
+        """Score the queued messages and stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # Skip messages whose caller stopped waiting
+            batch = [
+                (message, future)
+                for message, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            try:
+                scores = analyze_messages_sentiment([message for message, _ in batch])
+            except Exception as e:
+                logger.exception(f"Scoring a batch of {len(batch)} messages failed")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), score in zip(batch, scores):
+                future.set_result(score)
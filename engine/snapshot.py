@@ -0,0 +1,158 @@
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from engine.region_raster import RegionRaster
+from engine.spatial import SpatialIndex
+
+from schemas.agent import Agent
+from schemas.carcass import Carcass
+from schemas.conversation import Conversation
+from schemas.region import Region
+from schemas.resource import Resource
+from schemas.simulation import Simulation
+from schemas.world import World
+
+
+class WorldSnapshot:
+    """Read-only view of a simulation's world at the start of a tick.
+
+    The snapshot is loaded once per tick by the SimulationRunner and shared by
+    all agents ticked in that tick, so every agent builds its context from the
+    same state without issuing its own queries. All loaded objects are detached
+    from the session they were loaded with and must not be modified.
+
+    Range queries go through the live spatial index of the simulation, which
+    loading a snapshot (re)builds, and return the objects of the snapshot.
+    Objects added to the index during the tick, such as new carcasses, are
+    left out. Loading a snapshot also primes the region raster of the world.
+    """
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        world: World,
+        agents: list[Agent],
+        resources: list[Resource],
+        carcasses: list[Carcass],
+        regions: list[Region],
+        conversations: list[Conversation],
+        index: SpatialIndex,
+    ):
+        self.simulation_id = simulation.id
+        self.tick = simulation.tick
+        self.world = world
+        self.agents = {agent.id: agent for agent in agents}
+        self.resources = {resource.id: resource for resource in resources}
+        self.carcasses = {carcass.id: carcass for carcass in carcasses}
+        self.regions = regions
+        self.conversations = conversations
+        self.index = index
+
+    @classmethod
+    def load(cls, db: Session, simulation_id: str) -> "WorldSnapshot":
+        """Load the snapshot of a simulation with a handful of set-based queries."""
+        simulation = db.get(Simulation, simulation_id)
+        if not simulation:
+            raise ValueError(f"Simulation with ID {simulation_id} not found.")
+
+        world = db.exec(select(World).where(World.simulation_id == simulation_id)).one()
+        agents = db.exec(
+            select(Agent).where(Agent.simulation_id == simulation_id)
+        ).all()
+        resources = db.exec(
+            select(Resource)
+            .where(
+                Resource.simulation_id == simulation_id,
+                Resource.world_id == world.id,
+            )
+            .options(selectinload(Resource.harvesters))
+        ).all()
+        carcasses = db.exec(
+            select(Carcass)
+            .where(Carcass.simulation_id == simulation_id)
+            .options(selectinload(Carcass.agent))
+        ).all()
+        regions = db.exec(select(Region).where(Region.world_id == world.id)).all()
+        conversations = db.exec(
+            select(Conversation).where(
+                Conversation.simulation_id == simulation_id,
+                Conversation.finished == False,
+            )
+        ).all()
+
+        # Detach everything so the snapshot can be shared across agent sessions
+        db.expunge_all()
+
+        index = SpatialIndex.from_objects(agents, resources, carcasses)
+        SpatialIndex.register(simulation_id, index)
+        if RegionRaster.get(world.id) is None:
+            RegionRaster.register(
+                world.id, RegionRaster(world.size_x, world.size_y, regions)
+            )
+
+        return cls(
+            simulation=simulation,
+            world=world,
+            agents=agents,
+            resources=resources,
+            carcasses=carcasses,
+            regions=regions,
+            conversations=conversations,
+            index=index,
+        )
+
+    def get_alive_agent_ids(self) -> list[str]:
+        """Get the IDs of all agents that are alive at the start of the tick."""
+        return [agent.id for agent in self.agents.values() if not agent.dead]
+
+    def get_resources_in_range(self, x: int, y: int, radius: int) -> list[Resource]:
+        """Get all resources within the square of the given radius around (x, y)."""
+        return [
+            self.resources[id]
+            for id, _, _ in self.index.resources.query(x, y, radius, manhattan=False)
+            if id in self.resources
+        ]
+
+    def get_agents_in_range(
+        self, x: int, y: int, radius: int, exclude_id: str | None = None
+    ) -> list[Agent]:
+        """Get all alive agents within the square of the given radius around (x, y)."""
+        return [
+            self.agents[id]
+            for id, _, _ in self.index.agents.query(x, y, radius, manhattan=False)
+            if id != exclude_id and id in self.agents
+        ]
+
+    def get_carcasses_in_range(self, x: int, y: int, radius: int) -> list[Carcass]:
+        """Get all carcasses within the square of the given radius around (x, y)."""
+        return [
+            self.carcasses[id]
+            for id, _, _ in self.index.carcasses.query(x, y, radius, manhattan=False)
+            if id in self.carcasses
+        ]
+
+    def get_active_conversation(self, agent_id: str) -> Conversation | None:
+        """Get the active conversation of an agent, if any."""
+        return next(
+            (
+                conversation
+                for conversation in self.conversations
+                if conversation.active
+                and agent_id in (conversation.agent_a_id, conversation.agent_b_id)
+            ),
+            None,
+        )
+
+    def has_outstanding_conversation_request(self, agent_id: str) -> bool:
+        """Check if another agent has requested a conversation with the agent."""
+        return any(
+            not conversation.active and conversation.agent_b_id == agent_id
+            for conversation in self.conversations
+        )
+
+    def has_initialized_conversation(self, agent_id: str) -> bool:
+        """Check if the agent has requested a conversation that is still pending."""
+        return any(
+            not conversation.active and conversation.agent_a_id == agent_id
+            for conversation in self.conversations
+        )
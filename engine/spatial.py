@@ -0,0 +1,136 @@
+from typing import Iterable
+
+
+class SpatialHash:
+    """Uniform spatial hash of point objects on the world grid.
+
+    Objects are stored by ID in square buckets of `cell_size` tiles, so range
+    queries only visit the buckets overlapping the query area instead of every
+    object in the world.
+    """
+
+    def __init__(self, cell_size: int = 8):
+        if cell_size < 1:
+            raise ValueError("Cell size must be at least 1.")
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], dict[str, tuple[int, int]]] = {}
+        self._positions: dict[str, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._positions
+
+    def _cell(self, x: int, y: int) -> tuple[int, int]:
+        return (x // self.cell_size, y // self.cell_size)
+
+    def get_position(self, id: str) -> tuple[int, int] | None:
+        """Get the indexed position of an object."""
+        return self._positions.get(id)
+
+    def insert(self, id: str, x: int, y: int) -> None:
+        """Insert an object at the given position, moving it if already indexed."""
+        if id in self._positions:
+            self.remove(id)
+        self._positions[id] = (x, y)
+        self._cells.setdefault(self._cell(x, y), {})[id] = (x, y)
+
+    def remove(self, id: str) -> None:
+        """Remove an object from the index. Unknown IDs are ignored."""
+        position = self._positions.pop(id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def move(self, id: str, x: int, y: int) -> None:
+        """Move an object to a new position."""
+        position = self._positions.get(id)
+        if position is not None and self._cell(*position) == self._cell(x, y):
+            # Same bucket, only update the stored position
+            self._positions[id] = (x, y)
+            self._cells[self._cell(x, y)][id] = (x, y)
+        else:
+            self.insert(id, x, y)
+
+    def query(
+        self, x: int, y: int, radius: int, manhattan: bool = True
+    ) -> list[tuple[str, int, int]]:
+        """Get all objects within `radius` of (x, y) as (id, x, y) tuples.
+
+        By default the Manhattan distance is used. With `manhattan=False` the
+        query returns the full square around (x, y), i.e. the Chebyshev distance.
+        """
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+
+        hits = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = self._cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for id, (ox, oy) in bucket.items():
+                    dx = abs(ox - x)
+                    dy = abs(oy - y)
+                    if (dx + dy if manhattan else max(dx, dy)) <= radius:
+                        hits.append((id, ox, oy))
+        return hits
+
+
+class SpatialIndex:
+    """Spatial hashes for the agents, resources and carcasses of a simulation.
+
+    Live indexes are kept per simulation in a process-wide registry. They are
+    rebuilt from the world snapshot at the start of every tick and kept up to
+    date in between when agents move or die.
+    """
+
+    _indexes: dict[str, "SpatialIndex"] = {}
+
+    def __init__(self, cell_size: int = 8):
+        self.agents = SpatialHash(cell_size)
+        self.resources = SpatialHash(cell_size)
+        self.carcasses = SpatialHash(cell_size)
+
+    @classmethod
+    def from_objects(
+        cls,
+        agents: Iterable,
+        resources: Iterable,
+        carcasses: Iterable,
+        cell_size: int = 8,
+    ) -> "SpatialIndex":
+        """Build an index from objects with `id`, `x_coord` and `y_coord`.
+
+        Dead agents are not indexed as they are not visible to other agents.
+        """
+        index = cls(cell_size)
+        for agent in agents:
+            if not agent.dead:
+                index.agents.insert(agent.id, agent.x_coord, agent.y_coord)
+        for resource in resources:
+            index.resources.insert(resource.id, resource.x_coord, resource.y_coord)
+        for carcass in carcasses:
+            index.carcasses.insert(carcass.id, carcass.x_coord, carcass.y_coord)
+        return index
+
+    @classmethod
+    def get(cls, simulation_id: str) -> "SpatialIndex | None":
+        """Get the live index of a simulation, if one has been built."""
+        return cls._indexes.get(simulation_id)
+
+    @classmethod
+    def register(cls, simulation_id: str, index: "SpatialIndex") -> None:
+        """Register an index as the live index of a simulation."""
+        cls._indexes[simulation_id] = index
+
+    @classmethod
+    def drop(cls, simulation_id: str) -> None:
+        """Drop the live index of a simulation."""
+        cls._indexes.pop(simulation_id, None)
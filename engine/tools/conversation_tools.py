@@ -8,14 +8,14 @@ from loguru import logger
 from clients.db import get_session
 from clients.nats import get_nats_broker, nats_broker
 
+from engine.intents import ConversationIntent, IntentBuffer
+
 from messages.agent.agent_communication import AgentCommunicationMessage
 
 from services.agent import AgentService
 from services.conversation import ConversationService
 from services.relationship import RelationshipService
-from services.simulation import SimulationService
 
-from schemas.conversation import Conversation
 from schemas.message import Message
 
 
@@ -32,95 +32,39 @@ async def start_conversation(
     simulation_id: str,
 ) -> str:
     """Start a new conversation with another agent. Each exchanged message takes one tick."""
+    buffer = IntentBuffer.get(simulation_id)
+    if buffer is not None:
+        return buffer.record(
+            ConversationIntent(
+                agent_id=agent_id, other_agent_id=other_agent_id, message=message
+            )
+        )
+
     with get_session() as db:
         async with get_nats_broker() as nats:
             logger.success(f"Calling tool start_conversation for agent {agent_id}")
 
             try:
-                if agent_id == other_agent_id:
-                    logger.error("Cannot start a conversation with oneself.")
-                    raise ValueError("Cannot start a conversation with oneself.")
                 agent_service = AgentService(db=db, nats=nats)
-                agent = agent_service.get_by_id(agent_id)
-                other_agent = agent_service.get_by_id_or_name(
-                    other_agent_id, simulation_id=simulation_id
-                )
-
-                conversation_service = ConversationService(db=db, nats=nats)
-                if conversation_service.get_active_by_agent_id(other_agent_id):
-                    logger.info(
-                        f"Agent {other_agent_id} already has an active conversation."
-                    )
-                    raise ValueError(
-                        f"Agent {other_agent_id} is already in an active conversation with another agent."
-                    )
-                if agent_service.has_initialized_conversation(other_agent_id):
-                    logger.info(
-                        f"Agent {other_agent_id} has already initialized a conversation."
-                    )
-                    raise ValueError(
-                        f"Agent {other_agent_id} has already initialized a conversation and must finish that first."
-                    )
-
-                open_requests = agent_service.get_outstanding_conversation_requests(
-                    agent_id
-                )
 
-                logger.warning(f"Open requests for agent {agent_id}: {open_requests}")
-                logger.warning(f"Other agent ID: {other_agent_id}")
-
-                for request in open_requests:
-                    logger.warning(open_requests)
-                    if (
-                        request.agent_b_id == other_agent.id
-                        or request.agent_a_id == other_agent.id
-                    ):
-                        logger.error(
-                            f"Conversation request with {other_agent_id} already exists."
-                        )
-                        raise ValueError(
-                            f"Conversation request with {other_agent_id} already exists. Next tick, you can accept or decline it."
-                        )
-                if other_agent.harvesting_resource_id is not None:
-                    logger.error(
-                        f"Agent {other_agent.id} is currently harvesting a resource and cannot start a conversation."
+                def request():
+                    agent_service.reduce_energy(agent_id=agent_id, commit=False)
+                    return agent_service.request_conversation(
+                        agent=agent_service.get_by_id(agent_id),
+                        other_agent_id=other_agent_id,
+                        message=message,
                     )
-                    raise ValueError(
-                        "Cannot start a conversation with an agent that is currently harvesting a resource."
-                    )
-
-                simulation_service = SimulationService(db=db, nats=nats)
 
-                simulation = simulation_service.get_by_id(simulation_id)
-
-                # Create a new conversation
-                conversation = Conversation(
-                    db=db,
-                    active=False,
-                    simulation_id=simulation_id,
-                    agent_a_id=agent_id,
-                    agent_b_id=other_agent.id,
-                    tick=simulation.tick,
-                )
-                message_model = Message(
-                    tick=simulation.tick,
-                    agent_id=agent_id,
-                    content=message,
-                    conversation_id=conversation.id,
+                conversation, message_model = agent_service.retry_on_conflict(
+                    simulation_id, request
                 )
 
-                agent_service.reduce_energy(agent_id=agent_id, commit=False)
-
-                db.add(conversation)
-                db.add(message_model)
-                db.commit()
-
                 agent_communication_message = AgentCommunicationMessage(
                     agent_id=agent_id,
                     simulation_id=simulation_id,
                     content=message,
                     id=message_model.id,
-                    to_agent_id=other_agent.id,
+                    to_agent_id=conversation.agent_b_id,
                     created_at=message_model.created_at,
                 )
                 await agent_communication_message.publish(nats)
@@ -173,7 +117,7 @@ async def accept_conversation_request(
                     conversation_id=conversation.id,
                 )
 
-                relationship_service.update_relationship(
+                await relationship_service.update_relationship(
                     agent1_id=agent_id,
                     agent2_id=other_agent_id,
                     message=message,
@@ -264,7 +208,7 @@ async def decline_conversation_request(
                     conversation_id=conversation.id,
                 )
 
-                relationship_service.update_relationship(
+                await relationship_service.update_relationship(
                     agent1_id=agent_id,
                     agent2_id=other_agent_id,
                     message=message,
@@ -331,7 +275,7 @@ async def continue_conversation(
                     conversation_id=conversation.id,
                 )
 
-                relationship_service.update_relationship(
+                await relationship_service.update_relationship(
                     agent1_id=agent_id,
                     agent2_id=other_agent_id,
                     message=message,
@@ -340,11 +284,12 @@ async def continue_conversation(
                     commit=False,
                 )
 
-                agent_service.reduce_energy(agent_id=agent_id, commit=False)
-
                 db.add(message_model)
                 db.commit()
 
+                # The energy cost is committed on its own, retried on conflicts
+                agent_service.reduce_energy(agent_id=agent_id)
+
                 agent_communication_message = AgentCommunicationMessage(
                     agent_id=agent_id,
                     simulation_id=simulation_id,
@@ -392,7 +337,7 @@ async def end_conversation(
                     else conversation.agent_a_id
                 )
 
-                relationship_service.update_relationship(
+                await relationship_service.update_relationship(
                     agent1_id=agent_id,
                     agent2_id=other_agent_id,
                     message=reason,
@@ -408,12 +353,13 @@ async def end_conversation(
                     conversation_id=conversation.id,
                 )
 
-                agent_service.reduce_energy(agent_id=agent_id, commit=False)
-
                 db.add(conversation)
                 db.add(message_model)
                 db.commit()
 
+                # The energy cost is committed on its own, retried on conflicts
+                agent_service.reduce_energy(agent_id=agent_id)
+
                 agent_communication_message = AgentCommunicationMessage(
                     agent_id=agent_id,
                     simulation_id=simulation_id,
@@ -6,7 +6,7 @@ from loguru import logger
 from clients.db import get_session
 from clients.nats import get_nats_broker, nats_broker
 
-from messages.world.resource_harvested import ResourceHarvestedMessage
+from engine.intents import HarvestIntent, IntentBuffer
 
 from services.agent import AgentService
 from services.resource import ResourceService
@@ -25,6 +25,10 @@ async def harvest_resource(
 ):
     """Call this tool to harvest a resource and increase your energy level. You can harvest at any time if you are next to a resource."""
 
+    buffer = IntentBuffer.get(simulation_id)
+    if buffer is not None:
+        return buffer.record(HarvestIntent(agent_id=agent_id, location=(x, y)))
+
     try:
         with get_session() as db:
             async with get_nats_broker() as nats:
@@ -40,24 +44,11 @@ async def harvest_resource(
                     agent.simulation.world.id, x, y
                 )
 
-                harvested = resource_service.harvest_resource(
-                    resource=resource, harvester=agent
+                # The tool's energy cost is committed with the harvest
+                await resource_service.harvest_resource(
+                    resource=resource, harvester=agent, cost=1
                 )
 
-                agent_service.reduce_energy(agent_id=agent_id)
-
-                if harvested:
-                    resource_harvested_message = ResourceHarvestedMessage(
-                        simulation_id=simulation_id,
-                        id=resource.id,
-                        harvester_id=agent_id,
-                        location=(resource.x_coord, resource.y_coord),
-                        start_tick=agent.simulation.tick,
-                        end_tick=agent.simulation.tick,
-                        new_energy_level=agent.energy_level,
-                    )
-                    await resource_harvested_message.publish(nats)
-
     except Exception as e:
         logger.error(f"Error harvesting resource: {e}")
         raise e
@@ -91,14 +82,16 @@ async def stop_waiting(
         async with get_nats_broker() as nats:
             try:
                 agent_service = AgentService(db=db, nats=nats)
-                agent_service.reduce_energy(agent_id=agent_id, commit=False)
 
-                agent = agent_service.get_by_id(agent_id)
-                agent.harvesting_resource_id = None
+                def stop():
+                    agent_service.reduce_energy(agent_id=agent_id, commit=False)
+                    agent = agent_service.get_by_id(agent_id)
+                    agent.harvesting_resource_id = None
+                    db.add(agent)
+                    db.commit()
 
-                db.add(agent)
-                db.commit()
+                agent_service.retry_on_conflict(simulation_id, stop)
 
             except Exception as e:
-                logger.error(f"Error accepting conversation request: {e}")
+                logger.error(f"Error stopping to wait for the harvest: {e}")
                 raise e
@@ -6,6 +6,8 @@ from loguru import logger
 from clients.db import get_session
 from clients.nats import get_nats_broker, nats_broker
 
+from engine.intents import IntentBuffer, MoveIntent
+
 from messages.world.agent_moved import AgentMovedMessage
 from messages.world.resource_harvested import ResourceHarvestedMessage
 
@@ -33,6 +35,10 @@ async def move(
     YOU CANNOT MOVE TO YOUR OWN POSITION."""
 
     logger.success("Calling tool move")
+    buffer = IntentBuffer.get(simulation_id)
+    if buffer is not None:
+        return buffer.record(MoveIntent(agent_id=agent_id, destination=(x, y)))
+
     try:
         with get_session() as db:
             async with get_nats_broker() as nats:
@@ -44,8 +50,11 @@ async def move(
                 truncated_exc = None
 
                 try:
-                    new_location = agent_service.move_agent(
-                        agent=agent, destination=(x, y)
+                    new_location = agent_service.retry_on_conflict(
+                        simulation_id,
+                        lambda: agent_service.move_agent(
+                            agent=agent, destination=(x, y)
+                        ),
                     )
                     destination = f"({x}, {y})"
                 except MovementTruncated as e:
@@ -82,6 +91,9 @@ async def random_move(
     """Use this tool if you don't know what do to next or get stuck on the same position."""  # You can only move to adjacent tiles.
 
     logger.success("Calling tool random_move")
+    buffer = IntentBuffer.get(simulation_id)
+    if buffer is not None:
+        return buffer.record(MoveIntent(agent_id=agent_id))
 
     try:
         with get_session() as db:
@@ -89,8 +101,9 @@ async def random_move(
 
                 agent_service = AgentService(db=db, nats=nats)
                 agent = agent_service.get_by_id(agent_id)
-                new_location = agent_service.move_agent_in_random_direction(
-                    agent=agent,
+                new_location = agent_service.retry_on_conflict(
+                    simulation_id,
+                    lambda: agent_service.move_agent_in_random_direction(agent=agent),
                 )
 
                 start_location = (agent.x_coord, agent.y_coord)
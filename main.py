@@ -9,6 +9,9 @@ from clients.db import create_db_and_tables
 
 from config.base import settings
 
+from engine import sentiment
+from engine.runners.supervisor import SimulationSupervisor
+
 import subscribers
 
 import routers
@@ -31,7 +34,17 @@ async def hello_http():
 async def lifespan(app: FastAPI):
     # Load the ML model
     # milvus.create_client()
+    # Load the sentiment model without delaying startup, see GET /debug/sentiment
+    if settings.sentiment.warmup:
+        sentiment.start_warm_up()
+    supervisor = None
+    if settings.supervisor.processes > 0:
+        supervisor = SimulationSupervisor.install(
+            settings.supervisor.processes, settings.supervisor.heartbeat
+        )
     yield
+    if supervisor is not None:
+        supervisor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
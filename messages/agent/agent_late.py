@@ -0,0 +1,18 @@
+from typing import override
+
+from messages.message_base import MessageBase
+
+
+class AgentLateMessage(MessageBase):
+    """Message sent when an agent finishes its turn after the tick deadline."""
+
+    simulation_id: str
+    agent_id: str
+    tick: int
+    applied_tick: int
+    seconds_late: float
+
+    @override
+    def get_channel_name(self) -> str:
+        """Get the channel name for the agent lateness events."""
+        return f"simulation.{self.simulation_id}.agent.{self.agent_id}.late"
@@ -0,0 +1,16 @@
+from typing import override
+
+from messages.message_base import MessageBase
+
+
+class AgentTickJobMessage(MessageBase):
+    """Job to tick an agent, published to the agent tick work queue."""
+
+    simulation_id: str
+    agent_id: str
+    tick: int
+
+    @override
+    def get_channel_name(self) -> str:
+        """Get the work queue subject of the agent's tick jobs."""
+        return f"agent_ticks.{self.simulation_id}.{self.agent_id}"
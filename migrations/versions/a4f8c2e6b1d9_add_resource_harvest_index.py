@@ -0,0 +1,31 @@
+"""add resource harvest index
+
+Revision ID: a4f8c2e6b1d9
+Revises: e3a9c6d2f4b8
+Create Date: 2025-08-25 10:31:07.402913
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # New
+
+# revision identifiers, used by Alembic.
+revision = "a4f8c2e6b1d9"
+down_revision = "e3a9c6d2f4b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Scans of the regrowth scheduler for the resources harvested since a tick
+    op.create_index(
+        "ix_resource_harvested",
+        "resource",
+        ["simulation_id", "available", "last_harvest"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_resource_harvested", table_name="resource")
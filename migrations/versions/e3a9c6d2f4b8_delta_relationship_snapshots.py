@@ -0,0 +1,38 @@
+"""delta relationship snapshots
+
+Revision ID: e3a9c6d2f4b8
+Revises: d8b2e5f1a7c4
+Create Date: 2025-08-22 14:12:51.538214
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel  # New
+
+# revision identifiers, used by Alembic.
+revision = "e3a9c6d2f4b8"
+down_revision = "d8b2e5f1a7c4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "relationship",
+        sa.Column("keyframe", sa.Boolean(), server_default="false", nullable=False),
+    )
+    op.create_index(
+        "ix_relationship_edge_tick",
+        "relationship",
+        ["simulation_id", "agent_a_id", "agent_b_id", "tick"],
+        unique=False,
+    )
+    # Snapshots taken so far copied the full graph every tick
+    op.execute("UPDATE relationship SET keyframe = true WHERE tick > 0")
+
+
+def downgrade():
+    # Ticks between keyframes keep only the edges that changed at them
+    op.drop_index("ix_relationship_edge_tick", table_name="relationship")
+    op.drop_column("relationship", "keyframe")
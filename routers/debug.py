@@ -2,6 +2,10 @@ from fastapi import APIRouter
 
 from clients import Milvus
 
+from config import settings
+
+from engine import sentiment
+
 router = APIRouter(prefix="/debug", tags=["Debug"])
 
 
@@ -16,3 +20,15 @@ async def list_milvus_collections(milvus: Milvus):
     ]
 
     return collections_with_stats
+
+
+@router.get("/sentiment")
+async def get_sentiment_status():
+    """Check whether the sentiment model has been loaded and how its cache performs"""
+    cache = sentiment.SentimentCache.get()
+    return {
+        "ready": sentiment.is_ready(),
+        "model": sentiment.MODEL_NAME,
+        "backend": settings.sentiment.backend,
+        "cache": cache.stats() if cache is not None else None,
+    }
@@ -4,6 +4,8 @@ from loguru import logger
 from clients import Nats
 from clients.db import DB
 
+from engine.runners import SimulationRunner
+
 from services.orchestrator import OrchestratorService
 
 router = APIRouter(prefix="/orchestrator", tags=["Orchestrator"])
@@ -20,6 +22,17 @@ async def run(config_name: str, db: DB, nats: Nats):
     return {"simulation_id": sim_id}
 
 
+@router.post("/fork/{simulation_id}")
+async def fork(simulation_id: str, variants: list[dict], db: DB, nats: Nats):
+    orch = OrchestratorService(db=db, nats=nats)
+    try:
+        fork_ids = await orch.fork_from_simulation(simulation_id, variants)
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(500, f"Failed to fork: {e}")
+    return {"simulation_ids": fork_ids}
+
+
 @router.post("/tick/{simulation_id}")
 async def tick(simulation_id: str, db: DB, nats: Nats):
     orch = OrchestratorService(db=db, nats=nats)
@@ -51,3 +64,16 @@ async def stop(simulation_id: str, db: DB, nats: Nats):
         logger.exception(e)
         raise HTTPException(500, f"Failed to stop: {e}")
     return {"message": f"Simulation {simulation_id} stopped"}
+
+
+@router.get("/workers")
+async def workers():
+    """Get the liveness of the worker processes hosting the simulations."""
+    supervisor = SimulationRunner._supervisor
+    if supervisor is None:
+        return {
+            "processes": 0,
+            "simulations": SimulationRunner.get_running_simulations(),
+        }
+    status = supervisor.status()
+    return {"processes": len(status), "workers": status}
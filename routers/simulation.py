@@ -1,6 +1,8 @@
 import asyncio
+import io
 
-from fastapi import APIRouter
+from fastapi import APIRouter, UploadFile
+from fastapi.responses import Response
 from loguru import logger
 from pydantic import BaseModel
 
@@ -133,6 +135,33 @@ async def get_action_logs(simulation_id: str, db: DB, nats: Nats):
     return logs
 
 
+@router.get("/{simulation_id}/checkpoint")
+async def export_checkpoint(simulation_id: str, db: DB, log_ticks: int = 100):
+    """
+    Download a checkpoint of a simulation at its current tick.
+
+    - log_ticks: number of most recent ticks of memory and action logs to include.
+    """
+    simulation_service = SimulationService(db=db, nats=None)
+    file = io.BytesIO()
+    tick = simulation_service.export_checkpoint(simulation_id, file, log_ticks)
+    return Response(
+        content=file.getvalue(),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{simulation_id}-{tick}.json.gz"'
+        },
+    )
+
+
+@router.post("/checkpoint")
+async def restore_checkpoint(file: UploadFile, db: DB):
+    """Restore a checkpoint into a new simulation."""
+    simulation_service = SimulationService(db=db, nats=None)
+    simulation = simulation_service.restore_checkpoint(file.file)
+    return {"id": simulation.id, "tick": simulation.tick}
+
+
 @router.post("/{simulation_id}/replay")
 async def replay(simulation_id: str, broker: Nats):
     js = broker.stream
@@ -2,7 +2,7 @@ from typing import TYPE_CHECKING
 
 from sqlmodel import Field, Relationship
 
-from schemas.base import BaseModel
+from schemas.base import VersionedModel
 from schemas.conversation import Conversation
 
 if TYPE_CHECKING:
@@ -18,7 +18,7 @@ if TYPE_CHECKING:
     from schemas.carcass import Carcass
 
 
-class Agent(BaseModel, table=True):
+class Agent(VersionedModel, table=True):
     collection_name: str = Field(default=None, nullable=True)
     simulation_id: str = Field(foreign_key="simulation.id")
     harvesting_resource_id: str = Field(
@@ -27,6 +27,8 @@ class Agent(BaseModel, table=True):
     participating_in_plan_id: str = Field(
         foreign_key="plan.id", default=None, nullable=True
     )
+    # Agent of the parent simulation this agent was forked from
+    parent_agent_id: str = Field(foreign_key="agent.id", default=None, nullable=True)
 
     name: str = Field()
     personality: str = Field(default=None, nullable=True)
@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
+from sqlalchemy.orm import declared_attr
 from sqlmodel import Field, SQLModel
 
 
@@ -10,3 +11,19 @@ class BaseModel(SQLModel):
         default_factory=lambda: datetime.now(timezone.utc).isoformat(),
         nullable=True,
     )
+
+
+class VersionedModel(BaseModel):
+    """Model whose rows are updated with compare-and-swap on a version counter.
+
+    Every ORM update checks and increments `version`, so a change to a row that
+    another session changed since it was loaded fails with a StaleDataError
+    instead of overwriting it (see BaseService.retry_on_conflict). UPDATE
+    statements that bypass the ORM must increment the version themselves.
+    """
+
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING
 import uuid
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from schemas.base import BaseModel
@@ -12,7 +13,21 @@ if TYPE_CHECKING:
 
 
 class Relationship(BaseModel, table=True):
-    """Represents a symmetric sentiment-based relationship between two agents."""
+    """Represents a symmetric sentiment-based relationship between two agents.
+
+    Rows with tick 0 hold the live graph. Rows with a later tick snapshot the
+    edges that changed at that tick, or all edges if they are a keyframe.
+    """
+
+    __table_args__ = (
+        Index(
+            "ix_relationship_edge_tick",
+            "simulation_id",
+            "agent_a_id",
+            "agent_b_id",
+            "tick",
+        ),
+    )
 
     id: str = Field(primary_key=True, default_factory=lambda: uuid.uuid4().hex)
 
@@ -26,6 +41,11 @@ class Relationship(BaseModel, table=True):
     update_count: int = Field(
         default=0, description="Number of sentiment updates applied"
     )
+    keyframe: bool = Field(
+        default=False,
+        sa_column_kwargs={"server_default": "false"},
+        description="Snapshot of all edges rather than of the changed ones",
+    )
 
     agent_a: "Agent" = Relationship(
         back_populates="relationships_a",
@@ -1,8 +1,9 @@
 from typing import TYPE_CHECKING
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
-from schemas.base import BaseModel
+from schemas.base import VersionedModel
 
 if TYPE_CHECKING:
 
@@ -13,7 +14,16 @@ if TYPE_CHECKING:
     from schemas.world import World
 
 
-class Resource(BaseModel, table=True):
+class Resource(VersionedModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_resource_harvested",
+            "simulation_id",
+            "available",
+            "last_harvest",
+        ),
+    )
+
     simulation_id: str = Field(foreign_key="simulation.id")
 
     world_id: str = Field(foreign_key="world.id")
@@ -22,6 +22,12 @@ class Simulation(BaseModel, table=True):
     tick: int = Field(default=0)
     last_used: Optional[str] = Field(default=None, nullable=True)
 
+    # Simulation this one was forked from and the tick it was forked at
+    parent_id: Optional[str] = Field(
+        default=None, foreign_key="simulation.id", nullable=True
+    )
+    fork_tick: Optional[int] = Field(default=None, nullable=True)
+
     agents: list["Agent"] = Relationship(
         back_populates="simulation", cascade_delete=True
     )
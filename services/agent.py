@@ -1,7 +1,11 @@
+import random
+
 from loguru import logger
 from sqlmodel import select
 from clients.nats import get_nats_broker
 
+from config.base import settings
+
 from engine.context.observation import ObservationUnion
 from engine.context.observations import (
     AgentObservation,
@@ -9,6 +13,9 @@ from engine.context.observations import (
     ResourceObservation,
 )
 from engine.grid import Grid
+from engine.lineage import AgentLineage
+from engine.snapshot import WorldSnapshot
+from engine.spatial import SpatialIndex
 
 from services.base import BaseService
 from services.conversation import ConversationService
@@ -50,32 +57,54 @@ class AgentService(BaseService[Agent]):
             raise ValueError(f"Agent with id or name '{id_or_name}' not found.")
         return agent
 
-    def get_world_context(self, agent: Agent) -> list[ObservationUnion]:
-        context = []
+    def get_world_context(
+        self, agent: Agent, snapshot: WorldSnapshot | None = None
+    ) -> list[ObservationUnion]:
+        """Get all observations of an agent.
 
-        context.extend(
-            self.get_resource_observations(
-                agent,
-            )
-        )
+        If a snapshot of the current tick is given, the observations are built from
+        the snapshot instead of querying the database. Otherwise the live spatial
+        index of the simulation is used to find nearby objects, if available.
+        """
+        context = []
 
-        context.extend(self.get_agent_observations(agent))
-        context.extend(self.get_carcass_observations(agent))
+        context.extend(self.get_resource_observations(agent, snapshot=snapshot))
+        context.extend(self.get_agent_observations(agent, snapshot=snapshot))
+        context.extend(self.get_carcass_observations(agent, snapshot=snapshot))
         return context
 
-    def get_resource_observations(self, agent: Agent) -> list[ResourceObservation]:
+    def get_resource_observations(
+        self, agent: Agent, snapshot: WorldSnapshot | None = None
+    ) -> list[ResourceObservation]:
         """Load resource observation from database given coordinates and visibility range of an agent"""
 
-        resources = self._db.exec(
-            select(Resource).where(
-                Resource.simulation_id == agent.simulation.id,
-                Resource.world_id == agent.simulation.world.id,
-                Resource.x_coord >= agent.x_coord - agent.visibility_range,
-                Resource.x_coord <= agent.x_coord + agent.visibility_range,
-                Resource.y_coord >= agent.y_coord - agent.visibility_range,
-                Resource.y_coord <= agent.y_coord + agent.visibility_range,
+        index = SpatialIndex.get(agent.simulation_id)
+
+        if snapshot is not None:
+            resources = snapshot.get_resources_in_range(
+                agent.x_coord, agent.y_coord, agent.visibility_range
             )
-        ).all()
+        elif index is not None:
+            resources = self._get_models_by_ids(
+                Resource,
+                index.resources.query(
+                    agent.x_coord,
+                    agent.y_coord,
+                    agent.visibility_range,
+                    manhattan=False,
+                ),
+            )
+        else:
+            resources = self._db.exec(
+                select(Resource).where(
+                    Resource.simulation_id == agent.simulation.id,
+                    Resource.world_id == agent.simulation.world.id,
+                    Resource.x_coord >= agent.x_coord - agent.visibility_range,
+                    Resource.x_coord <= agent.x_coord + agent.visibility_range,
+                    Resource.y_coord >= agent.y_coord - agent.visibility_range,
+                    Resource.y_coord <= agent.y_coord + agent.visibility_range,
+                )
+            ).all()
 
         # Create ResourceObservation for each nearby resource
         resource_observations = []
@@ -93,21 +122,47 @@ class AgentService(BaseService[Agent]):
 
         return resource_observations
 
-    def get_agent_observations(self, agent: Agent) -> list[AgentObservation]:
+    def get_agent_observations(
+        self, agent: Agent, snapshot: WorldSnapshot | None = None
+    ) -> list[AgentObservation]:
         """Load agent observation from database given coordinates and visibility range of an agent"""
         # Filter agents based on agents location and visibility range
 
-        agents = self._db.exec(
-            select(Agent).where(
-                Agent.simulation_id == agent.simulation_id,
-                Agent.id != agent.id,
-                Agent.dead == False,  # Exclude dead agents
-                Agent.x_coord >= agent.x_coord - agent.visibility_range,
-                Agent.x_coord <= agent.x_coord + agent.visibility_range,
-                Agent.y_coord >= agent.y_coord - agent.visibility_range,
-                Agent.y_coord <= agent.y_coord + agent.visibility_range,
+        index = SpatialIndex.get(agent.simulation_id)
+
+        if snapshot is not None:
+            agents = snapshot.get_agents_in_range(
+                agent.x_coord,
+                agent.y_coord,
+                agent.visibility_range,
+                exclude_id=agent.id,
             )
-        ).all()
+        elif index is not None:
+            agents = self._get_models_by_ids(
+                Agent,
+                [
+                    hit
+                    for hit in index.agents.query(
+                        agent.x_coord,
+                        agent.y_coord,
+                        agent.visibility_range,
+                        manhattan=False,
+                    )
+                    if hit[0] != agent.id
+                ],
+            )
+        else:
+            agents = self._db.exec(
+                select(Agent).where(
+                    Agent.simulation_id == agent.simulation_id,
+                    Agent.id != agent.id,
+                    Agent.dead == False,  # Exclude dead agents
+                    Agent.x_coord >= agent.x_coord - agent.visibility_range,
+                    Agent.x_coord <= agent.x_coord + agent.visibility_range,
+                    Agent.y_coord >= agent.y_coord - agent.visibility_range,
+                    Agent.y_coord <= agent.y_coord + agent.visibility_range,
+                )
+            ).all()
 
         # Create AgentObservation for each nearby agent
         agent_observations = []
@@ -126,18 +181,37 @@ class AgentService(BaseService[Agent]):
 
         return agent_observations
 
-    def get_carcass_observations(self, agent: Agent) -> list[CarcassObservation]:
+    def get_carcass_observations(
+        self, agent: Agent, snapshot: WorldSnapshot | None = None
+    ) -> list[CarcassObservation]:
         """Load carcass observations from database given coordinates and visibility range of an agent"""
 
-        carcasses = self._db.exec(
-            select(Carcass).where(
-                Carcass.simulation_id == agent.simulation_id,
-                Carcass.x_coord >= agent.x_coord - agent.visibility_range,
-                Carcass.x_coord <= agent.x_coord + agent.visibility_range,
-                Carcass.y_coord >= agent.y_coord - agent.visibility_range,
-                Carcass.y_coord <= agent.y_coord + agent.visibility_range,
+        index = SpatialIndex.get(agent.simulation_id)
+
+        if snapshot is not None:
+            carcasses = snapshot.get_carcasses_in_range(
+                agent.x_coord, agent.y_coord, agent.visibility_range
             )
-        ).all()
+        elif index is not None:
+            carcasses = self._get_models_by_ids(
+                Carcass,
+                index.carcasses.query(
+                    agent.x_coord,
+                    agent.y_coord,
+                    agent.visibility_range,
+                    manhattan=False,
+                ),
+            )
+        else:
+            carcasses = self._db.exec(
+                select(Carcass).where(
+                    Carcass.simulation_id == agent.simulation_id,
+                    Carcass.x_coord >= agent.x_coord - agent.visibility_range,
+                    Carcass.x_coord <= agent.x_coord + agent.visibility_range,
+                    Carcass.y_coord >= agent.y_coord - agent.visibility_range,
+                    Carcass.y_coord <= agent.y_coord + agent.visibility_range,
+                )
+            ).all()
 
         # Create CarcassObservation for each nearby carcass
         carcass_observations = []
@@ -156,6 +230,16 @@ class AgentService(BaseService[Agent]):
 
         return carcass_observations
 
+    def _get_models_by_ids(
+        self, model_class: type, hits: list[tuple[str, int, int]]
+    ) -> list:
+        """Load the models of spatial index hits with a single primary key query."""
+        if not hits:
+            return []
+        return self._db.exec(
+            select(model_class).where(model_class.id.in_([hit[0] for hit in hits]))
+        ).all()
+
     def get_outstanding_conversation_requests(
         self, agent_id: str
     ) -> list[Conversation]:
@@ -198,6 +282,77 @@ class AgentService(BaseService[Agent]):
         """Check if the agent has an initialized conversation."""
         return len(self.get_initialized_conversation_requests(agent_id)) > 0
 
+    def request_conversation(
+        self,
+        agent: Agent,
+        other_agent_id: str,
+        message: str,
+        commit: bool = True,
+    ) -> tuple[Conversation, Message]:
+        """Request a conversation with another agent, opened by a first message.
+
+        Raises:
+            ValueError: If the other agent is the agent itself, is busy with
+                another conversation or a harvest, or a request between the
+                two agents is already open.
+        """
+        if agent.id == other_agent_id:
+            logger.error("Cannot start a conversation with oneself.")
+            raise ValueError("Cannot start a conversation with oneself.")
+        other_agent = self.get_by_id_or_name(
+            other_agent_id, simulation_id=agent.simulation_id
+        )
+
+        conversation_service = ConversationService(self._db, self._nats)
+        if conversation_service.get_active_by_agent_id(other_agent.id):
+            logger.info(f"Agent {other_agent.id} already has an active conversation.")
+            raise ValueError(
+                f"Agent {other_agent_id} is already in an active conversation with another agent."
+            )
+        if self.has_initialized_conversation(other_agent.id):
+            logger.info(
+                f"Agent {other_agent.id} has already initialized a conversation."
+            )
+            raise ValueError(
+                f"Agent {other_agent_id} has already initialized a conversation and must finish that first."
+            )
+
+        for request in self.get_outstanding_conversation_requests(agent.id):
+            if other_agent.id in (request.agent_a_id, request.agent_b_id):
+                logger.error(
+                    f"Conversation request with {other_agent_id} already exists."
+                )
+                raise ValueError(
+                    f"Conversation request with {other_agent_id} already exists. Next tick, you can accept or decline it."
+                )
+        if other_agent.harvesting_resource_id is not None:
+            logger.error(
+                f"Agent {other_agent.id} is currently harvesting a resource and cannot start a conversation."
+            )
+            raise ValueError(
+                "Cannot start a conversation with an agent that is currently harvesting a resource."
+            )
+
+        tick = agent.simulation.tick
+        conversation = Conversation(
+            active=False,
+            simulation_id=agent.simulation_id,
+            agent_a_id=agent.id,
+            agent_b_id=other_agent.id,
+            tick=tick,
+        )
+        message_model = Message(
+            tick=tick,
+            agent_id=agent.id,
+            content=message,
+            conversation_id=conversation.id,
+        )
+        self._db.add(conversation)
+        self._db.add(message_model)
+        if commit:
+            self._db.commit()
+        return conversation, message_model
+
     def move_agent_in_direction(self, agent: Agent, direction: str) -> tuple[int, int]:
         """
         Moves the specified agent in the given direction within the world.
@@ -258,7 +413,9 @@ class AgentService(BaseService[Agent]):
 
         return self.move_agent(agent, destination)
 
-    def move_agent(self, agent: Agent, destination: tuple[int, int]):
+    def move_agent(
+        self, agent: Agent, destination: tuple[int, int], commit: bool = True
+    ):
         """Move agent to new location in world"""
         logger.debug(f"Moving agent {agent.id} to {destination}")
 
@@ -287,7 +444,8 @@ class AgentService(BaseService[Agent]):
         # Set agent field of view and get path
         # Create grid with obstacles
         obstacles = self.get_world_obstacles(agent)
-        grid = Grid(agent.simulation.world.size_x, agent.simulation.world.size_y)
+        world = agent.simulation.world
+        grid = Grid.for_world(world.id, world.size_x, world.size_y)
         grid.set_agent_field_of_view(agent_location, agent.visibility_range, obstacles)
         # Get shortest path from agent location to destination
         try:
@@ -307,17 +465,21 @@ class AgentService(BaseService[Agent]):
         agent.x_coord = new_location[0]
         agent.y_coord = new_location[1]
 
-        region_service = RegionService(self._db, self._nats)
-
-        current_region = region_service.get_region_at(
-            agent.simulation.world.id, agent.x_coord, agent.y_coord
-        )
-
-        # agent.energy_level -= current_region.region_energy_cost * steps_to_move
-        agent.energy_level -= current_region.region_energy_cost
+        raster = RegionService(self._db, self._nats).get_raster(world.id)
+        if settings.movement_cost_per_step:
+            # Every entered cell costs the energy of the region it lies in
+            agent.energy_level -= raster.path_energy_cost(path[1 : steps_to_move + 1])
+        else:
+            agent.energy_level -= raster.energy_cost_at(agent.x_coord, agent.y_coord)
 
         self._db.add(agent)
-        self._db.commit()
+        if commit:
+            self._db.commit()
+            # Without commit, the caller moves the agent in the spatial index
+            # once the move has been committed
+            index = SpatialIndex.get(agent.simulation_id)
+            if index is not None:
+                index.agents.move(agent.id, agent.x_coord, agent.y_coord)
 
         if steps_to_move < distance:
             logger.warning(
@@ -331,18 +493,22 @@ class AgentService(BaseService[Agent]):
 
         return new_location
 
-    def move_agent_in_random_direction(self, agent: Agent) -> tuple[int, int]:
+    def move_agent_in_random_direction(
+        self, agent: Agent, rng: random.Random | None = None, commit: bool = True
+    ) -> tuple[int, int]:
         """
         Moves the specified agent in a random direction within the world.
 
         Args:
             agent (Agent): The agent instance to move.
+            rng (random.Random | None): Source of the random destination,
+                defaults to the global random generator.
+            commit (bool): Whether to commit the move and update the spatial
+                index of the simulation.
 
         Returns:
             tuple[int, int]: The new (x, y) coordinates of the agent after the move.
         """
-        import random
-
         # Get the world boundaries
         world = agent.simulation.world
         max_steps = 4
@@ -361,10 +527,10 @@ class AgentService(BaseService[Agent]):
         if not possible_destinations:
             raise ValueError("No valid random destinations available for agent.")
 
-        destination = random.choice(possible_destinations)
+        destination = (rng or random).choice(possible_destinations)
         # Find the direction string or coordinate to pass to move_agent_in_direction
         # Here, we directly use the move_agent method since we have a coordinate
-        return self.move_agent(agent, destination)
+        return self.move_agent(agent, destination, commit=commit)
 
     def get_world_obstacles(self, agent: Agent):
         """Get obstacles for agent"""
@@ -372,17 +538,28 @@ class AgentService(BaseService[Agent]):
         agent_fov = agent.visibility_range
         agent_location = (agent.x_coord, agent.y_coord)
 
-        agents = self._db.exec(
-            select(Agent).where(
-                Agent.simulation_id == agent.simulation_id,
-                Agent.id != agent.id,  # Exclude the current agent
-                Agent.dead == False,  # Exclude dead agents
-                Agent.x_coord >= agent_location[0] - agent_fov,
-                Agent.x_coord <= agent_location[0] + agent_fov,
-                Agent.y_coord >= agent_location[1] - agent_fov,
-                Agent.y_coord <= agent_location[1] + agent_fov,
-            )
-        ).all()
+        index = SpatialIndex.get(agent.simulation_id)
+        if index is not None:
+            agent_locations = [
+                (x, y)
+                for id, x, y in index.agents.query(
+                    *agent_location, agent_fov, manhattan=False
+                )
+                if id != agent.id  # Exclude the current agent
+            ]
+        else:
+            agents = self._db.exec(
+                select(Agent).where(
+                    Agent.simulation_id == agent.simulation_id,
+                    Agent.id != agent.id,  # Exclude the current agent
+                    Agent.dead == False,  # Exclude dead agents
+                    Agent.x_coord >= agent_location[0] - agent_fov,
+                    Agent.x_coord <= agent_location[0] + agent_fov,
+                    Agent.y_coord >= agent_location[1] - agent_fov,
+                    Agent.y_coord <= agent_location[1] + agent_fov,
+                )
+            ).all()
+            agent_locations = [(a.x_coord, a.y_coord) for a in agents]
 
         # Filter resources based on agents location and visibility range
         # resources = self._db.exec(
@@ -397,8 +574,7 @@ class AgentService(BaseService[Agent]):
 
         # Create list of obstacles
         obstacles = []
-        # for agent in agents:
-        #     obstacles.append((agent.x_coord, agent.y_coord))
+        # obstacles.extend(agent_locations)
         # for resource in resources:
         #     obstacles.append((resource.x_coord, resource.y_coord))
 
@@ -408,7 +584,11 @@ class AgentService(BaseService[Agent]):
         """Get the last k actions of an agent."""
         actions = self._db.exec(
             select(ActionLog)
-            .where(ActionLog.agent_id == agent.id)
+            .where(
+                AgentLineage.load(self._db, agent).filter(
+                    ActionLog.agent_id, ActionLog.tick
+                )
+            )
             .order_by(ActionLog.tick.desc())
             .limit(k)
         ).all()
@@ -419,7 +599,11 @@ class AgentService(BaseService[Agent]):
         """Get the last k memory logs of an agent."""
         memory_logs = self._db.exec(
             select(MemoryLog)
-            .where(MemoryLog.agent_id == agent.id)
+            .where(
+                AgentLineage.load(self._db, agent).filter(
+                    MemoryLog.agent_id, MemoryLog.tick
+                )
+            )
             .order_by(MemoryLog.tick.desc())
             .limit(k)
         ).all()
@@ -435,7 +619,11 @@ class AgentService(BaseService[Agent]):
         """Get the last k memory logs of an agent."""
         memory_logs = self._db.exec(
             select(MemoryLog)
-            .where(MemoryLog.agent_id == agent.id)
+            .where(
+                AgentLineage.load(self._db, agent).filter(
+                    MemoryLog.agent_id, MemoryLog.tick
+                )
+            )
             .order_by(MemoryLog.tick.desc())
             .limit(k)
         ).all()
@@ -455,10 +643,20 @@ class AgentService(BaseService[Agent]):
     def reduce_energy(
         self, agent_id: str, amount: int = 1, commit: bool = True
     ) -> None:
-        """Reduce the energy level of an agent by a specified amount."""
+        """Reduce the energy level of an agent by a specified amount.
+
+        Without `commit`, the caller commits the change and must do so within
+        `retry_on_conflict`.
+        """
         agent = self.get_by_id(agent_id)
 
-        agent.energy_level -= amount
-        self._db.add(agent)
+        def reduce():
+            agent.energy_level -= amount
+            self._db.add(agent)
+            if commit:
+                self._db.commit()
+
         if commit:
-            self._db.commit()
+            self.retry_on_conflict(agent.simulation_id, reduce)
+        else:
+            reduce()
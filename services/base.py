@@ -1,13 +1,40 @@
+import threading
 from asyncio.log import logger
-from typing import Generic, Type, TypeVar
+from typing import Callable, Generic, Type, TypeVar
 
 from faststream.nats import NatsBroker
 from pymilvus import MilvusClient
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import Session, select
 
+from config import settings
+
 from schemas.base import BaseModel
 
 T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+
+class ConflictCounter:
+    """Counts the concurrent update conflicts of every simulation.
+
+    The SimulationRunner collects the count after every tick.
+    """
+
+    _counts: dict[str, int] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, simulation_id: str) -> None:
+        """Count a conflict in a simulation."""
+        with cls._lock:
+            cls._counts[simulation_id] = cls._counts.get(simulation_id, 0) + 1
+
+    @classmethod
+    def pop(cls, simulation_id: str) -> int:
+        """Get and reset the number of conflicts in a simulation."""
+        with cls._lock:
+            return cls._counts.pop(simulation_id, 0)
 
 
 class BaseService(Generic[T]):
@@ -78,6 +105,31 @@ class BaseService(Generic[T]):
             raise ValueError(f"No {self._model_class.__name__} instances found.")
         return models
 
+    def retry_on_conflict(self, simulation_id: str, operation: Callable[[], R]) -> R:
+        """
+        Run a read-modify-write operation that commits, retrying it on conflicts.
+
+        Versioned models are updated with compare-and-swap on their version, so
+        the commit fails if another session changed one of the updated rows in
+        the meantime. The session is then rolled back, which expires all loaded
+        models, and the operation runs again on the current rows, at most
+        `settings.conflict_retries` times. Changes of the session that are not
+        made by the operation itself are lost on a retry.
+        """
+        for attempt in range(settings.conflict_retries + 1):
+            try:
+                return operation()
+            except StaleDataError as e:
+                self._db.rollback()
+                ConflictCounter.record(simulation_id)
+                logger.warning(
+                    f"[SIM {simulation_id}] Concurrent update, attempt {attempt + 1}: {e}"
+                )
+                error = e
+        raise ValueError(
+            "The world changed while carrying out your action, please try again."
+        ) from error
+
     def get_by_simulation_id(self, simulation_id: str) -> list[T]:
         """
         Retrieve a model instance by its simulation ID.
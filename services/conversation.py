@@ -1,8 +1,12 @@
 from faststream.nats import NatsBroker
+from sqlalchemy import exists, or_, update
 from sqlmodel import Session, select
 
+from engine.lineage import AgentLineage
+
 from services.base import BaseService
 
+from schemas.agent import Agent
 from schemas.conversation import Conversation
 from schemas.message import Message
 
@@ -37,20 +41,24 @@ class ConversationService(BaseService[Conversation]):
     ) -> Conversation | None:
         """Get the last conversation by agent ID."""
 
+        agent = self.db.get(Agent, agent_id)
+        # Messages written before a fork belong to the agent's parents
+        authored = (
+            AgentLineage.load(self.db, agent).filter(Message.agent_id, Message.tick)
+            if agent
+            else Message.agent_id == agent_id
+        )
+
         if max_tick_age >= 0:
             message = self.db.exec(
                 select(Message)
-                .where(
-                    (Message.agent_id == agent_id) & (Message.tick >= max_tick_age),
-                )
+                .where(authored, Message.tick >= max_tick_age)
                 .order_by(Message.tick.desc())
             ).first()
             return message.conversation if message else None
 
         last_message = self.db.exec(
-            select(Message)
-            .where((Message.agent_id == agent_id))
-            .order_by(Message.tick.desc())
+            select(Message).where(authored).order_by(Message.tick.desc())
         ).first()
 
         if last_message:
@@ -89,3 +97,33 @@ class ConversationService(BaseService[Conversation]):
 
         self.db.add(conversation)
         self.db.commit()
+
+    def finish_conversations_of_dead_agents(
+        self, simulation_id: str, commit: bool = True
+    ) -> int:
+        """Mark all unfinished conversations of a simulation with a dead participant as finished.
+
+        Runs as a single UPDATE joined against the dead agents of the simulation.
+
+        Returns:
+            The number of conversations that were finished.
+        """
+        result = self.db.execute(
+            update(Conversation)
+            .where(
+                Conversation.simulation_id == simulation_id,
+                Conversation.finished == False,
+                exists().where(
+                    Agent.dead == True,
+                    or_(
+                        Agent.id == Conversation.agent_a_id,
+                        Agent.id == Conversation.agent_b_id,
+                    ),
+                ),
+            )
+            .values(finished=True)
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            self.db.commit()
+        return result.rowcount
@@ -9,6 +9,7 @@ from typing import Dict, List
 from faststream.nats import NatsBroker
 from loguru import logger
 from pymilvus import MilvusClient
+from sqlalchemy import update
 from sqlmodel import Session, select
 
 from config.openai import AvailableModels
@@ -21,7 +22,6 @@ from messages.simulation.simulation_stopped import SimulationStoppedMessage
 
 from services.agent import AgentService
 from services.region import RegionService
-from services.relationship import RelationshipService
 from services.resource import ResourceService
 from services.simulation import SimulationService
 from services.world import WorldService
@@ -156,6 +156,65 @@ class OrchestratorService:
 
         return simulation.id
 
+    async def fork_from_simulation(
+        self, sim_id: str, variants: List[dict]
+    ) -> List[str]:
+        """
+        Fork a simulation at its current tick into one variant per entry.
+
+        Each variant can override the agents and resources of its fork using
+        the keys of a configuration:
+          - agents: {"model": str, "personality": [str]}
+          - resources: {"energyYield", "regrowTime", "minAgents",
+            "miningTime", "harvestingArea"}
+        """
+        fork_ids = []
+        for variant in variants:
+            fork = self.simulation_service.fork(sim_id)
+            fork.last_used = datetime.now(timezone.utc).isoformat()
+            self._db.add(fork)
+
+            agent_cfg = variant.get("agents", {})
+            agent_values = {}
+            if agent_cfg.get("model"):
+                agent_values["model"] = AvailableModels.get(agent_cfg["model"]).name
+            if agent_cfg.get("personality"):
+                agent_values["personality"] = ", ".join(agent_cfg["personality"])
+            if agent_values:
+                self._db.execute(
+                    update(Agent)
+                    .where(Agent.simulation_id == fork.id)
+                    .values(**agent_values, version=Agent.version + 1)
+                )
+
+            res_cfg = variant.get("resources", {})
+            resource_values = {
+                column: res_cfg[key]
+                for key, column in (
+                    ("energyYield", "energy_yield"),
+                    ("regrowTime", "regrow_time"),
+                    ("minAgents", "required_agents"),
+                    ("miningTime", "mining_time"),
+                    ("harvestingArea", "harvesting_area"),
+                )
+                if key in res_cfg
+            }
+            if resource_values:
+                self._db.execute(
+                    update(Resource)
+                    .where(Resource.simulation_id == fork.id)
+                    .values(**resource_values, version=Resource.version + 1)
+                )
+            self._db.commit()
+
+            simulation_created_message = SimulationCreatedMessage(id=fork.id)
+            await self.nats.publish(
+                simulation_created_message.model_dump_json(),
+                simulation_created_message.get_channel_name(),
+            )
+            fork_ids.append(fork.id)
+        return fork_ids
+
     async def _spawn_agents(self, sim_id: str, world: World, agent_cfg: dict):
         # 1) choose model (fallback auf default)
         model_name = agent_cfg.get("model") or "llama-3.3-70b-instruct"
@@ -228,15 +287,6 @@ class OrchestratorService:
         logger.info(
             f"Orchestrator: ticked simulation {sim_id} in {duration:.2f} seconds"
         )
-        # snapshot relationship graph for this simulation at new tick
-        sim = self.simulation_service.get_by_id(sim_id)
-
-        relationship_service = RelationshipService(self._db, self.nats)
-        relationship_service.snapshot_relationship_graph(
-            simulation_id=sim_id,
-            tick=sim.tick,
-        )
-        logger.info(f"Orchestrator: snapshot relationships at tick {sim.tick}")
 
     async def start(self, sim_id: str):
         tick = SimulationRunner.start_simulation(
@@ -2,11 +2,14 @@ import random
 
 from sqlalchemy import select
 
+from engine.region_raster import RegionRaster
+
 from services.base import BaseService
 from services.resource import ResourceService
 
 from schemas.region import Region
 from schemas.resource import Resource
+from schemas.world import World
 
 
 class RegionService(BaseService[Region]):
@@ -50,23 +53,28 @@ class RegionService(BaseService[Region]):
             self._db.commit()
         return resources
 
-    def get_region_at(self, world_id, x: int, y: int) -> Region:
-        """Get the region that contains the given coordinates."""
-        results = self._db.exec(
-            select(Region).where(
-                Region.world_id == world_id,
-                Region.x_1 <= x,
-                Region.x_2 > x,
-                Region.y_1 <= y,
-                Region.y_2 > y,
+    def get_raster(self, world_id: str) -> RegionRaster:
+        """Get the region raster of a world, building and caching it on first use."""
+        raster = RegionRaster.get(world_id)
+        if raster is None:
+            world = self._db.get(World, world_id)
+            if not world:
+                raise ValueError(f"World with ID {world_id} not found.")
+            regions = self._db.exec(select(Region).where(Region.world_id == world_id))
+            raster = RegionRaster(
+                world.size_x, world.size_y, [row[0] for row in regions.all()]
             )
-        )
-        region = results.one()
+            RegionRaster.register(world_id, raster)
+        return raster
 
-        if not region:
-            raise ValueError(f"No region found for coordinates ({x}, {y})")
+    def get_region_at(self, world_id, x: int, y: int) -> Region:
+        """Get the region that contains the given coordinates."""
+        region_id = self.get_raster(world_id).region_id_at(x, y)
+        return self._db.get(Region, region_id)
 
-        return region[0]
+    def get_energy_cost_at(self, world_id, x: int, y: int) -> float:
+        """Get the energy cost of the region that contains the given coordinates."""
+        return self.get_raster(world_id).energy_cost_at(x, y)
 
     def _create_resource_coords(
         self, x_coords: tuple[int, int], y_coords: tuple[int, int], num_resources: int
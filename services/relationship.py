@@ -4,15 +4,19 @@ from typing import Iterator
 from fastapi.responses import StreamingResponse
 from loguru import logger
 from sqlalchemy import func
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
 
-from engine.sentiment import analyze_message_sentiment
+from config import settings
+
+from engine.sentiment import SentimentBatcher
 
 from services.agent import AgentService
 from services.base import BaseService
 
 from schemas.agent import Agent as AgentModel
 from schemas.relationship import Relationship as RelationshipModel
+from schemas.simulation import Simulation as SimulationModel
 
 import networkx as nx
 from community import community_louvain
@@ -44,7 +48,7 @@ class RelationshipService(BaseService[RelationshipModel]):
     def __init__(self, db: Session, nats: None = None):
         super().__init__(RelationshipModel, db=db, nats=nats)
 
-    def update_relationship(
+    async def update_relationship(
         self,
         agent1_id: str,
         agent2_id: str,
@@ -57,14 +61,16 @@ class RelationshipService(BaseService[RelationshipModel]):
         """
         Update the relationship between two agents based on the sentiment of a message.
         Legacy mode (no simulation_id/tick): update live relationship record only.
-        Simulation mode (with simulation_id and tick): update live record and
-        snapshot the full relationship graph at the given tick.
+        Simulation mode (with simulation_id and tick): update the live record of
+        the simulation, which is snapshotted at the end of the tick.
         Returns the updated normalized sentiment score (average sentiment).
+        The message is scored in a batch with concurrent messages, see
+        engine.sentiment.SentimentBatcher.
         """
         if bidirectional:
             agent1_id, agent2_id = sorted([agent1_id, agent2_id])
 
-        sentiment = analyze_message_sentiment(message)
+        sentiment = await SentimentBatcher.get().analyze(message)
 
         # legacy mode: without simulation context, just update live relationship (tick 0)
         if simulation_id is None or tick is None:
@@ -117,16 +123,40 @@ class RelationshipService(BaseService[RelationshipModel]):
             self._db.commit()
             self._db.refresh(rel)
 
-    def snapshot_relationship_graph(self, simulation_id: str, tick: int) -> None:
+    def snapshot_relationship_graph(
+        self, simulation_id: str, tick: int, keyframe: bool = False, commit: bool = True
+    ) -> None:
         """
-        Take a full snapshot of the current (live) graph at the given tick for the simulation.
+        Snapshot the live graph at the given tick for the simulation.
+
+        Only edges updated since their last snapshot are stored, every
+        `settings.relationship_keyframes` ticks, or with `keyframe`, all edges
+        are stored as a keyframe. An edge is updated iff its update count grew,
+        so the changed edges are found in the database and the snapshot does not
+        depend on which process took the previous one.
         """
-        current = self._db.exec(
-            select(RelationshipModel).where(
-                RelationshipModel.simulation_id == simulation_id,
-                RelationshipModel.tick == 0,
+        keyframe = keyframe or tick % settings.relationship_keyframes == 0
+        stmt = select(RelationshipModel).where(
+            RelationshipModel.simulation_id == simulation_id,
+            RelationshipModel.tick == 0,
+        )
+        if not keyframe:
+            snapshot = aliased(RelationshipModel)
+            last_count = (
+                select(func.max(snapshot.update_count))
+                .where(
+                    snapshot.simulation_id == simulation_id,
+                    snapshot.agent_a_id == RelationshipModel.agent_a_id,
+                    snapshot.agent_b_id == RelationshipModel.agent_b_id,
+                    snapshot.tick > 0,
+                )
+                .scalar_subquery()
             )
-        ).all()
+            stmt = stmt.where(
+                RelationshipModel.update_count > func.coalesce(last_count, 0)
+            )
+
+        current = self._db.exec(stmt).all()
         for rel in current:
             self._db.add(
                 RelationshipModel(
@@ -136,9 +166,49 @@ class RelationshipService(BaseService[RelationshipModel]):
                     total_sentiment=rel.total_sentiment,
                     update_count=rel.update_count,
                     tick=tick,
+                    keyframe=keyframe,
                 )
             )
-        self._db.commit()
+        if commit:
+            self._db.commit()
+
+    def _get_snapshot(self, simulation_id: str, tick: int) -> list[RelationshipModel]:
+        """
+        Reconstruct the edges of the graph at a tick: the latest snapshot of every
+        edge since the last keyframe at or before the tick.
+        """
+        if tick <= 0:
+            return self._db.exec(
+                select(RelationshipModel).where(
+                    RelationshipModel.simulation_id == simulation_id,
+                    RelationshipModel.tick == 0,
+                )
+            ).all()
+
+        keyframe_tick = (
+            select(func.max(RelationshipModel.tick))
+            .where(
+                RelationshipModel.simulation_id == simulation_id,
+                RelationshipModel.keyframe,
+                RelationshipModel.tick > 0,
+                RelationshipModel.tick <= tick,
+            )
+            .scalar_subquery()
+        )
+        rels = self._db.exec(
+            select(RelationshipModel)
+            .where(
+                RelationshipModel.simulation_id == simulation_id,
+                RelationshipModel.tick >= func.coalesce(keyframe_tick, 1),
+                RelationshipModel.tick <= tick,
+            )
+            .order_by(RelationshipModel.tick)
+        ).all()
+
+        latest: dict[tuple[str, str], RelationshipModel] = {}
+        for rel in rels:
+            latest[(rel.agent_a_id, rel.agent_b_id)] = rel
+        return list(latest.values())
 
     def get_relationship_graph(
         self,
@@ -154,18 +224,18 @@ class RelationshipService(BaseService[RelationshipModel]):
         """
         # determine which tick to use
         if tick is None:
-            max_tick = self._db.exec(
-                select(func.max(RelationshipModel.tick)).where(
-                    RelationshipModel.simulation_id == simulation_id
-                )
-            ).one()
-            tick = max_tick or 0
+            tick = self._get_max_tick(simulation_id) or 0
 
-        stmt = select(RelationshipModel).where(
-            RelationshipModel.simulation_id == simulation_id,
-            RelationshipModel.tick == tick,
-        )
-        rels = self._db.exec(stmt).all()
+        # forks share the graph history of their parent up to the fork tick
+        simulation = self._db.get(SimulationModel, simulation_id)
+        if (
+            simulation is not None
+            and simulation.parent_id is not None
+            and 0 < tick <= simulation.fork_tick
+        ):
+            return self._get_parent_relationship_graph(simulation, tick, agent_id)
+
+        rels = self._get_snapshot(simulation_id, tick)
 
         agent_service = AgentService(db=self._db, nats=None)
 
@@ -228,6 +298,30 @@ class RelationshipService(BaseService[RelationshipModel]):
 
         return {"nodes": nodes, "edges": edges}
 
+    def _get_parent_relationship_graph(
+        self, simulation: SimulationModel, tick: int, agent_id: str | None
+    ) -> dict:
+        """Get the graph of a fork's parent at a tick, with the agents of the fork."""
+        agents = self._db.exec(
+            select(AgentModel.id, AgentModel.parent_agent_id).where(
+                AgentModel.simulation_id == simulation.id
+            )
+        ).all()
+        to_fork = {parent_id: id for id, parent_id in agents if parent_id}
+        to_parent = {id: parent_id for parent_id, id in to_fork.items()}
+
+        graph = self.get_relationship_graph(
+            simulation_id=simulation.parent_id,
+            tick=tick,
+            agent_id=to_parent.get(agent_id, agent_id) if agent_id else None,
+        )
+        for node in graph["nodes"]:
+            node["id"] = to_fork.get(node["id"], node["id"])
+        for edge in graph["edges"]:
+            edge["source"] = to_fork.get(edge["source"], edge["source"])
+            edge["target"] = to_fork.get(edge["target"], edge["target"])
+        return graph
+
     def get_networkx_graph(
         self,
         simulation_id: str,
@@ -261,12 +355,20 @@ class RelationshipService(BaseService[RelationshipModel]):
         return G
 
     def _get_max_tick(self, simulation_id: str) -> int:
-        """Get the maximum tick for a given simulation."""
-        return self._db.exec(
+        """Get the maximum tick for a given simulation, including a fork's parent history.
+
+        Snapshots only exist for ticks at which edges changed, so the tick of the
+        simulation counts as well.
+        """
+        max_tick = self._db.exec(
             select(func.max(RelationshipModel.tick)).where(
                 RelationshipModel.simulation_id == simulation_id
             )
         ).one()
+        simulation = self._db.get(SimulationModel, simulation_id)
+        if simulation is None:
+            return max_tick
+        return max(max_tick or 0, simulation.tick or 0, simulation.fork_tick or 0)
 
     def _calculate_network_metrics(self, G: nx.Graph, tick: int) -> dict:
         """
@@ -1,13 +1,21 @@
 from loguru import logger
+from sqlalchemy import exists, update
 from sqlmodel import select
 
+from config import settings
+
+from engine.regrowth import RegrowthScheduler
+
+from messages.agent.agent_action import AgentActionMessage
 from messages.world.resource_grown import ResourceGrownMessage
 from messages.world.resource_harvested import ResourceHarvestedMessage
 
 from services.base import BaseService
 
+from schemas.action_log import ActionLog
 from schemas.agent import Agent
 from schemas.resource import Resource
+from schemas.world import World
 
 from utils import compute_in_radius
 
@@ -26,47 +34,257 @@ class ResourceService(BaseService[Resource]):
             )
         ).one()
 
-    def harvest_resource(
+    def get_regrowth_scheduler(self, simulation_id: str) -> RegrowthScheduler:
+        """Get the regrowth scheduler of a simulation, creating it on first use."""
+        scheduler = RegrowthScheduler.get(simulation_id)
+        if scheduler is None:
+            scheduler = RegrowthScheduler()
+            RegrowthScheduler.register(simulation_id, scheduler)
+        return scheduler
+
+    def scan_harvests(
+        self, simulation_id: str, scheduler: RegrowthScheduler, tick: int
+    ) -> None:
+        """Schedule the resources harvested since the last scan of the scheduler.
+
+        Harvests in other processes, such as the agent tick workers, can not
+        schedule their resources in the scheduler of the simulation. The first
+        scan of a scheduler schedules all unavailable resources of the simulation.
+        Resources harvested at the tick of the last scan are scanned again, as
+        the harvest may have finished after the scan; the scheduler skips the
+        entries it already holds.
+        """
+        rows = self._db.exec(
+            select(Resource.id, Resource.last_harvest + Resource.regrow_time).where(
+                Resource.simulation_id == simulation_id,
+                Resource.available == False,
+                Resource.last_harvest != -1,
+                Resource.last_harvest >= scheduler.scanned_tick,
+            )
+        ).all()
+        for resource_id, regrow_tick in rows:
+            scheduler.schedule(resource_id, regrow_tick)
+        scheduler.scanned_tick = tick
+
+    def schedule_regrowth(self, resource: Resource) -> None:
+        """Schedule the regrowth of a resource that has just been harvested.
+
+        If the scheduler of the simulation lives in another process, the
+        resource is picked up from the database by its next scan.
+        """
+        scheduler = RegrowthScheduler.get(resource.simulation_id)
+        if scheduler is not None:
+            scheduler.schedule(
+                resource.id, resource.last_harvest + resource.regrow_time
+            )
+
+    def regrow_resources(self, world: World, tick: int) -> list[tuple[str, int, int]]:
+        """Make the resources of a world available again that are due to regrow.
+
+        Only the resources due in the regrowth scheduler are updated, in a single
+        UPDATE. The database is scanned for harvests on the first tick of the
+        scheduler, and on every tick while agent ticks run in other processes,
+        whose harvests can not schedule their resources themselves. Due resources that are still being harvested are rescheduled for the
+        next tick. Does not commit.
+
+        Returns:
+            The ID and location of every resource that regrew.
+        """
+        scheduler = self.get_regrowth_scheduler(world.simulation_id)
+        remote_ticks = settings.workqueue.enabled or settings.supervisor.processes > 0
+        if scheduler.scanned_tick < 0 or remote_ticks:
+            self.scan_harvests(world.simulation_id, scheduler, tick)
+        due = scheduler.pop_due(tick)
+        if not due:
+            return []
+
+        statement = (
+            update(Resource)
+            .where(
+                Resource.id.in_(due),
+                Resource.world_id == world.id,
+                Resource.available == False,
+                Resource.last_harvest != -1,
+                Resource.last_harvest + Resource.regrow_time <= tick,
+                ~exists().where(Agent.harvesting_resource_id == Resource.id),
+            )
+            .values(available=True, time_harvest=-1, version=Resource.version + 1)
+            .returning(Resource.id, Resource.x_coord, Resource.y_coord)
+            .execution_options(synchronize_session=False)
+        )
+        grown = [tuple(row) for row in self._db.execute(statement).all()]
+
+        grown_ids = {row[0] for row in grown}
+        missed = [resource_id for resource_id in due if resource_id not in grown_ids]
+        if missed:
+            rows = self._db.exec(
+                select(Resource.id, Resource.last_harvest + Resource.regrow_time).where(
+                    Resource.id.in_(missed),
+                    Resource.available == False,
+                    Resource.last_harvest != -1,
+                )
+            ).all()
+            for resource_id, regrow_tick in rows:
+                scheduler.schedule(resource_id, max(tick + 1, regrow_tick))
+
+        return grown
+
+    async def harvest_resource(
+        self,
+        resource: Resource,
+        harvester: Agent,
+        cost: int = 0,
+    ) -> list[Agent]:
+        """Harvest a resource or join its harvest.
+
+        The harvest and the energy `cost` of the attempt to the harvester are
+        committed in one transaction, retried on concurrent updates of the
+        agents or the resource, and the messages are published afterwards.
+
+        Returns:
+            The harvesters that received the energy yield, empty if the harvest
+            is still waiting for more agents.
+        """
+
+        def join():
+            harvester.energy_level -= cost
+            self.db.add(harvester)
+            joined = self.join_harvest(resource, harvester)
+            self.db.commit()
+            return joined
+
+        resource, harvesters, action_logs = self.retry_on_conflict(
+            harvester.simulation_id, join
+        )
+        self.db.refresh(resource)
+        if harvesters:
+            await self.finish_harvest(resource, harvesters, action_logs)
+        return harvesters
+
+    def join_harvest(
         self,
         resource: Resource,
         harvester: Agent,
-    ) -> bool:
+    ) -> tuple[Resource, list[Agent], list[ActionLog]]:
+        """Let an agent harvest a resource or join its harvest, without committing.
+
+        The resource row is locked for the rest of the transaction, so concurrent
+        joins are serialized. When the last required harvester joins, the harvest
+        is completed right away: all harvesters get the energy yield, their action
+        logs are added and the resource becomes unavailable.
+
+        Returns:
+            The locked resource, the harvesters that received the energy yield
+            (empty if the harvest is still waiting for more agents) and the action
+            logs of a completed multi-agent harvest.
+        """
+        resource = self.db.exec(
+            select(Resource)
+            .where(Resource.id == resource.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).one()
+
         in_range = compute_in_radius(
             location_a=(harvester.x_coord, harvester.y_coord),
             location_b=(resource.x_coord, resource.y_coord),
             radius=resource.harvesting_area,
         )
-        harvested = False
-        if in_range:
-            if resource.available:
-                if resource.required_agents <= 1:
-                    resource.available = False
-                    resource.last_harvest = resource.simulation.tick
-
-                    harvester.energy_level += resource.energy_yield
-                    harvested = True
-
-                else:
-                    harvester.harvesting_resource_id = resource.id
-                    resource.start_harvest = resource.simulation.tick
-
-                self.db.add(resource)
-                self.db.add(harvester)
-                self.db.commit()
-                self.db.refresh(resource)
-            else:
-                logger.error(
-                    f"Resource at {(resource.x_coord, resource.y_coord)} is not available for harvesting."
-                )
-                raise ValueError(
-                    f"Resource at {(resource.x_coord, resource.y_coord)} is not available for harvesting YOU MUST FIND ANOTHER RESOURCE."
-                )
-        else:
+        if not in_range:
             logger.error(
                 f"Agent {harvester.id} is not in harvesting range for the resource at {(resource.x_coord, resource.y_coord)}."
             )
             raise ValueError(
                 f"Agent {harvester.id} is not in harvesting range for the resource at {(resource.x_coord, resource.y_coord)}."
             )
+        if not resource.available:
+            logger.error(
+                f"Resource at {(resource.x_coord, resource.y_coord)} is not available for harvesting."
+            )
+            raise ValueError(
+                f"Resource at {(resource.x_coord, resource.y_coord)} is not available for harvesting YOU MUST FIND ANOTHER RESOURCE."
+            )
+
+        tick = resource.simulation.tick
+        action_logs = []
+        if resource.required_agents <= 1:
+            harvesters = [harvester]
+        else:
+            harvester.harvesting_resource_id = resource.id
+            resource.start_harvest = tick
+            self.db.add(harvester)
+            self.db.flush()
 
-        return harvested
+            harvesters = self.db.exec(
+                select(Agent)
+                .where(Agent.harvesting_resource_id == resource.id)
+                .with_for_update()
+            ).all()
+            if len(harvesters) < resource.required_agents:
+                harvesters = []
+            else:
+                action_logs = self._complete_harvest(resource, harvesters, tick)
+
+        if harvesters:
+            resource.available = False
+            resource.last_harvest = tick
+            for harv in harvesters:
+                harv.energy_level += resource.energy_yield
+                self.db.add(harv)
+
+        self.db.add(resource)
+        return resource, harvesters, action_logs
+
+    async def finish_harvest(
+        self,
+        resource: Resource,
+        harvesters: list[Agent],
+        action_logs: list[ActionLog],
+    ) -> None:
+        """Schedule the regrowth of a committed harvest and publish its messages."""
+        tick = resource.last_harvest
+        self.schedule_regrowth(resource)
+        for action_log in action_logs:
+            agent_action_message = AgentActionMessage(
+                id=action_log.id,
+                simulation_id=action_log.simulation_id,
+                agent_id=action_log.agent_id,
+                action=action_log.action,
+                tick=action_log.tick,
+                created_at=action_log.created_at,
+            )
+            await agent_action_message.publish(self.nats)
+
+        for harv in harvesters:
+            resource_harvested_message = ResourceHarvestedMessage(
+                simulation_id=resource.simulation_id,
+                id=resource.id,
+                harvester_id=(
+                    harv.id if len(harvesters) == 1 else str([h.id for h in harvesters])
+                ),
+                location=(resource.x_coord, resource.y_coord),
+                start_tick=tick,
+                end_tick=tick,
+                new_energy_level=harv.energy_level,
+            )
+            await resource_harvested_message.publish(self.nats)
+
+    def _complete_harvest(
+        self, resource: Resource, harvesters: list[Agent], tick: int
+    ) -> list[ActionLog]:
+        """Release the harvesters of a multi-agent harvest and log its completion."""
+        all_harvesters = ",".join([f"{h.name} (ID:{h.id})" for h in harvesters])
+
+        action_logs = []
+        for harv in harvesters:
+            harv.harvesting_resource_id = None
+
+            action_log = ActionLog(
+                agent_id=harv.id,
+                simulation_id=resource.simulation_id,
+                tick=tick,
+                action=f"harvested_resource_finished(resource_id={resource.id}, location=({resource.x_coord}, {resource.y_coord}), energy_yield={resource.energy_yield}) together with {all_harvesters}. You successfully harvested the resource and gained {resource.energy_yield} energy. It is now not available anymore.",
+            )
+            self.db.add(action_log)
+            action_logs.append(action_log)
+        return action_logs
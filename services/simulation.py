@@ -1,8 +1,50 @@
+import gzip
+import json
+from typing import IO
+
+from loguru import logger
+from sqlalchemy import bindparam, false, insert, update
 from sqlmodel import select
 
 from services.base import BaseService
+from services.relationship import RelationshipService
 
+from schemas.action_log import ActionLog
+from schemas.agent import Agent
+from schemas.carcass import Carcass
+from schemas.conversation import Conversation
+from schemas.memory_log import MemoryLog
+from schemas.message import Message
+from schemas.plan import Plan
+from schemas.region import Region
+from schemas.relationship import Relationship
+from schemas.resource import Resource
 from schemas.simulation import Simulation as SimulationModel
+from schemas.task import Task
+from schemas.world import World
+
+CHECKPOINT_VERSION = 1
+
+# Columns linking a fork to its parent, which are not remapped when copying rows
+LINEAGE_COLUMNS = {"parent_id", "parent_agent_id"}
+
+# Tables of a checkpoint in insertion order. Agents and plans reference each
+# other, so the plans of agents are set after both have been inserted.
+CHECKPOINT_TABLES = [
+    SimulationModel,
+    World,
+    Region,
+    Resource,
+    Agent,
+    Plan,
+    Task,
+    Carcass,
+    Conversation,
+    Message,
+    Relationship,
+    MemoryLog,
+    ActionLog,
+]
 
 
 class SimulationService(BaseService[SimulationModel]):
@@ -25,3 +67,208 @@ class SimulationService(BaseService[SimulationModel]):
         self._db.add(simulation)
         self._db.commit()
         self._db.refresh(simulation)
+
+    def _get_state_filters(self, simulation_id: str) -> dict:
+        """Get the filters selecting the current state of a simulation, without logs."""
+        agent_ids = select(Agent.id).where(Agent.simulation_id == simulation_id)
+        plan_ids = select(Plan.id).where(Plan.owner_id.in_(agent_ids))
+        conversation_ids = select(Conversation.id).where(
+            Conversation.simulation_id == simulation_id
+        )
+        return {
+            SimulationModel: [SimulationModel.id == simulation_id],
+            Plan: [Plan.owner_id.in_(agent_ids)],
+            Task: [Task.plan_id.in_(plan_ids)],
+            Message: [Message.conversation_id.in_(conversation_ids)],
+            Relationship: [
+                Relationship.simulation_id == simulation_id,
+                Relationship.tick == 0,
+            ],
+            MemoryLog: [false()],
+            ActionLog: [false()],
+        }
+
+    def _read_rows(self, simulation_id: str, filters: dict) -> dict:
+        """Read the rows of all checkpoint tables of a simulation as dicts."""
+        rows_by_model = {}
+        for model in CHECKPOINT_TABLES:
+            table = model.__table__
+            where = filters.get(model) or [table.c.simulation_id == simulation_id]
+            rows_by_model[model] = [
+                dict(row._mapping)
+                for row in self._db.execute(select(table).where(*where)).all()
+            ]
+        return rows_by_model
+
+    def _insert_rows(self, rows_by_model: dict) -> SimulationModel:
+        """
+        Insert the rows of a simulation as a new simulation.
+
+        All rows get new IDs and are written with one bulk insert per table.
+        Foreign keys are remapped to the new IDs, except for the lineage columns
+        of forks, which keep pointing at the parent.
+        """
+        # New IDs per table, IDs are only unique within a table
+        ids: dict[str, dict[str, str]] = {}
+        for model in CHECKPOINT_TABLES:
+            new_id = model.model_fields["id"].default_factory
+            table_ids = ids.setdefault(model.__table__.name, {})
+            for row in rows_by_model[model]:
+                row["id"] = table_ids.setdefault(row["id"], new_id())
+
+        plans = []
+        for model in CHECKPOINT_TABLES:
+            table = model.__table__
+            rows = rows_by_model[model]
+            for foreign_key in table.foreign_keys:
+                column = foreign_key.parent.name
+                if column in LINEAGE_COLUMNS:
+                    continue
+                target_ids = ids[foreign_key.column.table.name]
+                for row in rows:
+                    if row.get(column) is None:
+                        continue
+                    if row[column] not in target_ids:
+                        raise ValueError(
+                            f"{table.name} {row['id']} references missing {foreign_key.column.table.name} {row[column]}."
+                        )
+                    row[column] = target_ids[row[column]]
+
+            if model is SimulationModel:
+                for row in rows:
+                    row["running"] = False
+            if model is Agent:
+                for row in rows:
+                    plan_id = row.pop("participating_in_plan_id")
+                    if plan_id is not None:
+                        plans.append({"agent_id": row["id"], "plan_id": plan_id})
+
+            if rows:
+                self._db.execute(insert(table), rows)
+
+        if plans:
+            agents = Agent.__table__
+            self._db.execute(
+                update(agents)
+                .where(agents.c.id == bindparam("agent_id"))
+                .values(participating_in_plan_id=bindparam("plan_id")),
+                plans,
+            )
+        # The snapshots of the copy start with a keyframe of its live graph, the
+        # snapshots of the source are not copied
+        simulation = rows_by_model[SimulationModel][0]
+        if simulation["tick"] > 0:
+            RelationshipService(self._db).snapshot_relationship_graph(
+                simulation["id"], simulation["tick"], keyframe=True, commit=False
+            )
+        self._db.commit()
+
+        return self.get_by_id(simulation["id"])
+
+    def export_checkpoint(
+        self, simulation_id: str, file: IO[bytes], log_ticks: int = 100
+    ) -> int:
+        """
+        Export the state of a simulation at its current tick to a checkpoint file.
+
+        The checkpoint holds the world, regions, resources, agents, plans,
+        carcasses, conversations with their messages and the live relationship
+        graph (tick 0), plus the memory and action logs of the last `log_ticks`
+        ticks. Every table is stored column by column in gzip compressed JSON.
+
+        Returns:
+            The tick of the checkpoint.
+        """
+        simulation = self.get_by_id(simulation_id)
+        tick = simulation.tick
+
+        filters = self._get_state_filters(simulation_id)
+        filters[MemoryLog] = [
+            MemoryLog.simulation_id == simulation_id,
+            MemoryLog.tick > tick - log_ticks,
+        ]
+        filters[ActionLog] = [
+            ActionLog.simulation_id == simulation_id,
+            ActionLog.tick > tick - log_ticks,
+        ]
+
+        tables = {}
+        for model, rows in self._read_rows(simulation_id, filters).items():
+            columns = [column.name for column in model.__table__.columns]
+            tables[model.__table__.name] = {
+                "columns": columns,
+                "data": [[row[column] for row in rows] for column in columns],
+            }
+
+        checkpoint = {"version": CHECKPOINT_VERSION, "tick": tick, "tables": tables}
+        with gzip.open(file, "wt", encoding="utf-8") as out:
+            json.dump(checkpoint, out, separators=(",", ":"))
+        return tick
+
+    def restore_checkpoint(self, file: IO[bytes]) -> SimulationModel:
+        """
+        Restore a checkpoint into a new simulation.
+
+        The restored simulation starts stopped at the tick of the checkpoint and
+        does not keep the lineage of a forked simulation, as the history of its
+        parents is not part of the checkpoint. Agents keep their Milvus
+        collection, which is not part of the checkpoint either.
+        """
+        with gzip.open(file, "rt", encoding="utf-8") as source:
+            checkpoint = json.load(source)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(
+                f"Unsupported checkpoint version {checkpoint.get('version')}."
+            )
+
+        rows_by_model = {}
+        for model in CHECKPOINT_TABLES:
+            stored = checkpoint["tables"].get(model.__table__.name)
+            if stored is None:
+                raise ValueError(f"Checkpoint is missing table {model.__table__.name}.")
+            rows = [
+                dict(zip(stored["columns"], values)) for values in zip(*stored["data"])
+            ]
+            for row in rows:
+                for column in LINEAGE_COLUMNS:
+                    if column in row:
+                        row[column] = None
+                row.pop("fork_tick", None)
+            rows_by_model[model] = rows
+
+        return self._insert_rows(rows_by_model)
+
+    def fork(self, simulation_id: str) -> SimulationModel:
+        """
+        Fork a simulation at its current tick.
+
+        Only the mutable state is copied: world, regions, resources, agents,
+        plans, carcasses, unfinished conversations with their messages and the
+        live relationship graph. Action logs, memory logs, finished
+        conversations and relationship snapshots stay with the parent and are
+        read through the lineage of the fork (see `engine.lineage`).
+        """
+        simulation = self.get_by_id(simulation_id)
+
+        filters = self._get_state_filters(simulation_id)
+        unfinished = [
+            Conversation.simulation_id == simulation_id,
+            Conversation.finished == False,
+        ]
+        filters[Conversation] = unfinished
+        filters[Message] = [
+            Message.conversation_id.in_(select(Conversation.id).where(*unfinished))
+        ]
+
+        rows_by_model = self._read_rows(simulation_id, filters)
+        for row in rows_by_model[SimulationModel]:
+            row["parent_id"] = row["id"]
+            row["fork_tick"] = simulation.tick
+        for row in rows_by_model[Agent]:
+            row["parent_agent_id"] = row["id"]
+
+        fork = self._insert_rows(rows_by_model)
+        logger.info(
+            f"[SIM {simulation_id}] Forked into simulation {fork.id} at tick {simulation.tick}"
+        )
+        return fork
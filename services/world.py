@@ -4,6 +4,9 @@ from typing import override
 from faststream.nats import NatsBroker
 from sqlmodel import Session, select
 
+from engine.grid import Grid
+from engine.region_raster import RegionRaster
+
 from services.base import BaseService
 from services.region import RegionService
 
@@ -58,6 +61,9 @@ class WorldService(BaseService[WorldModel]):
             regions.append(region)
         if commit:
             self._db.commit()
+        # Regions changed, the raster and grid are rebuilt on next lookup
+        RegionRaster.drop(world.id)
+        Grid.drop(world.id)
         return regions
 
     def _divide_grid_into_regions(
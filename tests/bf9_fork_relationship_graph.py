@@ -0,0 +1,135 @@
+import uuid
+
+from sqlmodel import select
+
+from clients.db import get_session
+from services.relationship import RelationshipService
+from services.simulation import SimulationService
+from services.world import WorldService
+from schemas.agent import Agent
+from schemas.relationship import Relationship
+from schemas.simulation import Simulation
+from schemas.world import World
+
+
+def edges(graph: dict, to_parent: dict[str, str] | None = None) -> dict:
+    """Edges of a relationship graph by agent pair, with the IDs of the parent."""
+    to_parent = to_parent or {}
+    return {
+        tuple(
+            sorted(
+                to_parent.get(agent_id, agent_id)
+                for agent_id in (e["source"], e["target"])
+            )
+        ): (e["count"], e["total_sentiment"])
+        for e in graph["edges"]
+    }
+
+
+def advance(db, relationship_service, simulation, updates=()):
+    """Apply relationship updates to the live graph and snapshot the next tick."""
+    simulation.tick += 1
+    db.add(simulation)
+    for agent_a_id, agent_b_id, sentiment in updates:
+        agent_a_id, agent_b_id = sorted([agent_a_id, agent_b_id])
+        rel = db.exec(
+            select(Relationship).where(
+                Relationship.simulation_id == simulation.id,
+                Relationship.agent_a_id == agent_a_id,
+                Relationship.agent_b_id == agent_b_id,
+                Relationship.tick == 0,
+            )
+        ).one_or_none() or Relationship(
+            simulation_id=simulation.id,
+            agent_a_id=agent_a_id,
+            agent_b_id=agent_b_id,
+            tick=0,
+        )
+        rel.total_sentiment += sentiment
+        rel.update_count += 1
+        db.add(rel)
+    db.commit()
+    relationship_service.snapshot_relationship_graph(simulation.id, simulation.tick)
+
+
+def test_fork_relationship_graph_after_fork_tick():
+    with get_session() as db:
+        sim_service = SimulationService(db=db, nats=None)
+        relationship_service = RelationshipService(db=db)
+
+        # --- Setup: parent with three agents and two edges by tick 5 ---
+        simulation = sim_service.create(
+            Simulation(
+                id="test-" + uuid.uuid4().hex[:6],
+                collection_name="test_sim",
+                running=False,
+            )
+        )
+        world_service = WorldService(db=db, nats=None)
+        world = world_service.create(World(simulation_id=simulation.id))
+        world_service.create_regions_for_world(world=world, num_regions=1)
+
+        agents = [
+            Agent(simulation_id=simulation.id, name=name, model="gpt-4.1-nano")
+            for name in ("Alex", "Sam", "Kim")
+        ]
+        db.add_all(agents)
+        db.commit()
+        a, b, c = (agent.id for agent in agents)
+
+        advance(db, relationship_service, simulation, [(a, b, 0.5)])
+        advance(db, relationship_service, simulation)
+        advance(db, relationship_service, simulation, [(b, c, -0.25)])
+        advance(db, relationship_service, simulation, [(a, b, 0.25)])
+        advance(db, relationship_service, simulation)
+        assert simulation.tick == 5
+
+        # --- Fork at tick 5, then tick both for three more ticks ---
+        fork = sim_service.fork(simulation.id)
+        to_parent = {
+            agent.id: agent.parent_agent_id
+            for agent in db.exec(
+                select(Agent).where(Agent.simulation_id == fork.id)
+            ).all()
+        }
+        to_fork = {parent_id: id for id, parent_id in to_parent.items()}
+        for _ in range(3):
+            advance(db, relationship_service, simulation)
+
+        # The latest graph of the fork while its first tick runs, before its
+        # first snapshot
+        fork.tick += 1
+        db.add(fork)
+        db.commit()
+        assert edges(
+            relationship_service.get_relationship_graph(fork.id), to_parent
+        ) == edges(
+            relationship_service.get_relationship_graph(simulation.id, 5)
+        ), "Fork graph during its first tick differs from the parent"
+        fork.tick -= 1
+
+        advance(db, relationship_service, fork)
+        advance(db, relationship_service, fork, [(to_fork[a], to_fork[c], 0.75)])
+        advance(db, relationship_service, fork)
+
+        # --- Verify: the fork keeps the parent's edges after the fork tick ---
+        parent_graph = edges(
+            relationship_service.get_relationship_graph(simulation.id, tick=8)
+        )
+        assert len(parent_graph) == 2
+        for tick in (5, 6):
+            assert (
+                edges(
+                    relationship_service.get_relationship_graph(fork.id, tick=tick),
+                    to_parent,
+                )
+                == parent_graph
+            ), f"Fork graph at tick {tick} differs from the parent"
+
+        fork_graph = edges(
+            relationship_service.get_relationship_graph(fork.id, tick=8), to_parent
+        )
+        assert fork_graph == {
+            **parent_graph,
+            tuple(sorted((a, c))): (1, 0.75),
+        }, "Fork graph at tick 8 is not the parent graph plus its own edge"
@@ -105,6 +105,9 @@ def summarize_tool_call(calls: Union[Dict[str, Any], List[Dict[str, Any]]]) -> s
 
         parts = []
         for k, v in args.items():
+            # Reasoning passed along with the call in single call mode is not part of the action
+            if k == "reasoning":
+                continue
             if isinstance(v, str):
                 parts.append(f"{k}={json.dumps(v)}")
             else: